@@ -0,0 +1,203 @@
+"""摘要流程执行
+
+run_pipeline 在当前进程运行摘要流程，并通过 publish 发布 SSE 事件（status /
+progress / content / error / result）。本地执行时 publish 为 Flight.publish；
+分布式执行时由 worker 进程调用，publish 把事件写入任务队列，API 节点通过
+dispatch 放入任务并把事件转发给发起请求的 Flight。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import traceback
+import uuid
+from typing import Awaitable, Callable, List, Tuple
+
+from app.config import Config
+from app.api.sse_frames import ContentCoalescer
+from app.utils.task_broker import TaskBroker, TaskConflictError
+from app.utils.tracing import tracer
+from app.workflow.summarizer import ReportSummarizer
+
+logger = logging.getLogger(__name__)
+
+Publish = Callable[[dict], Awaitable[None]]
+
+
+def _save_uploads(uploads: List[Tuple[str, bytes]]) -> List[tuple]:
+    """保存上传文件（加随机前缀，避免并发请求的同名文件互相覆盖）"""
+    file_paths = []
+    for filename, content in uploads:
+        file_path = os.path.join(Config.UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(filename)}")
+        with open(file_path, "wb") as f:
+            f.write(content)
+        file_paths.append((file_path, filename))
+    return file_paths
+
+
+def _remove_files(file_paths: List[tuple]):
+    """清理临时文件"""
+    for file_path, _ in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _error_event(message: str, trace_id: str) -> dict:
+    return {
+        "event": "error",
+        "data": json.dumps({
+            "message": message,
+            "trace_id": trace_id
+        }, ensure_ascii=False)
+    }
+
+
+async def run_pipeline(
+    summarizer: ReportSummarizer,
+    publish: Publish,
+    uploads: List[Tuple[str, bytes]],
+    documents: List[dict],
+    request: dict,
+    trace_id: str,
+    resume: bool = False,
+) -> dict:
+    """运行摘要流程并发布事件
+
+    Args:
+        summarizer: 摘要生成器
+        publish: 发布 SSE 事件的协程函数
+        uploads: (filename, content) 列表
+        documents: 引用的文档库文档（含 path、doc_id、filename），运行期间不会被淘汰
+        request: 请求参数（report_type、max_words、max_paragraphs、requirements、series_id）
+        trace_id: 追踪ID
+        resume: 是否从 trace_id 的检查点继续
+
+    Returns:
+        dict: {"report_markdown": ..., "meta": ...}
+    """
+    async def emit_content(text: str):
+        await publish({
+            "event": "content",
+            "data": json.dumps({"delta": text}, ensure_ascii=False)
+        })
+
+    # 流式增量按大小/时间窗口合并为较大的 content 帧
+    coalescer = ContentCoalescer(emit_content, Config.SSE_FLUSH_CHARS, Config.SSE_FLUSH_INTERVAL_MS)
+
+    async def progress_callback(stage: str, status: str, message: str):
+        """进度回调函数"""
+        await coalescer.drain()
+        if stage == "progress":
+            # 进度事件
+            await publish({
+                "event": "progress",
+                "data": json.dumps({"message": message}, ensure_ascii=False)
+            })
+        else:
+            # 状态事件
+            await publish({
+                "event": "status",
+                "data": json.dumps({
+                    "stage": stage,
+                    "status": status,
+                    "message": message
+                }, ensure_ascii=False)
+            })
+
+    async def stream_callback(delta: str):
+        """流式内容回调函数 - 接收增量内容"""
+        await coalescer.add(delta)
+
+    with tracer.span("save_uploads"):
+        file_paths = _save_uploads(uploads)
+    # 已落盘：清空列表释放上传内容（路由与 Flight 的闭包在整个请求期间仍引用该列表）
+    uploads.clear()
+    library = {document["path"]: document["doc_id"] for document in documents}
+    store = summarizer.documents if documents else None
+    if store:
+        store.pin(library.values())
+    try:
+        report_markdown, meta = await summarizer.summarize(
+            report_type=request["report_type"],
+            file_paths=file_paths + [(document["path"], document["filename"]) for document in documents],
+            max_words=request["max_words"],
+            max_paragraphs=request["max_paragraphs"],
+            requirements=request["requirements"],
+            progress_callback=progress_callback,
+            stream_callback=stream_callback,
+            series_id=request["series_id"],
+            trace_id=trace_id,
+            resume=resume,
+            library=library,
+        )
+    except Exception as e:
+        # 记录完整的错误堆栈到日志
+        logger.error(f"摘要生成失败: {str(e)}\n{traceback.format_exc()}")
+        await coalescer.drain()
+        await publish(_error_event(str(e), trace_id))
+        raise
+    finally:
+        _remove_files(file_paths)
+        if store:
+            store.unpin(library.values())
+
+    result = {"report_markdown": report_markdown, "meta": meta.model_dump()}
+    await coalescer.drain()
+    await publish({
+        "event": "result",
+        "data": json.dumps(result, ensure_ascii=False)
+    })
+    return result
+
+
+async def dispatch(
+    broker: TaskBroker,
+    publish: Publish,
+    uploads: List[Tuple[str, bytes]],
+    doc_ids: List[str],
+    request: dict,
+    trace_id: str,
+    resume: bool = False,
+) -> dict:
+    """把摘要任务放入队列，转发 worker 发布的事件直到结果或错误事件
+
+    任务 ID 即 trace_id；等待领取超过 BROKER_QUEUE_TIMEOUT 时取消任务。
+
+    Returns:
+        dict: worker 返回的结果
+
+    Raises:
+        TaskConflictError: 同一 trace_id 的任务仍在等待或执行中（如重复续跑）
+    """
+    payload = {"documents": doc_ids, "request": request, "trace_id": trace_id, "resume": resume}
+    try:
+        await asyncio.to_thread(broker.enqueue, trace_id, payload, uploads)
+    except TaskConflictError as e:
+        await publish(_error_event(str(e), trace_id))
+        raise
+    uploads.clear()  # 已写入任务队列，释放上传内容
+    queued_at = time.time()
+    last_seq = 0
+    while True:
+        events, status = await asyncio.to_thread(broker.poll, trace_id, last_seq)
+        for last_seq, event in events:
+            await publish(event)
+            if event["event"] == "result":
+                return json.loads(event["data"])
+            if event["event"] == "error":
+                raise RuntimeError(json.loads(event["data"])["message"])
+        if status in ("done", "failed", ""):
+            message = "任务已结束但没有返回结果"
+            await publish(_error_event(message, trace_id))
+            raise RuntimeError(message)
+        if (
+            status == "queued"
+            and Config.BROKER_QUEUE_TIMEOUT > 0
+            and time.time() - queued_at > Config.BROKER_QUEUE_TIMEOUT
+            and await asyncio.to_thread(broker.cancel, trace_id)
+        ):
+            message = f"等待 worker 领取任务超时 ({Config.BROKER_QUEUE_TIMEOUT:g} 秒)"
+            await publish(_error_event(message, trace_id))
+            raise RuntimeError(message)
+        await asyncio.sleep(Config.BROKER_POLL_MS / 1000)
@@ -1,29 +1,60 @@
 """FastAPI 路由"""
 import os
-import json
 import asyncio
+import json
 import logging
+import time
 import traceback
-from typing import List
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+import uuid
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Header, Query, Response
 from sse_starlette.sse import EventSourceResponse
 from app.config import Config
 from app.models.schemas import (
     ReportTypesListResponse,
+    StoredDocument,
+    StoredDocumentListResponse,
     SummarizeResponse,
     SSEStatusEvent,
     SSEProgressEvent,
     SSEErrorEvent,
 )
-from app.workflow.summarizer import ReportSummarizer, init_agentscope
+from app.workflow.summarizer import ReportSummarizer
+from app.workflow.overload import OverloadLevel
+from app.utils.document_store import DocumentTooLargeError
+from app.api.single_flight import Flight, RequestCoordinator, request_fingerprint
+from app.api.pipeline import dispatch, run_pipeline
+from app.utils.task_broker import TaskBroker, TaskConflictError, create_broker
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
 router = APIRouter()
 config = Config()
-summarizer = ReportSummarizer()
+_summarizer: ReportSummarizer = None
+_broker: TaskBroker = None
+coordinator = RequestCoordinator(
+    config.RESULT_CACHE_TTL,
+    config.RESULT_CACHE_MAX_ENTRIES,
+    queue_size=config.SSE_QUEUE_MAX_EVENTS,
+)
+
+
+def get_summarizer() -> ReportSummarizer:
+    """获取摘要生成器单例（首次调用时创建）"""
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ReportSummarizer()
+    return _summarizer
+
+
+def get_broker() -> TaskBroker:
+    """获取任务队列单例（分布式执行时使用）"""
+    global _broker
+    if _broker is None:
+        _broker = create_broker()
+    return _broker
 
 
 # 初始化上传目录
@@ -36,130 +67,273 @@ async def get_report_types():
     return ReportTypesListResponse(types=config.get_report_types())
 
 
-@router.post("/report/summarize", response_model=SummarizeResponse)
-async def summarize_report(
-    report_type: str = Form(...),
-    max_words: int = Form(config.DEFAULT_MAX_WORDS),
-    max_paragraphs: int = Form(config.DEFAULT_MAX_PARAGRAPHS),
-    requirements: str = Form(""),
-    files: List[UploadFile] = File(...),
-):
-    """生成报告摘要（非流式）"""
-    
-    # 验证报告类型（去除前后空格）
+@router.get("/report/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """获取一次请求的 span 树（需启用 TRACING）"""
+    tree = tracer.get_tree(trace_id)
+    if tree is None:
+        raise HTTPException(status_code=404, detail=f"未找到 trace: {trace_id}")
+    return tree
+
+
+@router.get("/report/planner")
+async def get_planner_decisions(limit: int = Query(50, ge=1, le=200)):
+    """导出分块规划器的延迟模型与最近的规划决策（最多 200 条）"""
+    return get_summarizer().planner.export(limit=limit)
+
+
+@router.post("/documents", response_model=List[StoredDocument])
+async def upload_documents(files: List[UploadFile] = File(...)):
+    """上传文件到文档库，返回按内容哈希生成的文档 ID（内容相同的文件只保存一份）"""
+    store = get_summarizer().documents
+    documents = []
+    for file in files:
+        try:
+            meta = await asyncio.to_thread(store.put, file.filename, file.file)
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        documents.append(store.public_info(meta))
+    return documents
+
+
+@router.get("/documents", response_model=StoredDocumentListResponse)
+async def list_documents():
+    """列出文档库中的文档（最近使用的在前）"""
+    store = get_summarizer().documents
+    return StoredDocumentListResponse(documents=store.list(), **store.usage())
+
+
+@router.get("/documents/{doc_id}", response_model=StoredDocument)
+async def get_document(doc_id: str):
+    """获取文档库中的文档信息"""
+    store = get_summarizer().documents
+    document = store.get(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"文档库中没有该文档: {doc_id}")
+    return store.public_info(document)
+
+
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    """从文档库删除文档及其解析结果与摘要"""
+    store = get_summarizer().documents
+    if store.get(doc_id) is None:
+        raise HTTPException(status_code=404, detail=f"文档库中没有该文档: {doc_id}")
+    if not store.delete(doc_id):
+        raise HTTPException(status_code=409, detail=f"文档正在被摘要流程使用: {doc_id}")
+    return {"doc_id": doc_id, "deleted": True}
+
+
+def _validate_report_type(report_type: str) -> str:
+    """验证报告类型（去除前后空格）"""
     report_type = report_type.strip()
     valid_types = [rt["value"] for rt in config.get_report_types()]
     if report_type not in valid_types:
         raise HTTPException(status_code=400, detail=f"无效的报告类型: {report_type}")
+    return report_type
+
+
+async def _read_uploads(files: List[UploadFile]) -> Tuple[List[Tuple[str, bytes]], float, float]:
+    """读取上传文件内容
     
-    # 保存上传的文件
-    file_paths = []
-    try:
-        for file in files:
-            file_path = os.path.join(config.UPLOAD_DIR, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            file_paths.append((file_path, file.filename))
-        
-        # 生成摘要
-        report_markdown, meta = await summarizer.summarize(
-            report_type=report_type,
-            file_paths=file_paths,
-            max_words=max_words,
-            max_paragraphs=max_paragraphs,
-            requirements=requirements,
+    Returns:
+        ((filename, content) 列表, 开始时间, 结束时间)
+    """
+    start = time.time()
+    uploads = [(file.filename, await file.read()) for file in files]
+    return uploads, start, time.time()
+
+
+def _resolve_documents(doc_ids: Optional[List[str]]) -> List[dict]:
+    """按文档库 ID 查找文档（支持重复字段或逗号分隔），不存在时返回 404"""
+    ids = []
+    for value in doc_ids or []:
+        ids.extend(doc_id.strip() for doc_id in value.split(",") if doc_id.strip())
+    documents = []
+    for doc_id in dict.fromkeys(ids):
+        document = get_summarizer().documents.get(doc_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail=f"文档库中没有该文档: {doc_id}")
+        documents.append(document)
+    return documents
+
+
+def _etag(result: dict) -> str:
+    """结果的 ETag（报告内容哈希）"""
+    return f'"{result["meta"]["hash"]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _admit(fingerprint: str) -> None:
+    """过载时拒绝需要新建流程的请求（503 + Retry-After）；合并到进行中的流程不受限制"""
+    if not config.OVERLOAD_CONTROL or coordinator.running(fingerprint):
+        return
+    overload = get_summarizer().overload
+    if overload.level() >= OverloadLevel.SHED:
+        retry_after = overload.retry_after(config.OVERLOAD_RETRY_AFTER)
+        logger.warning(f"系统过载，拒绝新请求: {overload.pressure()}")
+        raise HTTPException(
+            status_code=503,
+            detail="系统负载过高，请稍后重试",
+            headers={"Retry-After": str(retry_after)},
         )
-        
-        return SummarizeResponse(report_markdown=report_markdown, meta=meta)
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        # 清理临时文件
-        for file_path, _ in file_paths:
-            if os.path.exists(file_path):
-                os.remove(file_path)
 
 
-async def _summarize_stream_generator(
+def _start_summarize(
+    fingerprint: str,
+    uploads: List[Tuple[str, bytes]],
+    upload_window: Tuple[float, float],
     report_type: str,
-    file_paths: List[tuple],
     max_words: int,
     max_paragraphs: int,
     requirements: str,
+    series_id: str,
+    resume_trace_id: str = "",
+    documents: List[dict] = (),
+) -> Flight:
+    """启动摘要流程，已有相同请求在运行时直接合并到该流程
+    
+    resume_trace_id 非空时沿用该 trace_id，从其检查点继续；documents 为引用的
+    文档库文档（排在上传文件之后，运行期间不会被淘汰）。
+    """
+    trace_id = resume_trace_id or str(uuid.uuid4())
+    
+    async def run(flight: Flight) -> dict:
+        upload_start, upload_end = upload_window
+        with tracer.span("request", trace_id=trace_id, start=upload_start):
+            tracer.add_span(
+                "upload", upload_start, upload_end,
+                files=len(uploads), bytes=sum(len(content) for _, content in uploads),
+            )
+            return await execute(flight)
+    
+    async def execute(flight: Flight) -> dict:
+        request = {
+            "report_type": report_type,
+            "max_words": max_words,
+            "max_paragraphs": max_paragraphs,
+            "requirements": requirements,
+            "series_id": series_id,
+        }
+        if config.DISTRIBUTED:
+            # 文档库文档在 API 节点上保持 pin，直到 worker 返回结果
+            store = get_summarizer().documents if documents else None
+            if store:
+                store.pin(document["doc_id"] for document in documents)
+            try:
+                return await dispatch(
+                    get_broker(), flight.publish, uploads, [document["doc_id"] for document in documents],
+                    request, trace_id, resume=bool(resume_trace_id),
+                )
+            finally:
+                if store:
+                    store.unpin(document["doc_id"] for document in documents)
+        return await run_pipeline(
+            get_summarizer(), flight.publish, uploads, list(documents), request, trace_id,
+            resume=bool(resume_trace_id),
+        )
+    
+    flight, started = coordinator.join_or_start(fingerprint, run, trace_id=trace_id)
+    if not started:
+        logger.info(f"相同请求正在处理中，合并到进行中的流程: {fingerprint[:12]}")
+    return flight
+
+
+def _fingerprint(uploads, report_type, max_words, max_paragraphs, requirements, series_id, resume="", documents=()) -> str:
+    return request_fingerprint(
+        uploads,
+        documents=[document["doc_id"] for document in documents],
+        resume=resume,
+        report_type=report_type,
+        max_words=max_words,
+        max_paragraphs=max_paragraphs,
+        requirements=requirements,
+        series_id=series_id,
+    )
+
+
+@router.post("/report/summarize", response_model=SummarizeResponse)
+async def summarize_report(
+    response: Response,
+    report_type: str = Form(...),
+    max_words: int = Form(config.DEFAULT_MAX_WORDS),
+    max_paragraphs: int = Form(config.DEFAULT_MAX_PARAGRAPHS),
+    requirements: str = Form(""),
+    series_id: str = Form(""),
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[List[str]] = Form(None),
+    if_none_match: Optional[str] = Header(None),
 ):
-    """流式生成摘要的生成器 - 支持增量内容传输"""
-    
-    # 创建事件队列
-    event_queue = asyncio.Queue()
-    
-    async def progress_callback(stage: str, status: str, message: str):
-        """进度回调函数"""
-        if stage == "progress":
-            # 进度事件
-            await event_queue.put({
-                "event": "progress",
-                "data": json.dumps({"message": message}, ensure_ascii=False)
-            })
-        else:
-            # 状态事件
-            await event_queue.put({
-                "event": "status",
-                "data": json.dumps({
-                    "stage": stage,
-                    "status": status,
-                    "message": message
-                }, ensure_ascii=False)
-            })
-    
-    async def stream_callback(delta: str):
-        """流式内容回调函数 - 接收增量内容"""
-        await event_queue.put({
-            "event": "content",
-            "data": json.dumps({"delta": delta}, ensure_ascii=False)
-        })
-    
-    # 创建摘要生成任务
-    async def generate_summary():
+    """生成报告摘要（非流式）
+    
+    文件可以直接上传（files），也可以引用文档库中的文档（doc_ids），两者可同时使用。
+    相同请求在 RESULT_CACHE_TTL 内直接返回缓存结果；客户端携带的
+    If-None-Match 与结果 ETag 一致时返回 304。
+    """
+    report_type = _validate_report_type(report_type)
+    documents = _resolve_documents(doc_ids)
+    if not files and not documents:
+        raise HTTPException(status_code=400, detail="请上传文件或指定文档库中的文档 (doc_ids)")
+    uploads, upload_start, upload_end = await _read_uploads(files or [])
+    fingerprint = _fingerprint(
+        uploads, report_type, max_words, max_paragraphs, requirements, series_id, documents=documents
+    )
+    
+    result = coordinator.get_cached(fingerprint)
+    if result is None:
+        _admit(fingerprint)
+        flight = _start_summarize(
+            fingerprint, uploads, (upload_start, upload_end), report_type, max_words, max_paragraphs, requirements,
+            series_id, documents=documents,
+        )
         try:
-            report_markdown, meta = await summarizer.summarize(
-                report_type=report_type,
-                file_paths=file_paths,
-                max_words=max_words,
-                max_paragraphs=max_paragraphs,
-                requirements=requirements,
-                progress_callback=progress_callback,
-                stream_callback=stream_callback,
-            )
-            # 将结果放入队列
-            await event_queue.put({
-                "event": "result",
-                "data": json.dumps({
-                    "report_markdown": report_markdown,
-                    "meta": meta.model_dump()
-                }, ensure_ascii=False)
-            })
+            result = await flight.wait()
         except Exception as e:
-            # 记录完整的错误堆栈到日志
-            logger.error(f"摘要生成失败: {str(e)}\n{traceback.format_exc()}")
-            await event_queue.put({
-                "event": "error",
-                "data": json.dumps({
-                    "message": str(e),
-                    "trace_id": ""
-                }, ensure_ascii=False)
-            })
-    
-    # 启动摘要生成任务
-    summary_task = asyncio.create_task(generate_summary())
+            # 启用 CHECKPOINT 时可凭 trace_id 调用 /report/resume 继续
+            raise HTTPException(status_code=500, detail=str(e), headers={"X-Trace-Id": flight.trace_id})
     
-    try:
-        # 从队列中获取事件并 yield
+    etag = _etag(result)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return SummarizeResponse(**result)
+
+
+async def _cached_stream_generator(result: dict):
+    """缓存命中时的 SSE 流：直接发送结果事件"""
+    yield {
+        "event": "result",
+        "data": json.dumps(result, ensure_ascii=False)
+    }
+
+
+async def _summarize_stream_generator(flight: Flight):
+    """流式生成摘要的生成器 - 订阅摘要流程的事件（支持增量内容传输）"""
+    subscription = flight.subscribe()
+    stream_start = time.time()
+    events, sent_bytes, send_seconds = 0, 0, 0.0
+    
+    async def next_events():
+        """先发送订阅前已发布的事件，再从有界队列读取"""
+        for event in subscription.backlog:
+            yield event
         while True:
-            event = await event_queue.get()
+            yield await subscription.queue.get()
+    
+    try:
+        async for event in next_events():
+            send_start = time.time()
             yield event
+            # yield 返回时该事件已交给响应发送（含连接背压等待）
+            send_seconds += time.time() - send_start
+            events += 1
+            sent_bytes += len(event["data"])
             
             # 如果是结果或错误事件，结束生成
             if event["event"] in ("result", "error"):
@@ -171,9 +345,16 @@ async def _summarize_stream_generator(
             "event": "error",
             "data": json.dumps({
                 "message": str(e),
-                "trace_id": ""
+                "trace_id": flight.trace_id
             }, ensure_ascii=False)
         }
+    
+    finally:
+        flight.unsubscribe(subscription)
+        tracer.add_span(
+            "sse_send", stream_start, time.time(), trace_id=flight.trace_id,
+            events=events, bytes=sent_bytes, send_ms=send_seconds * 1000,
+        )
 
 
 @router.post("/report/summarize/stream")
@@ -182,45 +363,99 @@ async def summarize_report_stream(
     max_words: int = Form(config.DEFAULT_MAX_WORDS),
     max_paragraphs: int = Form(config.DEFAULT_MAX_PARAGRAPHS),
     requirements: str = Form(""),
-    files: List[UploadFile] = File(...),
+    series_id: str = Form(""),
+    files: Optional[List[UploadFile]] = File(None),
+    doc_ids: Optional[List[str]] = Form(None),
 ):
-    """生成报告摘要（流式 SSE）"""
-    # 验证报告类型（去除前后空格）
-    report_type = report_type.strip()
-    valid_types = [rt["value"] for rt in config.get_report_types()]
-    if report_type not in valid_types:
-        raise HTTPException(status_code=400, detail=f"无效的报告类型: {report_type}")
+    """生成报告摘要（流式 SSE）
     
-    # 保存上传的文件
-    file_paths = []
+    相同请求合并为一次运行，事件扇出给所有订阅者；缓存命中时直接发送结果。
+    """
+    report_type = _validate_report_type(report_type)
+    documents = _resolve_documents(doc_ids)
+    if not files and not documents:
+        raise HTTPException(status_code=400, detail="请上传文件或指定文档库中的文档 (doc_ids)")
+    uploads, upload_start, upload_end = await _read_uploads(files or [])
+    fingerprint = _fingerprint(
+        uploads, report_type, max_words, max_paragraphs, requirements, series_id, documents=documents
+    )
+    
+    result = coordinator.get_cached(fingerprint)
+    if result is not None:
+        return EventSourceResponse(_cached_stream_generator(result), headers={"ETag": _etag(result)})
+    
+    _admit(fingerprint)
     try:
-        for file in files:
-            file_path = os.path.join(config.UPLOAD_DIR, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            file_paths.append((file_path, file.filename))
-        
-        # 返回 SSE 流
-        return EventSourceResponse(
-            _summarize_stream_generator(
-                report_type=report_type,
-                file_paths=file_paths,
-                max_words=max_words,
-                max_paragraphs=max_paragraphs,
-                requirements=requirements,
-            )
+        flight = _start_summarize(
+            fingerprint, uploads, (upload_start, upload_end), report_type, max_words, max_paragraphs, requirements,
+            series_id, documents=documents,
         )
-    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-    finally:
-        # 清理临时文件（在后台任务中）
-        async def cleanup():
-            await asyncio.sleep(5)  # 等待流式传输完成
-            for file_path, _ in file_paths:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-        
-        asyncio.create_task(cleanup())
+    # 返回 SSE 流
+    return EventSourceResponse(_summarize_stream_generator(flight))
+
+
+async def _prepare_resume(trace_id: str, files: Optional[List[UploadFile]]):
+    """读取检查点中的请求参数，检查能否继续
+    
+    Returns:
+        (请求参数, 上传内容, 上传开始时间, 上传结束时间, 引用的文档库文档)
+    """
+    if not config.CHECKPOINT:
+        raise HTTPException(status_code=400, detail="未启用 CHECKPOINT")
+    state = get_summarizer().checkpoints.load(trace_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"未找到检查点: {trace_id}")
+    request = state["request"]
+    uploads, upload_start, upload_end = await _read_uploads(files or [])
+    documents = []
+    if "doc_compress" not in state["stages"]:
+        # 逐文档压缩尚未完成：原请求引用的文档库文档需仍在库中，上传的文件需重新上传
+        documents = _resolve_documents(request.get("documents", []))
+        if not uploads and len(request.get("filenames", [])) > len(documents):
+            raise HTTPException(status_code=400, detail="检查点不含文档摘要，请重新上传文件")
+    return request, uploads, upload_start, upload_end, documents
+
+
+def _start_resume(trace_id: str, request: dict, uploads, upload_start: float, upload_end: float, documents=()) -> Flight:
+    fingerprint = _fingerprint(
+        uploads, request["report_type"], request["max_words"], request["max_paragraphs"],
+        request["requirements"], request["series_id"], resume=trace_id, documents=documents,
+    )
+    _admit(fingerprint)
+    return _start_summarize(
+        fingerprint, uploads, (upload_start, upload_end), request["report_type"], request["max_words"],
+        request["max_paragraphs"], request["requirements"], request["series_id"], resume_trace_id=trace_id,
+        documents=documents,
+    )
+
+
+@router.post("/report/resume/{trace_id}", response_model=SummarizeResponse)
+async def resume_report(trace_id: str, files: Optional[List[UploadFile]] = File(None)):
+    """从检查点继续失败的摘要流程（非流式）
+    
+    请求参数沿用原请求；逐文档压缩已完成时无需重新上传文件。
+    """
+    request, uploads, upload_start, upload_end, documents = await _prepare_resume(trace_id, files)
+    flight = _start_resume(trace_id, request, uploads, upload_start, upload_end, documents)
+    try:
+        result = await flight.wait()
+    except TaskConflictError as e:
+        # 分布式执行时同一 trace_id 的任务仍在等待或执行中
+        raise HTTPException(status_code=409, detail=str(e), headers={"X-Trace-Id": trace_id})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Trace-Id": trace_id})
+    return SummarizeResponse(**result)
+
+
+@router.post("/report/resume/{trace_id}/stream")
+async def resume_report_stream(trace_id: str, files: Optional[List[UploadFile]] = File(None)):
+    """从检查点继续失败的摘要流程（流式 SSE）
+    
+    从检查点恢复的阶段以 status 为 "restored" 的状态事件通知。
+    """
+    request, uploads, upload_start, upload_end, documents = await _prepare_resume(trace_id, files)
+    flight = _start_resume(trace_id, request, uploads, upload_start, upload_end, documents)
+    return EventSourceResponse(_summarize_stream_generator(flight))
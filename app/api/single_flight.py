@@ -0,0 +1,193 @@
+"""相同请求合并执行与结果缓存
+
+同一请求指纹（文件内容哈希 + 参数）同时只运行一次摘要流程：后到的请求挂到
+正在运行的 Flight 上，SSE 订阅者从同一事件流扇出（晚到者先重放已有事件，连续的
+content 事件合并为一个）；完成的结果按 TTL 缓存，供重试和看板刷新直接复用。
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+
+def request_fingerprint(uploads: List[Tuple[str, bytes]], **params) -> str:
+    """请求指纹
+
+    Args:
+        uploads: (filename, content) 列表，按上传顺序
+        **params: 其余影响结果的参数（report_type、max_words 等）
+
+    Returns:
+        str: SHA256 十六进制串
+    """
+    payload = {
+        "files": [(filename, hashlib.sha256(content).hexdigest()) for filename, content in uploads],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+class Subscription:
+    """一个 SSE 订阅者：先发送订阅时的历史事件，再从有界队列读取新事件"""
+
+    def __init__(self, backlog: List[dict], maxsize: int):
+        self.backlog = backlog
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def drop(self, event: dict) -> None:
+        """客户端接收过慢：丢弃积压的事件，只留下最后一个（错误）事件"""
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+def _content_event(text: str) -> dict:
+    return {"event": "content", "data": json.dumps({"delta": text}, ensure_ascii=False)}
+
+
+class Flight:
+    """一次正在运行的摘要流程：记录事件历史并扇出给所有订阅者
+
+    历史中连续的 content 增量只保存文本并在重放时合并为一个事件，其余事件最多保留
+    history_size 个（超出时先丢弃最早的 progress 事件）。publish 不等待订阅者：
+    队列已满（客户端接收过慢）的订阅者被断开并收到错误事件，不拖慢 LLM 流式读取
+    与其他订阅者。
+    """
+
+    def __init__(self, fingerprint: str, trace_id: str = "", queue_size: int = 256, history_size: int = 256):
+        self.fingerprint = fingerprint
+        self.trace_id = trace_id
+        self.queue_size = queue_size
+        self.history_size = history_size
+        # 事件或一段连续 content 增量的文本列表
+        self.history: List[Union[dict, List[str]]] = []
+        self.subscribers: List[Subscription] = []
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def _remember(self, event: dict) -> None:
+        if event["event"] == "content":
+            delta = json.loads(event["data"])["delta"]
+            if self.history and isinstance(self.history[-1], list):
+                self.history[-1].append(delta)
+            else:
+                self.history.append([delta])
+            return
+        self.history.append(event)
+        if len(self.history) > self.history_size:
+            for i, entry in enumerate(self.history):
+                if isinstance(entry, dict) and entry["event"] == "progress":
+                    del self.history[i]
+                    break
+
+    async def publish(self, event: dict) -> None:
+        """发布事件给所有订阅者（不等待；队列已满的订阅者被断开）"""
+        self._remember(event)
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.unsubscribe(sub)
+                sub.drop({
+                    "event": "error",
+                    "data": json.dumps({
+                        "message": "客户端接收过慢，连接已断开",
+                        "trace_id": self.trace_id
+                    }, ensure_ascii=False)
+                })
+
+    def subscribe(self) -> Subscription:
+        """订阅事件流（先重放已发布的事件，连续的 content 合并为一个事件）"""
+        backlog = [entry if isinstance(entry, dict) else _content_event("".join(entry)) for entry in self.history]
+        sub = Subscription(backlog, self.queue_size)
+        self.subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+
+    async def wait(self) -> dict:
+        """等待流程结束并返回结果（失败时抛出原异常）"""
+        await self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RequestCoordinator:
+    """管理进行中的 Flight 与带 TTL 的结果缓存"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int, queue_size: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.queue_size = queue_size
+        self._flights: Dict[str, Flight] = {}
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get_cached(self, fingerprint: str) -> Optional[dict]:
+        """返回未过期的缓存结果"""
+        entry = self._cache.get(fingerprint)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.time():
+            del self._cache[fingerprint]
+            return None
+        self._cache.move_to_end(fingerprint)
+        return result
+
+    def _store(self, fingerprint: str, result: dict) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._cache[fingerprint] = (time.time() + self.ttl_seconds, result)
+        self._cache.move_to_end(fingerprint)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def running(self, fingerprint: str) -> bool:
+        """是否有同指纹的流程正在运行（合并到该流程不产生新的 LLM 调用）"""
+        return fingerprint in self._flights
+
+    def join_or_start(
+        self,
+        fingerprint: str,
+        run: Callable[[Flight], Awaitable[dict]],
+        trace_id: str = "",
+    ) -> Tuple[Flight, bool]:
+        """挂到进行中的同指纹流程上，没有则启动新流程
+
+        Args:
+            fingerprint: 请求指纹
+            run: 执行摘要流程的协程函数，接收 Flight 用于发布事件，返回结果 dict
+            trace_id: 新启动流程的追踪ID
+
+        Returns:
+            (Flight, 是否为新启动的流程)
+        """
+        flight = self._flights.get(fingerprint)
+        if flight is not None:
+            return flight, False
+
+        flight = Flight(fingerprint, trace_id, self.queue_size, history_size=self.queue_size)
+        self._flights[fingerprint] = flight
+
+        async def runner():
+            try:
+                flight.result = await run(flight)
+                self._store(fingerprint, flight.result)
+            except BaseException as e:
+                flight.error = e
+            finally:
+                self._flights.pop(fingerprint, None)
+                flight.done.set()
+
+        # 独立任务运行：发起请求的客户端断开不影响其他订阅者
+        flight.task = asyncio.create_task(runner())
+        return flight, True
@@ -0,0 +1,66 @@
+"""SSE content 帧合并
+
+LLM 每个流式增量只有几个字，逐个发送会产生成千上万个极小的 SSE 帧。
+这里把增量缓存起来，累计达到 max_chars 或距缓存中第一个增量超过
+interval_ms 时合并为一个 content 事件发送。
+
+定时发送与达到字数时的发送可能同时进行；emit 可能让出事件循环（如 worker 经线程写入任务队列），
+取出缓存与发送都在同一把锁内完成，保证各帧按增量到达顺序发出。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+
+
+class ContentCoalescer:
+    """按大小或时间窗口合并流式增量"""
+
+    def __init__(self, emit: Callable[[str], Awaitable[None]], max_chars: int, interval_ms: float):
+        """
+        Args:
+            emit: 发送合并后文本的协程函数
+            max_chars: 缓存达到该字数立即发送
+            interval_ms: 缓存中第一个增量最多等待的毫秒数
+        """
+        self.emit = emit
+        self.max_chars = max_chars
+        self.interval = interval_ms / 1000
+        self._buffer: List[str] = []
+        self._size = 0
+        self._first_at: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, delta: str) -> None:
+        """加入一个增量"""
+        self._buffer.append(delta)
+        self._size += len(delta)
+        if self._first_at is None:
+            self._first_at = time.time()
+            # 之后没有新的增量时也要按时发送
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._flush_later)
+        if self._size >= self.max_chars or time.time() - self._first_at >= self.interval:
+            await self.flush()
+
+    def _flush_later(self) -> None:
+        self._timer = None
+        self._pending = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """发送缓存中的全部增量"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer, self._size, self._first_at = [], 0, None
+            await self.emit(text)
+
+    async def drain(self) -> None:
+        """发送剩余增量并等待定时发送完成（在发布其他事件之前调用，保证事件顺序）"""
+        await self.flush()
+        if self._pending is not None and not self._pending.done():
+            await self._pending
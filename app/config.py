@@ -13,6 +13,10 @@ class ReportType(str, Enum):
     REGULAR = "常态化分析报告"
 
 
+# 调用 LLM 的阶段类别，每个阶段可单独配置模型与端点
+LLM_STAGES = ("doc_compress", "global_compress", "validate")
+
+
 REPORT_TYPE_DESCRIPTIONS = {
     ReportType.ELECTRICITY_DEMAND: "主体是针对特定时间节点的负荷或电量进行预测的报告",
     ReportType.PEAK_SUMMER_WINTER: "针对迎峰度冬/度夏期间最大负荷进行复盘分析的报告",
@@ -22,6 +26,22 @@ REPORT_TYPE_DESCRIPTIONS = {
 }
 
 
+# 报告关注点关键词（时间口径、区域、产业/行业、核心指标），用于表格筛选等
+_COMMON_FOCUS_TERMS = [
+    "全国", "经营区", "华北", "华东", "华中", "东北", "西北", "西南",
+    "一产", "二产", "三产", "第一产业", "第二产业", "第三产业", "居民", "工业", "制造业", "服务业",
+    "负荷", "用电量", "电量", "同比", "环比", "增速", "增长",
+]
+
+REPORT_TYPE_FOCUS_TERMS = {
+    ReportType.ELECTRICITY_DEMAND: _COMMON_FOCUS_TERMS + ["预测", "最大负荷", "气温", "寒潮", "高温", "历史极值"],
+    ReportType.PEAK_SUMMER_WINTER: _COMMON_FOCUS_TERMS + ["迎峰", "度冬", "度夏", "最大负荷", "供需", "缺口", "备用"],
+    ReportType.SPECIAL_TOPIC: _COMMON_FOCUS_TERMS + ["专题", "影响", "事件"],
+    ReportType.TEMPORARY: _COMMON_FOCUS_TERMS + ["变化", "异常", "波动"],
+    ReportType.REGULAR: _COMMON_FOCUS_TERMS + ["日", "周", "旬", "月", "年", "累计"],
+}
+
+
 class Config:
     """应用配置类"""
     
@@ -39,6 +59,119 @@ class Config:
     LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "http://0.0.0.0:10010/v1")
     LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+    LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", "8196"))
+    
+    # 分阶段 LLM 配置（未设置时沿用上面的 LLM_* 配置）
+    DOC_COMPRESS_LLM_MODEL: str = os.getenv("DOC_COMPRESS_LLM_MODEL", LLM_MODEL)
+    DOC_COMPRESS_LLM_BASE_URL: str = os.getenv("DOC_COMPRESS_LLM_BASE_URL", LLM_BASE_URL)
+    DOC_COMPRESS_LLM_API_KEY: str = os.getenv("DOC_COMPRESS_LLM_API_KEY", LLM_API_KEY)
+    DOC_COMPRESS_LLM_TEMPERATURE: float = float(os.getenv("DOC_COMPRESS_LLM_TEMPERATURE", str(LLM_TEMPERATURE)))
+    DOC_COMPRESS_LLM_MAX_TOKENS: int = int(os.getenv("DOC_COMPRESS_LLM_MAX_TOKENS", str(LLM_MAX_TOKENS)))
+    GLOBAL_COMPRESS_LLM_MODEL: str = os.getenv("GLOBAL_COMPRESS_LLM_MODEL", LLM_MODEL)
+    GLOBAL_COMPRESS_LLM_BASE_URL: str = os.getenv("GLOBAL_COMPRESS_LLM_BASE_URL", LLM_BASE_URL)
+    GLOBAL_COMPRESS_LLM_API_KEY: str = os.getenv("GLOBAL_COMPRESS_LLM_API_KEY", LLM_API_KEY)
+    GLOBAL_COMPRESS_LLM_TEMPERATURE: float = float(os.getenv("GLOBAL_COMPRESS_LLM_TEMPERATURE", str(LLM_TEMPERATURE)))
+    GLOBAL_COMPRESS_LLM_MAX_TOKENS: int = int(os.getenv("GLOBAL_COMPRESS_LLM_MAX_TOKENS", str(LLM_MAX_TOKENS)))
+    VALIDATE_LLM_MODEL: str = os.getenv("VALIDATE_LLM_MODEL", LLM_MODEL)
+    VALIDATE_LLM_BASE_URL: str = os.getenv("VALIDATE_LLM_BASE_URL", LLM_BASE_URL)
+    VALIDATE_LLM_API_KEY: str = os.getenv("VALIDATE_LLM_API_KEY", LLM_API_KEY)
+    VALIDATE_LLM_TEMPERATURE: float = float(os.getenv("VALIDATE_LLM_TEMPERATURE", str(LLM_TEMPERATURE)))
+    VALIDATE_LLM_MAX_TOKENS: int = int(os.getenv("VALIDATE_LLM_MAX_TOKENS", str(LLM_MAX_TOKENS)))
+    
+    # 进程内同时进行的 LLM 调用上限，0 表示不限制；流水线模式（流式解析、内存受限）下也是单个请求的并行度
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+    PIPELINE_DEFAULT_CONCURRENCY: int = 4  # 未设置 LLM_MAX_CONCURRENCY 时流水线模式单个请求的并行度
+    # LLM 调用模式：live（在线）/ record（在线并录制）/ replay（回放录制，不访问模型）
+    LLM_MODE: str = os.getenv("LLM_MODE", "live").lower()
+    LLM_RECORD_DIR: str = os.getenv("LLM_RECORD_DIR", "recordings")
+    LLM_REPLAY_TIME_SCALE: float = float(os.getenv("LLM_REPLAY_TIME_SCALE", "1.0"))  # 0 表示不等待
+    LLM_REPLAY_TRACE_ID: str = os.getenv("LLM_REPLAY_TRACE_ID", "")  # 只回放某一次请求，为空则加载全部录制
+    
+    # 单次调用输出预算：按目标字数 × 系数设置 max_tokens，超出预算后在段落/句子边界提前结束
+    OUTPUT_BUDGET: bool = os.getenv("OUTPUT_BUDGET", "true").lower() in ("1", "true", "yes")
+    OUTPUT_BUDGET_MARGIN: float = float(os.getenv("OUTPUT_BUDGET_MARGIN", "1.3"))
+    OUTPUT_TOKENS_PER_CHAR: float = float(os.getenv("OUTPUT_TOKENS_PER_CHAR", "1.0"))  # 按模型分词器调整
+    
+    # 工作流配置
+    FAST_PARSERS: bool = os.getenv("FAST_PARSERS", "true").lower() in ("1", "true", "yes")  # .md/.txt/.docx 不经过 MarkItDown
+    STREAMING_PARSE: bool = os.getenv("STREAMING_PARSE", "false").lower() in ("1", "true", "yes")
+    DOC_CHUNK_MAX_CHARS: int = int(os.getenv("DOC_CHUNK_MAX_CHARS", "6000"))  # 逐文档压缩分块预算
+    GLOBAL_CHUNK_MAX_CHARS: int = int(os.getenv("GLOBAL_CHUNK_MAX_CHARS", "5000"))  # 总体压缩分块预算
+    ADAPTIVE_CHUNKING: bool = os.getenv("ADAPTIVE_CHUNKING", "false").lower() in ("1", "true", "yes")
+    PLANNER_MIN_CHARS: int = int(os.getenv("PLANNER_MIN_CHARS", "2000"))
+    PLANNER_MAX_CHARS: int = int(os.getenv("PLANNER_MAX_CHARS", "12000"))
+    PLANNER_EXPORT_PATH: str = os.getenv("PLANNER_EXPORT_PATH", "")  # 规划决策导出（JSON 行），为空则不导出
+    SECTION_REUSE: bool = os.getenv("SECTION_REUSE", "false").lower() in ("1", "true", "yes")
+    SECTION_STORE_DIR: str = os.getenv("SECTION_STORE_DIR", "cache/sections")
+    SECTION_STORE_MAX_ENTRIES: int = int(os.getenv("SECTION_STORE_MAX_ENTRIES", "2000"))  # 每个报告系列保留的分块数
+    SECTION_STORE_MAX_SERIES: int = int(os.getenv("SECTION_STORE_MAX_SERIES", "64"))  # 内存中缓存的报告系列数
+    TEXT_NORMALIZE: bool = os.getenv("TEXT_NORMALIZE", "false").lower() in ("1", "true", "yes")  # 清理页眉页脚、页码、目录等版面噪声
+    NORMALIZE_MIN_REPEATS: int = int(os.getenv("NORMALIZE_MIN_REPEATS", "3"))  # 页眉页脚至少重复出现的页数
+    TABLE_COMPACT: bool = os.getenv("TABLE_COMPACT", "false").lower() in ("1", "true", "yes")
+    TABLE_FOCUS_FILTER: bool = os.getenv("TABLE_FOCUS_FILTER", "false").lower() in ("1", "true", "yes")
+    STREAMING_REDUCE: bool = os.getenv("STREAMING_REDUCE", "false").lower() in ("1", "true", "yes")
+    RETRIEVAL: bool = os.getenv("RETRIEVAL", "false").lower() in ("1", "true", "yes")
+    RETRIEVAL_BUDGET_CHARS: int = int(os.getenv("RETRIEVAL_BUDGET_CHARS", "30000"))  # 按特定要求检索后保留的章节总字数
+    FACT_EXTRACTION: bool = os.getenv("FACT_EXTRACTION", "false").lower() in ("1", "true", "yes")
+    VALIDATE_EDIT_SCRIPT: bool = os.getenv("VALIDATE_EDIT_SCRIPT", "false").lower() in ("1", "true", "yes")  # 验证阶段只输出段落编辑指令
+    BUDGET_ALLOCATION: bool = os.getenv("BUDGET_ALLOCATION", "false").lower() in ("1", "true", "yes")
+    BUDGET_MIN_DOC_CHARS: int = int(os.getenv("BUDGET_MIN_DOC_CHARS", "200"))  # 每份文档摘要的最小目标字数
+    BUDGET_MAX_RATIO: float = float(os.getenv("BUDGET_MAX_RATIO", "0.5"))  # 目标字数不超过原文字数的比例
+    BOUNDED_MEMORY: bool = os.getenv("BOUNDED_MEMORY", "false").lower() in ("1", "true", "yes")
+    MEMORY_BUDGET_MB: int = int(os.getenv("MEMORY_BUDGET_MB", "64"))  # 每个请求驻留内存的文本上限
+    SPILL_DIR: str = os.getenv("SPILL_DIR", "")  # 解析文本落盘目录，为空则使用系统临时目录
+    
+    # 阶段检查点
+    CHECKPOINT: bool = os.getenv("CHECKPOINT", "false").lower() in ("1", "true", "yes")
+    CHECKPOINT_DIR: str = os.getenv("CHECKPOINT_DIR", "cache/checkpoints")
+    CHECKPOINT_MAX_ENTRIES: int = int(os.getenv("CHECKPOINT_MAX_ENTRIES", "200"))
+    
+    # 文档库（上传一次，按内容哈希引用）
+    DOCUMENT_STORE_DIR: str = os.getenv("DOCUMENT_STORE_DIR", "cache/documents")
+    DOCUMENT_STORE_QUOTA_MB: int = int(os.getenv("DOCUMENT_STORE_QUOTA_MB", "2048"))  # 原文件、解析结果与摘要的总配额
+    
+    # 过载保护（阈值含义见 app/workflow/overload.py）
+    OVERLOAD_CONTROL: bool = os.getenv("OVERLOAD_CONTROL", "false").lower() in ("1", "true", "yes")
+    OVERLOAD_MAX_INFLIGHT: int = int(os.getenv("OVERLOAD_MAX_INFLIGHT", "0"))  # 进行中 LLM 调用数阈值，0 表示 LLM_MAX_CONCURRENCY 的 2 倍
+    OVERLOAD_QUEUE_WAIT_MS: float = float(os.getenv("OVERLOAD_QUEUE_WAIT_MS", "5000"))  # 排队等待时间阈值
+    OVERLOAD_RETRY_AFTER: int = int(os.getenv("OVERLOAD_RETRY_AFTER", "30"))  # 拒绝时 Retry-After 的最小秒数
+    OVERLOAD_CHUNK_SCALE: float = float(os.getenv("OVERLOAD_CHUNK_SCALE", "2.0"))  # 降级时分块放大倍数
+    OVERLOAD_EXTRACTIVE_RATIO: float = float(os.getenv("OVERLOAD_EXTRACTIVE_RATIO", "0.5"))  # 抽取式预压缩保留的字数比例
+    
+    # 分布式执行：API 节点把摘要流程放入任务队列，由 worker 进程（python -m app.worker）执行
+    DISTRIBUTED: bool = os.getenv("DISTRIBUTED", "false").lower() in ("1", "true", "yes")
+    BROKER: str = os.getenv("BROKER", "")  # 自定义任务队列 "模块路径:类名"，为空则使用本地 SQLite
+    BROKER_SQLITE_PATH: str = os.getenv("BROKER_SQLITE_PATH", "cache/broker.db")
+    BROKER_POLL_MS: float = float(os.getenv("BROKER_POLL_MS", "200"))  # 领取任务与转发事件的轮询间隔
+    BROKER_LEASE_SECONDS: float = float(os.getenv("BROKER_LEASE_SECONDS", "60"))  # worker 租约，过期未续约视为失联
+    BROKER_QUEUE_TIMEOUT: float = float(os.getenv("BROKER_QUEUE_TIMEOUT", "600"))  # 等待 worker 领取的最长秒数，0 表示不限
+    BROKER_RETENTION_SECONDS: float = float(os.getenv("BROKER_RETENTION_SECONDS", "3600"))  # 已结束任务的保留时间
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "2"))  # 每个 worker 进程同时执行的任务数
+
+    # 请求合并与结果缓存
+    RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", "600"))  # 秒，0 表示不缓存
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100"))
+    
+    # SSE 配置
+    SSE_FLUSH_CHARS: int = int(os.getenv("SSE_FLUSH_CHARS", "256"))  # content 帧合并字数
+    SSE_FLUSH_INTERVAL_MS: float = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "50"))  # content 帧最长合并时间
+    SSE_QUEUE_MAX_EVENTS: int = int(os.getenv("SSE_QUEUE_MAX_EVENTS", "256"))  # 每个连接待发送事件上限，队列满时断开该连接
+    
+    # 日志配置
+    LOG_DIR: str = os.getenv("LOG_DIR", "logs")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", "52428800"))  # 50MB
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # 冗长日志采样比例
+    AGENTSCOPE_LOGGING_LEVEL: str = os.getenv("AGENTSCOPE_LOGGING_LEVEL", "INFO")
+    
+    # 链路追踪配置
+    TRACING: bool = os.getenv("TRACING", "false").lower() in ("1", "true", "yes")
+    TRACE_DIR: str = os.getenv("TRACE_DIR", "traces")
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "")  # 自定义导出器 "模块路径:类名"，为空则写本地文件
+    
+    # 启动配置
+    LLM_WARMUP: bool = os.getenv("LLM_WARMUP", "false").lower() in ("1", "true", "yes")
     
     # 默认约束
     DEFAULT_MAX_WORDS: int = 8196
@@ -54,6 +187,23 @@ class Config:
             }
             for rt in ReportType
         ]
+    
+    @classmethod
+    def pipeline_concurrency(cls) -> int:
+        """流水线模式下单个请求同时进行的 LLM 调用数"""
+        return cls.LLM_MAX_CONCURRENCY if cls.LLM_MAX_CONCURRENCY > 0 else cls.PIPELINE_DEFAULT_CONCURRENCY
+    
+    @classmethod
+    def stage_llm_settings(cls, stage: str) -> dict:
+        """获取某阶段（doc_compress / global_compress / validate）的 LLM 配置"""
+        prefix = stage.upper()
+        return {
+            "model": getattr(cls, f"{prefix}_LLM_MODEL"),
+            "base_url": getattr(cls, f"{prefix}_LLM_BASE_URL"),
+            "api_key": getattr(cls, f"{prefix}_LLM_API_KEY"),
+            "temperature": getattr(cls, f"{prefix}_LLM_TEMPERATURE"),
+            "max_tokens": getattr(cls, f"{prefix}_LLM_MAX_TOKENS"),
+        }
 
 
 # 全局配置实例
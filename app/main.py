@@ -1,37 +1,76 @@
 """主程序入口"""
 import uvicorn
+import asyncio
 import logging
-import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import Config
-from app.api.routes import router
+from app.api.routes import router, get_summarizer
 from app.workflow.summarizer import init_agentscope
+from app.utils.background_writer import background_writer
+from app.utils.tracing import tracer
+from app.utils.logging_setup import setup_logging, shutdown_logging
 
-os.makedirs("logs", exist_ok=True)
-# 配置日志 - 同时输出到控制台和文件
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        logging.FileHandler('logs/app.log', encoding='utf-8')  # 输出到文件
-    ]
-)
+# 配置日志 - 经队列异步输出到控制台和滚动文件
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
 # 初始化配置
 config = Config()
 
-# 初始化 AgentScope
-init_agentscope()
+# 就绪状态（与 /health 分离，供负载均衡/自动扩缩容判断）
+readiness = {
+    "ready": False,
+    "warmup": "pending",
+    "startup_ms": None,
+}
+
+
+async def _prepare_service():
+    """后台初始化：AgentScope、重量级组件与可选的 LLM 预热"""
+    start = asyncio.get_running_loop().time()
+    try:
+        await asyncio.to_thread(init_agentscope)
+        summarizer = get_summarizer()
+        await asyncio.to_thread(summarizer.preload)
+        if config.LLM_WARMUP:
+            try:
+                await summarizer.warm_up()
+                readiness["warmup"] = "ok"
+            except Exception as e:
+                logger.warning(f"LLM 预热失败: {str(e)}")
+                readiness["warmup"] = "failed"
+        else:
+            readiness["warmup"] = "skipped"
+    except Exception as e:
+        logger.error(f"服务初始化失败: {str(e)}")
+        return
+    readiness["startup_ms"] = (asyncio.get_running_loop().time() - start) * 1000
+    readiness["ready"] = True
+    logger.info(f"服务就绪，初始化耗时: {readiness['startup_ms']:.1f} ms, 预热: {readiness['warmup']}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：初始化在后台进行，不阻塞 /health"""
+    task = asyncio.create_task(_prepare_service())
+    yield
+    if not task.done():
+        task.cancel()
+    tracer.flush(timeout=5)
+    background_writer.flush(timeout=5)
+    shutdown_logging()
+
 
 # 创建 FastAPI 应用
 app = FastAPI(
     title="精简报告生成服务",
     description="基于 AgentScope 的报告摘要生成服务",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 配置 CORS
@@ -63,6 +102,14 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready():
+    """就绪检查（初始化与预热完成前返回 503）"""
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **readiness})
+    return {"status": "ready", **readiness}
+
+
 if __name__ == "__main__":
     logger.info(f"启动服务器: {config.HOST}:{config.PORT}")
     uvicorn.run(
@@ -1,5 +1,5 @@
 """数据模型和请求/响应 schemas"""
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -35,6 +35,24 @@ class DocumentSummary(BaseModel):
     """文档摘要"""
     doc_id: str
     summary_md: str
+    filename: str = ""
+
+
+class StoredDocument(BaseModel):
+    """文档库中的文档"""
+    doc_id: str  # 内容的 SHA256
+    filename: str
+    size: int  # 原文件字节数
+    bytes: int  # 含解析结果与摘要的总字节数
+    created_at: float
+    last_used: float
+
+
+class StoredDocumentListResponse(BaseModel):
+    """文档库列表响应"""
+    documents: List[StoredDocument]
+    used_bytes: int
+    quota_bytes: int
 
 
 class MetaInfo(BaseModel):
@@ -48,6 +66,12 @@ class MetaInfo(BaseModel):
     stage_durations_ms: dict
     trace_id: str
     warnings: List[str] = []
+    section_reuse_ratio: Optional[float] = None  # 周期性报告复用上一期摘要的分块比例
+    document_stats: Dict[str, dict] = {}  # 按文件名记录的预处理统计（如表格紧凑化缩减比例）
+    stage_models: Dict[str, str] = {}  # 各阶段（doc_compress / global_compress / validate）实际调用的模型
+    memory: Optional[dict] = None  # 内存受限模式的预算、峰值与落盘字节数
+    fact_stats: Optional[dict] = None  # 事实抽取模式的记录数与总体压缩输入字数
+    validate_stats: Optional[dict] = None  # 编辑指令模式的验证统计
 
 
 class SummarizeResponse(BaseModel):
@@ -6,14 +6,14 @@ from app.config import ReportType
 class PromptTemplates:
     """Prompt 模板类"""
     
-    # 逐文档压缩 Prompt
+    # 逐文档压缩 Prompt（target_block 为按文档信息量分配的目标长度，未分配时为空）
     DOC_COMPRESS_TEMPLATES: Dict[ReportType, str] = {
         ReportType.ELECTRICITY_DEMAND: """你是一位专业的电力需求分析专家。请对以下报告进行精炼和压缩，提取关键信息。
 
 要求：
 1. 保留核心数据、趋势分析和结论
 2. 去除冗余描述和无关内容
-3. 特别关注：时间范围、气候趋势、预测结论、历史对比数据、分产业/区域/行业数据、影响因素规律、建议措施
+3. 特别关注：时间范围、气候趋势、预测结论、历史对比数据、分产业/区域/行业数据、影响因素规律、建议措施{target_block}
 
 原始报告内容：
 {text_md}
@@ -25,7 +25,7 @@ class PromptTemplates:
 要求：
 1. 保留供需平衡分析、负荷预测、保供措施等核心内容
 2. 去除冗余描述和无关内容
-3. 特别关注：时间范围、气候趋势、负荷预测结论、历史对比数据、分区域负荷数据、供需平衡分析、保供措施
+3. 特别关注：时间范围、气候趋势、负荷预测结论、历史对比数据、分区域负荷数据、供需平衡分析、保供措施{target_block}
 
 原始报告内容：
 {text_md}
@@ -37,7 +37,7 @@ class PromptTemplates:
 要求：
 1. 保留专题的核心观点、分析方法和结论
 2. 去除冗余描述和无关内容
-3. 特别关注：时间范围、专题背景、核心观点、分析维度、关键数据、影响因素、建议措施
+3. 特别关注：时间范围、专题背景、核心观点、分析维度、关键数据、影响因素、建议措施{target_block}
 
 原始报告内容：
 {text_md}
@@ -49,7 +49,7 @@ class PromptTemplates:
 要求：
 1. 保留分析目的、关键数据和结论
 2. 去除冗余描述和无关内容
-3. 特别关注：时间范围、分析背景、核心发现、关键数据、影响因素、建议措施
+3. 特别关注：时间范围、分析背景、核心发现、关键数据、影响因素、建议措施{target_block}
 
 原始报告内容：
 {text_md}
@@ -61,7 +61,7 @@ class PromptTemplates:
 要求：
 1. 保留定期分析的关键指标、趋势和异常情况
 2. 去除冗余描述和无关内容
-3. 特别关注：时间范围、关键指标、趋势变化、异常情况、影响因素、建议措施
+3. 特别关注：时间范围、关键指标、趋势变化、异常情况、影响因素、建议措施{target_block}
 
 原始报告内容：
 {text_md}
@@ -69,6 +69,25 @@ class PromptTemplates:
 请输出压缩后的报告摘要：""",
     }
     
+    # 事实抽取 Prompt（FACT_EXTRACTION 模式下代替逐文档压缩）
+    FACT_EXTRACT_TEMPLATE: str = """你是一位专业的电力分析报告信息抽取专家。请从以下报告内容中抽取事实记录。
+
+要求：
+1. 每行输出一条 JSON 记录，不要输出其他内容，字段为：
+   - period：时间范围（如"2024年1-6月"）
+   - metric：指标（如"全社会用电量""最大负荷"）
+   - scope：地区/产业/行业（如"江苏""第二产业"），没有则为空
+   - value：数值及单位（如"3620亿千瓦时"）
+   - yoy：同比或环比变化（如"+6.8%"），没有则为空
+   - statement：补充说明；没有具体数值的结论、原因、预测判断与建议措施也记为一条记录，此时 value 为空、内容写在 statement 中
+2. 每个数值只记录一次，不要改写或推算原文没有的数值
+3. 特别关注：{focus}
+
+原始报告内容：
+{text_md}
+
+请输出 JSON 行："""
+    
     # 总体压缩 Prompt
     GLOBAL_COMPRESS_TEMPLATES: Dict[ReportType, str] = {
         ReportType.ELECTRICITY_DEMAND: """你是一位专业的电力需求分析专家。请将以下多份报告摘要融合，生成一份精简的综合报告。
@@ -433,6 +452,31 @@ class PromptTemplates:
 请直接输出最终报告内容：""",
     }
 
+    # 验证和修订 Prompt（编辑指令模式，VALIDATE_EDIT_SCRIPT）
+    VALIDATE_EDIT_TEMPLATE: str = """你是一位专业的报告审核专家。请对以下报告进行自检，以编辑指令的形式给出必要的修订。
+
+检查清单：
+1. 字数是否 <= {max_words}（当前字数：{current_words}）
+2. 段落数是否 <= {max_paragraphs}（当前段落数：{current_paragraphs}，标题不计入）
+3. 是否满足特定要求：{requirements}
+4. 是否存在明显重复内容
+
+报告已按段落编号（格式为“[序号] 段落内容”）。不要重新输出整篇报告，只针对需要修改的段落每行输出一条 JSON 指令：
+- 删除段落：{{"op": "delete", "index": 序号}}
+- 改写段落：{{"op": "replace", "index": 序号, "text": "改写后的段落"}}
+- 精简段落：{{"op": "shorten", "index": 序号, "text": "精简后的段落"}}
+
+要求：
+1. 每个段落最多一条指令，序号必须是报告中出现的序号
+2. 改写或精简后的段落不要带序号，保持原有的 Markdown 格式
+3. 如果报告满足所有约束条件，只输出 []
+4. 不要输出任何说明性文字
+
+待审核报告：
+{numbered_report}
+
+请输出编辑指令："""
+
 
 def get_prompt_templates() -> PromptTemplates:
     """获取 Prompt 模板实例"""
@@ -0,0 +1,75 @@
+"""后台文件写入 - 把请求路径上的追加写盘交给后台线程
+
+调用方只把 (路径, 内容) 放入内存队列，由单个后台线程按顺序写盘，
+避免同步文件 I/O 阻塞事件循环。同一路径的写入保持提交顺序。
+
+用法：
+    background_writer.append(path, line)   # 追加写入
+    background_writer.write(path, text)    # 覆盖写入
+    background_writer.flush()              # 等待已提交的写入完成（测试、退出时）
+"""
+import logging
+import os
+import queue
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    """单线程顺序写盘，首次提交时启动"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def append(self, path: str, text: str) -> None:
+        """追加写入 text"""
+        self._submit(path, text, "a")
+
+    def write(self, path: str, text: str) -> None:
+        """覆盖写入 text（先写临时文件再替换）"""
+        self._submit(path, text, "w")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的写入完成"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((None, done, ""))
+        done.wait(timeout)
+
+    def _submit(self, path: str, text: str, mode: str) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+                    self._thread.start()
+        self._queue.put((path, text, mode))
+
+    def _run(self) -> None:
+        while True:
+            path, payload, mode = self._queue.get()
+            if path is None:
+                payload.set()
+                continue
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if mode == "a":
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(payload)
+                else:
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(payload)
+                    os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"后台写入失败: {path} ({e})")
+
+
+# 全局实例
+background_writer = BackgroundWriter()
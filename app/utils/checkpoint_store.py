@@ -0,0 +1,77 @@
+"""阶段检查点 - 失败后从最近完成的阶段继续
+
+每个 trace_id 一个 JSON 文件，保存请求参数与已完成阶段的中间结果：
+
+    {
+        "request": {"report_type": ..., "max_words": ..., "filenames": [...], "documents": [doc_id, ...], ...},
+        "stages": {
+            "doc_compress": [{"doc_id": ..., "summary_md": ...}, ...],
+            "global_compress_parts": {"<prompt 哈希>": "...", ...},
+            "global_compress": "..."
+        },
+        "updated_at": 1700000000.0
+    }
+
+运行成功后删除；最多保留 max_entries 个，超出时删除最早更新的。
+"""
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+
+class CheckpointStore:
+    """按 trace_id 保存的阶段检查点"""
+
+    def __init__(self, base_dir: str, max_entries: int):
+        self.base_dir = base_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, trace_id: str) -> str:
+        return os.path.join(self.base_dir, f"{os.path.basename(trace_id)}.json")
+
+    def load(self, trace_id: str) -> Optional[dict]:
+        """读取检查点，不存在时返回 None"""
+        path = self._path(trace_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, trace_id: str, stages: dict, request: Optional[dict] = None) -> None:
+        """写入检查点
+
+        Args:
+            trace_id: 追踪ID
+            stages: 已完成阶段的全部中间结果（整体覆盖）
+            request: 请求参数（为 None 时沿用已保存的）
+        """
+        with self._lock:
+            os.makedirs(self.base_dir, exist_ok=True)
+            if request is None:
+                request = (self.load(trace_id) or {}).get("request", {})
+            payload = {"request": request, "stages": stages, "updated_at": time.time()}
+            tmp_path = self._path(trace_id) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(trace_id))
+            self._prune()
+
+    def delete(self, trace_id: str) -> None:
+        path = self._path(trace_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _prune(self) -> None:
+        files = [
+            os.path.join(self.base_dir, name)
+            for name in os.listdir(self.base_dir)
+            if name.endswith(".json")
+        ]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            os.remove(path)
@@ -1,17 +1,34 @@
-"""文档解析工具 - 使用 MarkItDown"""
+"""文档解析工具 - 常见格式使用快速解析器，其余使用 MarkItDown"""
 import os
 import hashlib
+import logging
 import uuid
-from typing import List
-from markitdown import MarkItDown
+from typing import Iterator, List
 from app.models.schemas import DocumentInfo
+from app.utils.format_parsers import get_parser
+
+logger = logging.getLogger(__name__)
 
 
 class DocumentParser:
     """文档解析器"""
     
-    def __init__(self):
-        self.markitdown = MarkItDown()
+    def __init__(self, fast_parsers: bool = True):
+        """
+        Args:
+            fast_parsers: 是否对已注册的格式（.md/.txt/.docx）使用快速解析器
+        """
+        self.fast_parsers = fast_parsers
+        self._markitdown = None
+    
+    @property
+    def markitdown(self):
+        """MarkItDown 转换器（首次访问时导入并创建）"""
+        if self._markitdown is None:
+            from markitdown import MarkItDown
+            
+            self._markitdown = MarkItDown()
+        return self._markitdown
     
     def parse_file(self, file_path: str, filename: str) -> DocumentInfo:
         """解析单个文件为 Markdown
@@ -27,8 +44,7 @@ class DocumentParser:
         warnings = []
         
         try:
-            result = self.markitdown.convert(file_path)
-            text_md = result.text_content
+            text_md = "\n\n".join(self._iter_blocks(file_path))
             
             # 检查文本是否为空或过短
             if not text_md or len(text_md.strip()) < 10:
@@ -49,6 +65,98 @@ class DocumentParser:
                 warnings=warnings
             )
     
+    def iter_sections(self, file_path: str, buffered: bool = True) -> Iterator[str]:
+        """流式解析文件，逐页（PDF）或逐节（其他格式）产出 Markdown 片段
+        
+        PDF 在安装了 pdfminer 时逐页提取，无需等待整份文档转换完成；
+        其他格式或缺少 pdfminer 时回退为 MarkItDown 整体转换后按标题切分。
+        
+        Args:
+            file_path: 文件路径
+            buffered: 快速解析器是否先完整解析再产出（见 _iter_blocks）
+            
+        Yields:
+            str: Markdown 片段
+        """
+        if os.path.splitext(file_path)[1].lower() == ".pdf" and _pdfminer_available():
+            yield from self._iter_pdf_pages(file_path)
+            return
+        
+        # 快速解析器逐块产出，遇到标题即结束上一节
+        current: List[str] = []
+        for block in self._iter_blocks(file_path, buffered):
+            for section in self.split_sections(block):
+                if section.lstrip().startswith("#") and current:
+                    yield "\n\n".join(current)
+                    current = []
+                current.append(section)
+        if current:
+            yield "\n\n".join(current)
+    
+    def _iter_blocks(self, file_path: str, buffered: bool = True) -> Iterator[str]:
+        """按检测到的文件类型选择解析器，逐块产出 Markdown；快速解析失败时回退到 MarkItDown
+        
+        Args:
+            file_path: 文件路径
+            buffered: 为 True 时快速解析器先完整解析（失败时不会产出半份文档）；为 False 时
+                边解析边产出，不在内存中保留整份文档，只有在产出第一块之前失败才回退
+        """
+        parser = get_parser(file_path) if self.fast_parsers else None
+        if parser is not None:
+            if not buffered:
+                yielded = False
+                try:
+                    for block in parser(file_path):
+                        yielded = True
+                        yield block
+                    return
+                except Exception as e:
+                    if yielded:
+                        raise
+                    logger.warning(f"快速解析失败，回退到 MarkItDown: {os.path.basename(file_path)}: {e}")
+            else:
+                try:
+                    # 先完整解析，失败时不会产出半份文档
+                    blocks = list(parser(file_path))
+                except Exception as e:
+                    logger.warning(f"快速解析失败，回退到 MarkItDown: {os.path.basename(file_path)}: {e}")
+                else:
+                    yield from blocks
+                    return
+        yield self.markitdown.convert(file_path).text_content or ""
+    
+    @staticmethod
+    def _iter_pdf_pages(file_path: str) -> Iterator[str]:
+        """使用 pdfminer 逐页提取 PDF 文本"""
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+        
+        for page in extract_pages(file_path):
+            text = "".join(el.get_text() for el in page if isinstance(el, LTTextContainer))
+            if text.strip():
+                yield text
+    
+    @staticmethod
+    def split_sections(text_md: str) -> List[str]:
+        """按 Markdown 标题行切分为小节（每个小节以标题开头，首节可无标题）
+        
+        Args:
+            text_md: Markdown 文本
+            
+        Returns:
+            List[str]: 小节列表
+        """
+        sections = []
+        current: List[str] = []
+        for line in text_md.split("\n"):
+            if line.lstrip().startswith("#") and current:
+                sections.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            sections.append("\n".join(current))
+        return [sec for sec in sections if sec.strip()]
+    
     def parse_files(self, file_paths: List[tuple]) -> List[DocumentInfo]:
         """解析多个文件
         
@@ -70,4 +178,13 @@ class DocumentParser:
         Returns:
             str: SHA256 哈希值
         """
-        return hashlib.sha256(content.encode()).hexdigest()
\ No newline at end of file
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _pdfminer_available() -> bool:
+    """检查可选依赖 pdfminer 是否可用"""
+    try:
+        import pdfminer.high_level  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,227 @@
+"""文档库 - 上传一次，按内容哈希引用
+
+每个文档以内容的 SHA256 为 ID 保存在 base_dir/<doc_id>/ 下：
+
+    source<扩展名>     原文件
+    parsed.md          解析出的 Markdown（首次解析后写入）
+    summaries/<key>.md 逐文档压缩摘要（按报告类型等配置区分）
+    meta.json          文件名、字节数、创建与最近使用时间
+
+全部文档的总字节数（含解析结果与摘要）超过配额时，按最近使用时间淘汰；
+正在被摘要流程使用（pin）的文档不会被淘汰。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+_TOUCH_PERSIST_SECONDS = 60.0  # 最近使用时间落盘的最小间隔（内存中的时间总是最新的）
+
+
+class DocumentTooLargeError(ValueError):
+    """单个文件超过文档库配额"""
+
+
+class DocumentStore:
+    """按内容哈希保存的文档库"""
+
+    def __init__(self, base_dir: str, quota_bytes: int):
+        self.base_dir = base_dir
+        self.quota_bytes = quota_bytes
+        self._docs: Dict[str, dict] = {}
+        self._pins: Dict[str, int] = {}
+        self._persisted_used: Dict[str, float] = {}  # 各文档已写入 meta.json 的最近使用时间
+        self._lock = threading.Lock()
+        self._touch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-touch")
+        os.makedirs(base_dir, exist_ok=True)
+        for doc_id in os.listdir(base_dir):
+            self._load(doc_id)
+
+    def _load(self, doc_id: str) -> Optional[dict]:
+        """从磁盘读取文档信息（目录被多个进程共享时，其他进程上传的文档也能找到）"""
+        meta_path = os.path.join(self._dir(doc_id), "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            self._docs[doc_id] = json.load(f)
+        self._persisted_used[doc_id] = self._docs[doc_id]["last_used"]
+        return self._docs[doc_id]
+
+    def _dir(self, doc_id: str) -> str:
+        return os.path.join(self.base_dir, os.path.basename(doc_id))
+
+    def _write_meta(self, meta: dict) -> None:
+        path = os.path.join(self._dir(meta["doc_id"]), "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self._persisted_used[meta["doc_id"]] = meta["last_used"]
+
+    def _persist_touch(self, doc_id: str) -> None:
+        """在后台线程中写入最近使用时间（文档已被删除时跳过）"""
+        with self._lock:
+            meta = self._docs.get(doc_id)
+            if meta is not None and os.path.isdir(self._dir(doc_id)):
+                self._write_meta(meta)
+
+    @staticmethod
+    def public_info(meta: dict) -> dict:
+        """对外返回的文档信息（不含本地路径）"""
+        return {key: meta[key] for key in ("doc_id", "filename", "size", "bytes", "created_at", "last_used")}
+
+    def put(self, filename: str, fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> dict:
+        """保存上传文件（边读边计算哈希，不整体读入内存）；内容相同的文件只保存一份
+
+        Raises:
+            DocumentTooLargeError: 文件超过配额
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            if size > self.quota_bytes:
+                raise DocumentTooLargeError(f"文件 {filename} ({size} 字节) 超过文档库配额 ({self.quota_bytes} 字节)")
+
+            doc_id = digest.hexdigest()
+            with self._lock:
+                meta = self._docs.get(doc_id)
+                if meta is None:
+                    os.makedirs(os.path.join(self._dir(doc_id), "summaries"), exist_ok=True)
+                    source = "source" + os.path.splitext(os.path.basename(filename))[1].lower()
+                    os.replace(tmp_path, os.path.join(self._dir(doc_id), source))
+                    now = time.time()
+                    meta = {
+                        "doc_id": doc_id,
+                        "filename": os.path.basename(filename),
+                        "source": source,
+                        "size": size,
+                        "bytes": size,
+                        "created_at": now,
+                        "last_used": now,
+                    }
+                    self._docs[doc_id] = meta
+                else:
+                    meta["last_used"] = time.time()
+                self._write_meta(meta)
+                self._evict(keep=doc_id)
+                return dict(meta)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """文档信息（含原文件路径 path），不存在时返回 None
+
+        同时更新内存中的最近使用时间；距上次落盘超过 _TOUCH_PERSIST_SECONDS 时在后台线程写入 meta.json，
+        不在调用方（事件循环）中写盘。
+        """
+        with self._lock:
+            meta = self._docs.get(doc_id) or self._load(doc_id)
+            if meta is None:
+                return None
+            meta["last_used"] = time.time()
+            if meta["last_used"] - self._persisted_used.get(doc_id, 0.0) >= _TOUCH_PERSIST_SECONDS:
+                self._persisted_used[doc_id] = meta["last_used"]
+                self._touch_pool.submit(self._persist_touch, doc_id)
+            return {**meta, "path": os.path.join(self._dir(doc_id), meta["source"])}
+
+    def list(self) -> List[dict]:
+        """全部文档（最近使用的在前）"""
+        with self._lock:
+            docs = sorted(self._docs.values(), key=lambda meta: -meta["last_used"])
+            return [self.public_info(meta) for meta in docs]
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {"used_bytes": sum(meta["bytes"] for meta in self._docs.values()), "quota_bytes": self.quota_bytes}
+
+    def delete(self, doc_id: str) -> bool:
+        """删除文档及其解析结果与摘要；正在使用时返回 False"""
+        with self._lock:
+            if doc_id not in self._docs or self._pins.get(doc_id):
+                return False
+            self._remove(doc_id)
+            return True
+
+    def _remove(self, doc_id: str) -> None:
+        self._docs.pop(doc_id, None)
+        self._persisted_used.pop(doc_id, None)
+        shutil.rmtree(self._dir(doc_id), ignore_errors=True)
+
+    def _evict(self, keep: str = "") -> None:
+        """超出配额时按最近使用时间淘汰（跳过 keep 与正在使用的文档）"""
+        used = sum(meta["bytes"] for meta in self._docs.values())
+        for meta in sorted(self._docs.values(), key=lambda meta: meta["last_used"]):
+            if used <= self.quota_bytes:
+                break
+            if meta["doc_id"] == keep or self._pins.get(meta["doc_id"]):
+                continue
+            used -= meta["bytes"]
+            self._remove(meta["doc_id"])
+
+    def pin(self, doc_ids: Iterable[str]) -> None:
+        """标记文档正在被使用（不会被淘汰或删除）"""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._pins[doc_id] = self._pins.get(doc_id, 0) + 1
+
+    def unpin(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self._pins[doc_id] -= 1
+                if not self._pins[doc_id]:
+                    del self._pins[doc_id]
+
+    def _read(self, doc_id: str, name: str) -> Optional[str]:
+        path = os.path.join(self._dir(doc_id), name)
+        if doc_id not in self._docs or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def _write(self, doc_id: str, name: str, text: str) -> None:
+        """写入派生文件并计入配额"""
+        with self._lock:
+            meta = self._docs.get(doc_id)
+            if meta is None:
+                return
+            path = os.path.join(self._dir(doc_id), name)
+            old_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+            meta["bytes"] += os.path.getsize(path) - old_bytes
+            self._write_meta(meta)
+            self._evict(keep=doc_id)
+
+    def get_parsed(self, doc_id: str) -> Optional[str]:
+        """已保存的解析结果"""
+        return self._read(doc_id, "parsed.md")
+
+    def put_parsed(self, doc_id: str, text_md: str) -> None:
+        self._write(doc_id, "parsed.md", text_md)
+
+    @staticmethod
+    def summary_key(*parts: str) -> str:
+        """由报告类型、模型等影响摘要的配置生成摘要文件名"""
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()[:32]
+
+    def get_summary(self, doc_id: str, key: str) -> Optional[str]:
+        """已保存的逐文档压缩摘要"""
+        return self._read(doc_id, os.path.join("summaries", key + ".md"))
+
+    def put_summary(self, doc_id: str, key: str, summary_md: str) -> None:
+        self._write(doc_id, os.path.join("summaries", key + ".md"), summary_md)
@@ -0,0 +1,199 @@
+"""按格式的快速解析器 - 常见格式不经过 MarkItDown
+
+MarkItDown 对每个文件都要做格式探测并初始化全部转换器，.docx 还要先经
+mammoth 转为 HTML 再转 Markdown。这里按检测到的文件类型注册专用解析器：
+
+    text: .md / .markdown / .txt，检测编码后直接读取
+    docx: 逐元素流式读取 word/document.xml，输出标题、段落、列表与表格
+
+解析器接收文件路径，逐块产出 Markdown（一个标题、段落或表格为一块）。
+没有对应解析器的类型（PDF、PPTX、XLSX 等）由 DocumentParser 交给 MarkItDown。
+"""
+import codecs
+import os
+import re
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+
+
+Parser = Callable[[str], Iterator[str]]
+
+_PARSERS: Dict[str, Parser] = {}
+
+_TEXT_EXTENSIONS = (".md", ".markdown", ".txt")
+
+
+def register_parser(kind: str, parser: Parser) -> None:
+    """注册（或替换）某类型的解析器"""
+    _PARSERS[kind] = parser
+
+
+def detect_type(file_path: str) -> Optional[str]:
+    """检测文件类型：文本按扩展名，docx 按 zip 内容（不依赖扩展名）；无法识别时返回 None"""
+    if os.path.splitext(file_path)[1].lower() in _TEXT_EXTENSIONS:
+        return "text"
+    if zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as zf:
+            if "word/document.xml" in zf.namelist():
+                return "docx"
+    return None
+
+
+def get_parser(file_path: str) -> Optional[Parser]:
+    """文件对应的快速解析器（没有时返回 None）"""
+    kind = detect_type(file_path)
+    return _PARSERS.get(kind) if kind else None
+
+
+# ---------------------------------------------------------------- text
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def decode_text(data: bytes) -> str:
+    """检测编码并解码：BOM → UTF-8 → charset_normalizer（可选依赖）→ GB18030"""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding)
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        from_bytes = None
+    if from_bytes is not None:
+        best = from_bytes(data).best()
+        if best is not None:
+            return str(best)
+    # 国内文档最常见的非 UTF-8 编码（兼容 GBK/GB2312）
+    return data.decode("gb18030", errors="replace")
+
+
+def parse_text(file_path: str) -> Iterator[str]:
+    """.md / .txt：解码后按原样产出（统一换行符）"""
+    with open(file_path, "rb") as f:
+        text = decode_text(f.read())
+    yield text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+# ---------------------------------------------------------------- docx
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_HEADING_STYLE = re.compile(r"^(?:heading|标题)\s*(\d)$", re.IGNORECASE)
+_LIST_STYLE = re.compile(r"^(?:list|列表)", re.IGNORECASE)
+
+
+def _style_prefixes(zf: zipfile.ZipFile) -> Dict[str, str]:
+    """styles.xml 中段落样式 ID → Markdown 前缀（标题为 "## " 等，列表为 "- "）
+
+    样式 ID 可能是本地化的（如 "1"），按样式名判断。
+    """
+    if "word/styles.xml" not in zf.namelist():
+        return {}
+    prefixes = {}
+    root = ElementTree.fromstring(zf.read("word/styles.xml"))
+    for style in root.iter(f"{_W}style"):
+        style_id = style.get(f"{_W}styleId")
+        name = style.find(f"{_W}name")
+        name = name.get(f"{_W}val", "").strip() if name is not None else ""
+        match = _HEADING_STYLE.match(name)
+        if match:
+            prefixes[style_id] = "#" * min(int(match.group(1)), 6) + " "
+        elif name.lower() == "title":
+            prefixes[style_id] = "# "
+        elif _LIST_STYLE.match(name):
+            prefixes[style_id] = "- "
+    return prefixes
+
+
+def _paragraph_text(p: ElementTree.Element) -> str:
+    parts = []
+    for el in p.iter():
+        if el.tag == f"{_W}t":
+            parts.append(el.text or "")
+        elif el.tag == f"{_W}tab":
+            parts.append("\t")
+        elif el.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def _paragraph_markdown(p: ElementTree.Element, style_prefixes: Dict[str, str]) -> str:
+    text = _paragraph_text(p)
+    if not text:
+        return ""
+    ppr = p.find(f"{_W}pPr")
+    if ppr is None:
+        return text
+    style = ppr.find(f"{_W}pStyle")
+    prefix = style_prefixes.get(style.get(f"{_W}val"), "") if style is not None else ""
+    outline = ppr.find(f"{_W}outlineLvl")
+    if not prefix and outline is not None and int(outline.get(f"{_W}val", "9")) < 6:
+        prefix = "#" * (int(outline.get(f"{_W}val")) + 1) + " "
+    if not prefix and ppr.find(f"{_W}numPr") is not None:
+        prefix = "- "
+    if prefix.startswith("#"):
+        text = text.replace("\n", " ")
+    return prefix + text
+
+
+def _table_markdown(rows: List[List[str]]) -> str:
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [cell.replace("|", "\\|").replace("\n", " ") for cell in row] + [""] * (width - len(row))
+        lines.append("| " + " | ".join(cells) + " |")
+        if i == 0:
+            lines.append("|" + " --- |" * width)
+    return "\n".join(lines)
+
+
+def parse_docx(file_path: str) -> Iterator[str]:
+    """.docx：流式解析 document.xml，每个标题/段落/表格产出一块 Markdown
+
+    已产出的元素随即清空内容，不在内存中保留整棵文档树。嵌套表格的内容并入所在单元格。
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        style_prefixes = _style_prefixes(zf)
+        with zf.open("word/document.xml") as xml:
+            table_depth = 0
+            rows: List[List[str]] = []
+            row: List[str] = []
+            cell: List[str] = []
+            for event, el in ElementTree.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    if el.tag == f"{_W}tbl":
+                        table_depth += 1
+                    continue
+                if el.tag == f"{_W}p":
+                    if table_depth:
+                        cell.append(_paragraph_text(el))
+                    else:
+                        block = _paragraph_markdown(el, style_prefixes)
+                        el.clear()
+                        if block:
+                            yield block
+                elif table_depth == 1 and el.tag == f"{_W}tc":
+                    row.append(" ".join(text for text in cell if text))
+                    cell = []
+                elif table_depth == 1 and el.tag == f"{_W}tr":
+                    rows.append(row)
+                    row = []
+                elif el.tag == f"{_W}tbl":
+                    table_depth -= 1
+                    if table_depth == 0:
+                        el.clear()
+                        if any(any(c for c in r) for r in rows):
+                            yield _table_markdown(rows)
+                        rows = []
+
+
+register_parser("text", parse_text)
+register_parser("docx", parse_docx)
@@ -0,0 +1,160 @@
+"""LLM 调用录制与回放 - 离线复现线上请求，测量流水线自身开销
+
+录制模式下每个 trace_id 一个目录：
+
+    <LLM_RECORD_DIR>/<trace_id>/
+        request.json      请求参数与输入文件名
+        files/            输入文件副本
+        exchanges.jsonl   每行一次 _call_llm：阶段、prompt、流式增量及其到达时间
+
+exchanges.jsonl 中 chunks 为 [距调用开始的毫秒数, 增量文本] 列表，第一项的
+时间即首个增量耗时（含排队之后的 prefill）。
+
+回放模式下按 prompt 哈希匹配录制的调用，按原始（或缩放后的）时间间隔依次
+返回累积文本，与线上模型的流式输出格式一致；未命中录制时直接报错。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List
+from app.utils.background_writer import background_writer
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ReplayChunk:
+    """回放的流式分块（与 OpenAIChatModel 流式输出的 content 结构一致）"""
+    content: List[dict] = field(default_factory=list)
+
+
+class LLMRecorder:
+    """按 trace_id 录制请求输入与全部 LLM 调用"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+
+    def _trace_dir(self, trace_id: str) -> str:
+        # trace_id 可能来自 URL（续跑接口），只取最后一段，避免写到录制目录之外
+        return os.path.join(self.base_dir, os.path.basename(trace_id))
+
+    def start(self, trace_id: str, params: dict, file_paths: List[tuple]) -> None:
+        """记录请求参数并保存输入文件副本
+
+        Args:
+            trace_id: 追踪ID
+            params: 请求参数（report_type、max_words 等）
+            file_paths: (file_path, filename) 元组列表
+        """
+        files_dir = os.path.join(self._trace_dir(trace_id), "files")
+        os.makedirs(files_dir, exist_ok=True)
+        files = []
+        for i, (file_path, filename) in enumerate(file_paths):
+            stored = f"{i}_{os.path.basename(filename)}"
+            shutil.copyfile(file_path, os.path.join(files_dir, stored))
+            files.append({"filename": filename, "stored": stored})
+        with open(os.path.join(self._trace_dir(trace_id), "request.json"), "w", encoding="utf-8") as f:
+            json.dump({"trace_id": trace_id, "params": params, "files": files, "created_at": time.time()},
+                      f, ensure_ascii=False, indent=2)
+
+    def wrap(self, trace_id: str, stage: str, prompt: str, response: AsyncIterator) -> AsyncIterator:
+        """包装模型的流式输出：原样转发分块，同时记录增量文本与到达时间"""
+        call_start = time.time()
+
+        async def recorded():
+            chunks = []
+            prev_text = ""
+            try:
+                async for chunk in response:
+                    text = "".join(
+                        item["text"] for item in getattr(chunk, "content", None) or []
+                        if isinstance(item, dict) and "text" in item
+                    )
+                    delta = text[len(prev_text):] if text.startswith(prev_text) else text
+                    if delta:
+                        chunks.append([round((time.time() - call_start) * 1000, 1), delta])
+                    prev_text = text
+                    yield chunk
+            finally:
+                # 调用方提前结束（如超出输出预算）时也记录已收到的部分
+                if hasattr(response, "aclose"):
+                    await response.aclose()
+                self._append(trace_id, {
+                    "stage": stage,
+                    "prompt_hash": prompt_hash(prompt),
+                    "prompt": prompt,
+                    "chunks": chunks,
+                })
+
+        return recorded()
+
+    def _append(self, trace_id: str, exchange: dict) -> None:
+        """追加一次调用记录（由后台线程写盘，不阻塞事件循环）"""
+        line = json.dumps(exchange, ensure_ascii=False, separators=(",", ":"))
+        background_writer.append(os.path.join(self._trace_dir(trace_id), "exchanges.jsonl"), line + "\n")
+
+
+class LLMReplayer:
+    """按 prompt 哈希回放录制的 LLM 调用
+
+    同一 prompt 录制了多次时按录制顺序依次使用，用完后重复最后一次。
+    """
+
+    def __init__(self, base_dir: str, time_scale: float = 1.0, trace_id: str = ""):
+        """
+        Args:
+            base_dir: 录制目录
+            time_scale: 时间缩放（1 为原始耗时，0 为不等待）
+            trace_id: 只加载某一次请求的录制，为空则加载全部
+        """
+        self.base_dir = base_dir
+        self.time_scale = time_scale
+        self._exchanges: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._last: Dict[str, dict] = {}
+        trace_ids = [trace_id] if trace_id else sorted(os.listdir(base_dir)) if os.path.isdir(base_dir) else []
+        for tid in trace_ids:
+            self.load(os.path.join(base_dir, tid, "exchanges.jsonl"))
+
+    def load(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self._exchanges[exchange["prompt_hash"]].append(exchange)
+
+    def _take(self, prompt: str) -> dict:
+        key = prompt_hash(prompt)
+        queue = self._exchanges.get(key)
+        if queue:
+            self._last[key] = queue.popleft()
+        if key not in self._last:
+            raise KeyError(f"回放未命中录制的 LLM 调用（prompt 哈希 {key[:12]}）")
+        return self._last[key]
+
+    async def stream(self, prompt: str) -> AsyncIterator[ReplayChunk]:
+        """按录制的时间间隔依次返回累积文本"""
+        exchange = self._take(prompt)
+        call_start = time.time()
+        text = ""
+        for offset_ms, delta in exchange["chunks"]:
+            if self.time_scale > 0:
+                wait = offset_ms * self.time_scale / 1000 - (time.time() - call_start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            text += delta
+            yield ReplayChunk(content=[{"type": "text", "text": text}])
+
+    def model(self):
+        """与 OpenAIChatModel 调用方式兼容的回放模型"""
+        async def call(messages: List[dict], **kwargs):
+            return self.stream(messages[-1]["content"])
+        return call
@@ -0,0 +1,118 @@
+"""异步结构化日志
+
+热路径上的日志调用只把记录放入内存队列，由后台线程（QueueListener）
+负责格式化和写盘，避免磁盘 I/O 阻塞事件循环。文件日志为按 trace_id
+关联的 JSON 行，按大小滚动；逐块/逐部分的冗长日志可按比例采样。
+
+用法：
+    logger.info("消息", extra={"fields": {"stage": stage}})   # 附加结构化字段
+    logger.info("逐块预览", extra=SAMPLED)                     # 按 LOG_SAMPLE_RATE 采样
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from app.config import Config
+
+
+# 当前请求的 trace_id（asyncio 任务会自动继承）
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="")
+
+# 标记需要采样的冗长日志
+SAMPLED = {"sampled": True}
+
+_CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+
+_queue: Optional[queue.SimpleQueue] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class TraceContextFilter(logging.Filter):
+    """在调用方上下文中注入 trace_id，并对标记为 sampled 的记录按比例采样"""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        if not getattr(record, "trace_id", None):
+            record.trace_id = trace_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON 行格式化器"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", ""),
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging() -> None:
+    """配置根日志器：所有记录经队列交由后台线程写入控制台与滚动文件（幂等）"""
+    global _queue, _queue_handler, _listener
+    if _listener is not None:
+        return
+
+    config = Config()
+    os.makedirs(config.LOG_DIR, exist_ok=True)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(_CONSOLE_FORMAT))
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(config.LOG_DIR, "app.log"),
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    _queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(_queue)
+    _queue_handler.addFilter(TraceContextFilter(config.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(_queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(
+        _queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def route_logger_to_queue(name: str) -> None:
+    """将自带处理器的第三方日志器（如 AgentScope 的 "as"）改为经队列输出"""
+    if _queue_handler is None:
+        return
+    target = logging.getLogger(name)
+    target.handlers.clear()
+    target.addHandler(_queue_handler)
+    target.propagate = False
+
+
+def shutdown_logging() -> None:
+    """停止后台写日志线程并刷新剩余记录"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
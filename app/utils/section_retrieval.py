@@ -0,0 +1,153 @@
+"""按特定要求检索章节 - 压缩前只保留与 requirements 相关的章节
+
+对一次请求中全部文档的章节建立 BM25 索引（中文按字二元组切分，同时索引单字，
+使 "月"、"周" 等单字关注词也能命中），以
+requirements 与报告类型关注点为查询为章节打分，按分数从高到低在字数预算内
+选取章节，其余章节不再送入逐文档压缩。
+
+extract_sentences 在章节内部按同样的方式为句子打分，用于过载时的抽取式预压缩。
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+_TOKEN_PATTERN = re.compile(r"[一-鿿]+|[A-Za-z]+|\d+(?:\.\d+)?")
+_SENTENCE_PATTERN = re.compile(r"[^。！？；\n]+[。！？；]?")
+_DIGIT_PATTERN = re.compile(r"\d")
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """分词：连续汉字切为字二元组（单字保留为一元组），英文单词小写，数字原样保留
+
+    Args:
+        text: 文本
+        unigrams: 是否同时产出每个汉字的一元组（建索引时使用，查询中的单字词才能命中）
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        run = match.group()
+        if "一" <= run[0] <= "鿿":
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                if unigrams:
+                    tokens.extend(run)
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+class BM25Index:
+    """内存中的 BM25 索引"""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for i, text in enumerate(documents):
+            counts = Counter(tokenize(text, unigrams=True))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings[term].append((i, tf))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def scores(self, query: Dict[str, float]) -> List[float]:
+        """计算每个文档对查询的得分
+
+        Args:
+            query: 查询词及其权重
+
+        Returns:
+            List[float]: 与建索引时的文档顺序一致
+        """
+        n = len(self._lengths)
+        result = [0.0] * n
+        for term, weight in query.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_length or 1))
+                result[i] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+        return result
+
+
+def build_query(requirements: str, focus_terms: Iterable[str], requirements_weight: float = 2.0) -> Dict[str, float]:
+    """由特定要求与关注点构建加权查询（特定要求中的词权重更高）"""
+    query: Dict[str, float] = {}
+    for term in {t for focus in focus_terms for t in tokenize(focus)}:
+        query[term] = 1.0
+    for term in set(tokenize(requirements)):
+        query[term] = requirements_weight
+    return query
+
+
+def select_sections(sections: Sequence[str], query: Dict[str, float], budget_chars: int) -> List[int]:
+    """在字数预算内按相关度选取章节
+
+    只选取得分大于 0 的章节；没有任何章节命中查询时保留全部章节。
+
+    Returns:
+        List[int]: 选中章节的下标（按原顺序）
+    """
+    scores = BM25Index(sections).scores(query)
+    ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+    if not ranked:
+        return list(range(len(sections)))
+
+    selected = []
+    used = 0
+    for i in ranked:
+        if selected and used + len(sections[i]) > budget_chars:
+            continue
+        selected.append(i)
+        used += len(sections[i])
+    return sorted(selected)
+
+
+def extract_sentences(text: str, query: Dict[str, float], ratio: float) -> str:
+    """抽取式预压缩：保留标题与表格行，其余句子按相关度保留约 ratio 比例的字数
+
+    句子得分为 BM25 得分，含数字的句子额外加 1 分（报告中的数据通常是要点）。
+    入选句子按原顺序输出，不含入选句子的行整行删除。
+    """
+    lines = text.split("\n")
+    sentences: List[Tuple[int, str]] = []
+    structural_chars = 0
+    for i, line in enumerate(lines):
+        stripped = line.lstrip()
+        if stripped.startswith(("#", "|")):
+            structural_chars += len(line)
+        else:
+            sentences.extend((i, match.group()) for match in _SENTENCE_PATTERN.finditer(line) if match.group().strip())
+    if not sentences:
+        return text
+
+    scores = BM25Index([sentence for _, sentence in sentences]).scores(query)
+    scores = [score + (1.0 if _DIGIT_PATTERN.search(sentence) else 0.0) for score, (_, sentence) in zip(scores, sentences)]
+    budget = max(len(text) * ratio - structural_chars, 0)
+    selected = set()
+    used = 0
+    for k in sorted(range(len(sentences)), key=lambda k: -scores[k]):
+        if used + len(sentences[k][1]) > budget:
+            continue
+        selected.add(k)
+        used += len(sentences[k][1])
+
+    kept: Dict[int, List[str]] = defaultdict(list)
+    for k in sorted(selected):
+        kept[sentences[k][0]].append(sentences[k][1])
+    result = []
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith(("#", "|")):
+            result.append(line)
+        elif i in kept:
+            result.append("".join(kept[i]))
+        elif not line.strip() and result and result[-1].strip():
+            result.append(line)
+    return "\n".join(result).strip()
@@ -0,0 +1,178 @@
+"""章节指纹库 - 周期性报告按章节复用上一期的压缩结果"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SectionChunker:
+    """把连续的章节片段组装为压缩分块
+
+    默认按大小装箱：加入下一节会超出 max_chars 时切块。content_defined 模式下
+    额外在“内容决定的边界”处切块（章节内容哈希满足条件且已达最小长度），
+    使分块边界只取决于附近章节的内容：某一节数字变化只影响它所在的分块，
+    不会让后续分块整体错位，从而保证未变化的分块指纹可以命中。
+    """
+
+    def __init__(self, max_chars: int, content_defined: bool = False, boundary_modulus: int = 4):
+        self.max_chars = max_chars
+        self.min_chars = max_chars // 4
+        self.content_defined = content_defined
+        self.boundary_modulus = boundary_modulus
+        self._buffer: List[str] = []
+        self._buffer_len = 0
+
+    def _take(self) -> str:
+        chunk = "\n\n".join(self._buffer)
+        self._buffer, self._buffer_len = [], 0
+        return chunk
+
+    def feed(self, section: str) -> List[str]:
+        """加入一个章节，返回因此完成的分块"""
+        chunks = []
+        if self._buffer and self._buffer_len + len(section) > self.max_chars:
+            chunks.append(self._take())
+        self._buffer.append(section)
+        self._buffer_len += len(section)
+        if (
+            self.content_defined
+            and self._buffer_len >= self.min_chars
+            and zlib.crc32(section.strip().encode("utf-8")) % self.boundary_modulus == 0
+        ):
+            chunks.append(self._take())
+        return chunks
+
+    def finish(self) -> List[str]:
+        """返回剩余内容组成的最后一个分块"""
+        return [self._take()] if self._buffer else []
+
+
+class SectionStore:
+    """按报告系列保存“分块指纹 -> 压缩摘要”
+
+    每个系列一个 JSON 文件，内存中缓存最近使用的 max_series 个系列，flush() 时写回磁盘；
+    每个系列超过 max_entries 时淘汰最久未使用的条目。读取文件较慢，异步代码中先经
+    asyncio.to_thread 调用 preload()，get()/put() 只访问内存。
+    """
+
+    def __init__(self, base_dir: str, max_entries: int = 2000, max_series: int = 64):
+        self.base_dir = base_dir
+        self.max_entries = max_entries
+        self.max_series = max_series
+        self._series: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # 串行写盘：后取快照的写入不会被先取快照的覆盖
+
+    @staticmethod
+    def series_key(report_type: str, series_id: str, filename: str) -> str:
+        """系列标识：报告类型 + 调用方给定的系列 ID + 去除日期/期数数字后的文件名
+
+        例如 “2024年5月用电监测月报.pdf” 与 “2024年6月用电监测月报.pdf” 属于同一系列。
+        """
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        stem = re.sub(r"\d+", "#", stem)
+        return f"{report_type}|{series_id}|{stem}"
+
+    @staticmethod
+    def fingerprint(model: str, prompt: str) -> str:
+        """分块指纹：模型 + 完整压缩 prompt（模板或参数变化时自动失效）"""
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _path(self, series: str) -> str:
+        name = hashlib.sha256(series.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.base_dir, f"{name}.json")
+
+    def _read(self, series: str) -> Dict[str, dict]:
+        path = self._path(series)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("entries", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _cache(self, series: str, entries: Dict[str, dict]) -> Dict[str, dict]:
+        """放入内存缓存并淘汰最久未使用的系列（有未写回改动的系列保留到 flush 之后）"""
+        self._series[series] = entries
+        for key in [key for key in self._series if key not in self._dirty and key != series]:
+            if len(self._series) <= self.max_series:
+                break
+            del self._series[key]
+        return entries
+
+    def _load(self, series: str) -> Dict[str, dict]:
+        entries = self._series.get(series)
+        if entries is None:
+            # 未经 preload（或已被淘汰）时同步读取
+            return self._cache(series, self._read(series))
+        self._series.move_to_end(series)
+        return entries
+
+    def preload(self, series: str) -> None:
+        """把系列读入内存缓存（在锁外读取文件，已缓存时直接返回）"""
+        with self._lock:
+            if series in self._series:
+                self._series.move_to_end(series)
+                return
+        entries = self._read(series)
+        with self._lock:
+            if series not in self._series:
+                self._cache(series, entries)
+
+    def get(self, series: str, fingerprint: str) -> Optional[str]:
+        """查找已保存的压缩摘要"""
+        with self._lock:
+            entry = self._load(series).get(fingerprint)
+            if entry is None:
+                return None
+            entry["last_used"] = time.time()
+            self._dirty.add(series)
+            return entry["summary"]
+
+    def put(self, series: str, fingerprint: str, summary: str) -> None:
+        """保存一个分块的压缩摘要"""
+        with self._lock:
+            entries = self._load(series)
+            entries[fingerprint] = {"summary": summary, "last_used": time.time()}
+            if len(entries) > self.max_entries:
+                oldest = sorted(entries, key=lambda k: entries[k]["last_used"])
+                for key in oldest[: len(entries) - self.max_entries]:
+                    del entries[key]
+            self._dirty.add(series)
+
+    def flush(self) -> None:
+        """将有改动的系列写回磁盘；写入失败时记录日志，改动留待下次写回"""
+        with self._write_lock:
+            with self._lock:
+                pending = {series: dict(self._series[series]) for series in self._dirty}
+                self._dirty.clear()
+            for series, entries in pending.items():
+                try:
+                    self._write(series, entries)
+                except OSError as e:
+                    logger.warning(f"章节指纹库写入失败: {series} ({e})")
+                    with self._lock:
+                        self._dirty.add(series)
+
+    def _write(self, series: str, entries: Dict[str, dict]) -> None:
+        os.makedirs(self.base_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"series": series, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(series))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
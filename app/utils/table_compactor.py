@@ -0,0 +1,148 @@
+"""Markdown 表格紧凑化 - 不经 LLM 压缩解析出的大表格
+
+MarkItDown 输出的表格按列宽补齐空格、每行带分隔竖线，数据密集的报告中
+这部分字符占了 prompt 的大头。这里把表格解析为列式结构，去掉空列、空行
+和重复行，可选去掉与报告关注点无关的少量行，再输出紧凑的文本：
+
+    [表] 地区|用电量(亿千瓦时)|同比
+    华东|123|5%
+    华北|98|3%
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Sequence, Tuple
+
+
+_SEPARATOR_CELL = re.compile(r"^:?-+:?$")
+_CELL_BORDER = re.compile(r"(?<!\\)\|")  # 单元格分隔竖线（转义的 \| 是单元格内容）
+
+
+@dataclass
+class CompactTable:
+    """列式表格"""
+    headers: List[str]
+    columns: List[List[str]] = field(default_factory=list)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def rows(self) -> List[List[str]]:
+        return [list(row) for row in zip(*self.columns)]
+
+    def serialize(self) -> str:
+        """紧凑文本：首行为表头，其后每行一条记录，单元格以 | 分隔（单元格内的 | 转义为 \\|）"""
+        lines = ["[表] " + _join_cells(self.headers)]
+        lines.extend(_join_cells(row) for row in self.rows())
+        return "\n".join(lines)
+
+
+def _join_cells(cells: Iterable[str]) -> str:
+    return "|".join(cell.replace("|", "\\|") for cell in cells)
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [re.sub(r"\s+", " ", cell).strip().replace("\\|", "|") for cell in _CELL_BORDER.split(line)]
+
+
+def _is_separator(cells: Sequence[str]) -> bool:
+    stripped = [c.replace(" ", "") for c in cells]
+    return any(stripped) and all(not c or _SEPARATOR_CELL.match(c) for c in stripped)
+
+
+def parse_table(lines: Sequence[str]) -> CompactTable:
+    """将 Markdown 表格行解析为列式表格（去除空列、空行与重复行）"""
+    rows = [_split_row(line) for line in lines]
+    rows = [row for row in rows if not _is_separator(row)]
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    headers, body = rows[0], rows[1:]
+
+    seen = set()
+    unique_body = []
+    for row in body:
+        key = tuple(row)
+        if any(row) and key not in seen:
+            seen.add(key)
+            unique_body.append(row)
+
+    # 没有数据的列（即使有表头）不保留；整表无数据行时保留表头
+    keep = [i for i in range(width) if any(row[i] for row in unique_body) or (not unique_body and headers[i])]
+    return CompactTable(
+        headers=[headers[i] for i in keep],
+        columns=[[row[i] for row in unique_body] for i in keep],
+    )
+
+
+def filter_table(table: CompactTable, focus_terms: Iterable[str], max_drop_ratio: float = 0.3) -> CompactTable:
+    """只保留与关注点相关的行
+
+    行：任一单元格包含关注词的行；没有任何行命中时保留全部。列全部保留（时间、
+    数值列通常不含关注词，却是表格的主体）。筛选会删去超过 max_drop_ratio 的单元格时
+    保留整表，避免把大部分数据当作无关内容丢掉。
+    """
+    terms = [t for t in focus_terms if t]
+    if not terms or not table.columns:
+        return table
+
+    rows = table.rows()
+    row_keep = [i for i, row in enumerate(rows) if any(term in cell for cell in row for term in terms)]
+    if not row_keep or len(rows) - len(row_keep) > len(rows) * max_drop_ratio:
+        return table
+
+    return CompactTable(
+        headers=list(table.headers),
+        columns=[[column[r] for r in row_keep] for column in table.columns],
+    )
+
+
+def _table_blocks(lines: List[str]) -> List[Tuple[int, int]]:
+    """找出 Markdown 表格所在的行区间 [start, end)，要求第二行为分隔行"""
+    blocks = []
+    i = 0
+    while i < len(lines):
+        if lines[i].lstrip().startswith("|") and i + 1 < len(lines) and _is_separator(_split_row(lines[i + 1])):
+            j = i + 2
+            while j < len(lines) and lines[j].lstrip().startswith("|"):
+                j += 1
+            blocks.append((i, j))
+            i = j
+        else:
+            i += 1
+    return blocks
+
+
+def compact_markdown_tables(text: str, focus_terms: Iterable[str] = ()) -> str:
+    """将文本中的所有 Markdown 表格替换为紧凑表示
+
+    Args:
+        text: Markdown 文本
+        focus_terms: 关注词（为空则不做行列筛选）
+
+    Returns:
+        str: 处理后的文本
+    """
+    if "|" not in text:
+        return text
+    lines = text.split("\n")
+    blocks = _table_blocks(lines)
+    if not blocks:
+        return text
+
+    terms = list(focus_terms)
+    out: List[str] = []
+    cursor = 0
+    for start, end in blocks:
+        out.extend(lines[cursor:start])
+        table = parse_table(lines[start:end])
+        if terms:
+            table = filter_table(table, terms)
+        out.append(table.serialize())
+        cursor = end
+    out.extend(lines[cursor:])
+    return "\n".join(out)
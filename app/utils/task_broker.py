@@ -0,0 +1,289 @@
+"""任务队列 - 分布式执行时在 API 节点与 worker 进程之间传递摘要任务与事件
+
+API 节点把摘要任务（请求参数与上传文件内容）放入队列，worker 进程领取并执行，
+执行过程中的 SSE 事件按顺序写回队列，API 节点轮询后转发给发起请求的连接。
+
+任务状态：queued（等待领取）→ running（已被 worker 领取，持有租约）→ done / failed。
+worker 需在租约到期前续约；租约过期的任务视为 worker 已失联，标记为 failed 并
+追加一个错误事件（启用 CHECKPOINT 时客户端可凭 trace_id 继续）。发布事件与结束任务
+只接受当前持有租约的 worker，失去租约的 worker 应停止执行。
+
+默认实现为本地 SQLite 文件（单机多进程或共享卷），其他实现通过 BROKER 配置
+"模块路径:类名" 接入，需实现 TaskBroker 的全部方法。
+"""
+import importlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import Config
+
+
+class TaskConflictError(RuntimeError):
+    """同一 task_id 的任务仍在等待或执行中"""
+
+
+class LeaseLostError(RuntimeError):
+    """worker 已不再持有任务的租约（租约过期后任务被标记为失败或已被重新放入队列）"""
+
+
+class TaskBroker:
+    """任务队列接口（同步方法，异步代码中经 asyncio.to_thread 调用）"""
+
+    def enqueue(self, task_id: str, payload: dict, uploads: List[Tuple[str, bytes]]) -> None:
+        """放入任务（同一 task_id 的已结束任务被替换）
+
+        Raises:
+            TaskConflictError: 同一 task_id 的任务仍在等待或执行中
+        """
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        """领取最早的等待中任务
+
+        Returns:
+            Optional[dict]: {"task_id", "payload", "uploads"}，没有任务时为 None
+        """
+        raise NotImplementedError
+
+    def renew(self, task_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """续约；任务已不属于该 worker（如租约已过期）时返回 False"""
+        raise NotImplementedError
+
+    def publish(self, task_id: str, worker_id: str, event: dict) -> None:
+        """追加一个 SSE 事件（{"event": ..., "data": ...}）
+
+        Raises:
+            LeaseLostError: 任务已不属于该 worker，事件被丢弃
+        """
+        raise NotImplementedError
+
+    def finish(self, task_id: str, worker_id: str, status: str) -> bool:
+        """结束任务（done / failed），释放上传文件内容；任务已不属于该 worker 时不做修改并返回 False"""
+        raise NotImplementedError
+
+    def poll(self, task_id: str, after_seq: int) -> Tuple[List[Tuple[int, dict]], str]:
+        """读取序号大于 after_seq 的事件
+
+        Returns:
+            ((序号, 事件) 列表, 任务状态)；任务不存在时状态为 ""
+        """
+        raise NotImplementedError
+
+    def cancel(self, task_id: str) -> bool:
+        """取消尚未被领取的任务；已被领取或已结束时返回 False"""
+        raise NotImplementedError
+
+
+class SQLiteBroker(TaskBroker):
+    """基于 SQLite 文件的任务队列（WAL 模式，每次操作使用独立连接，可跨进程共享）"""
+
+    def __init__(self, path: str, retention_seconds: float = 3600):
+        """
+        Args:
+            path: 数据库文件路径
+            retention_seconds: 已结束任务及其事件的保留时间
+        """
+        self.path = path
+        self.retention_seconds = retention_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker_id TEXT NOT NULL DEFAULT '',
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at);
+                CREATE TABLE IF NOT EXISTS task_files (
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    PRIMARY KEY (task_id, idx)
+                );
+                CREATE TABLE IF NOT EXISTS task_events (
+                    task_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (task_id, seq)
+                );
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """事务：写事务用 BEGIN IMMEDIATE（多个进程同时领取时不会取到同一任务），
+        只读事务用 BEGIN（WAL 下不阻塞写入，读到一致的快照）"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, task_ids: List[str]) -> None:
+        for table in ("tasks", "task_files", "task_events"):
+            conn.executemany(f"DELETE FROM {table} WHERE task_id = ?", [(task_id,) for task_id in task_ids])
+
+    @staticmethod
+    def _append(conn: sqlite3.Connection, task_id: str, event: dict) -> None:
+        conn.execute(
+            "INSERT INTO task_events (task_id, seq, event, data) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM task_events WHERE task_id = ?",
+            (task_id, event["event"], event["data"], task_id),
+        )
+
+    def enqueue(self, task_id: str, payload: dict, uploads: List[Tuple[str, bytes]]) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            # 同一 trace_id 重新执行（从检查点继续）时只替换已结束的旧任务；仍在等待或执行中时
+            # 替换会清空其事件并让第二个 worker 同时执行
+            row = conn.execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None and row[0] not in ("done", "failed"):
+                raise TaskConflictError(f"任务 {task_id} 仍在等待或执行中（{row[0]}）")
+            # 清理过期的已结束任务
+            expired = conn.execute(
+                "SELECT task_id FROM tasks WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (now - self.retention_seconds,),
+            ).fetchall()
+            self._delete(conn, [row[0] for row in expired] + [task_id])
+            conn.execute(
+                "INSERT INTO tasks (task_id, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (task_id, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO task_files (task_id, idx, filename, content) VALUES (?, ?, ?, ?)",
+                [(task_id, idx, filename, content) for idx, (filename, content) in enumerate(uploads)],
+            )
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[dict]:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT task_id, payload FROM tasks WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, payload = row
+            conn.execute(
+                "UPDATE tasks SET status = 'running', worker_id = ?, lease_until = ?, updated_at = ? WHERE task_id = ?",
+                (worker_id, now + lease_seconds, now, task_id),
+            )
+            uploads = conn.execute(
+                "SELECT filename, content FROM task_files WHERE task_id = ? ORDER BY idx", (task_id,)
+            ).fetchall()
+        return {"task_id": task_id, "payload": json.loads(payload), "uploads": [(name, bytes(content)) for name, content in uploads]}
+
+    def renew(self, task_id: str, worker_id: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE task_id = ? AND status = 'running' AND worker_id = ?",
+                (now + lease_seconds, now, task_id, worker_id),
+            )
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def _owns(conn: sqlite3.Connection, task_id: str, worker_id: str) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM tasks WHERE task_id = ? AND status = 'running' AND worker_id = ?", (task_id, worker_id)
+        ).fetchone()
+        return row is not None
+
+    def publish(self, task_id: str, worker_id: str, event: dict) -> None:
+        with self._transaction() as conn:
+            # 租约过期后旧 worker 的事件不得混入（任务可能已由其他 worker 重新执行）
+            if not self._owns(conn, task_id, worker_id):
+                raise LeaseLostError(f"worker {worker_id} 已不再持有任务 {task_id} 的租约")
+            self._append(conn, task_id, event)
+
+    def finish(self, task_id: str, worker_id: str, status: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ? AND status = 'running' AND worker_id = ?",
+                (status, time.time(), task_id, worker_id),
+            )
+            if cursor.rowcount:
+                conn.execute("DELETE FROM task_files WHERE task_id = ?", (task_id,))
+            return cursor.rowcount > 0
+
+    def poll(self, task_id: str, after_seq: int) -> Tuple[List[Tuple[int, dict]], str]:
+        # 每个打开的流每次轮询都会调用：只用读事务，租约确实过期时才升级为写事务，
+        # 不与 worker 发布事件的写操作争抢写锁
+        events, status, lease_until = self._read(task_id, after_seq)
+        if status == "running" and lease_until < time.time() and self._expire(task_id):
+            events, status, _ = self._read(task_id, after_seq)
+        return events, status
+
+    def _read(self, task_id: str, after_seq: int) -> Tuple[List[Tuple[int, dict]], str, float]:
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute("SELECT status, lease_until FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None:
+                return [], "", 0.0
+            rows = conn.execute(
+                "SELECT seq, event, data FROM task_events WHERE task_id = ? AND seq > ? ORDER BY seq",
+                (task_id, after_seq),
+            ).fetchall()
+        return [(seq, {"event": event, "data": data}) for seq, event, data in rows], row[0], row[1]
+
+    def _expire(self, task_id: str) -> bool:
+        """worker 失联：结束任务并追加错误事件
+
+        在写事务中重新检查租约，期间已被续约或已结束时不处理并返回 False。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT worker_id FROM tasks WHERE task_id = ? AND status = 'running' AND lease_until < ?",
+                (task_id, now),
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute("UPDATE tasks SET status = 'failed', updated_at = ? WHERE task_id = ?", (now, task_id))
+            conn.execute("DELETE FROM task_files WHERE task_id = ?", (task_id,))
+            self._append(conn, task_id, {
+                "event": "error",
+                "data": json.dumps({
+                    "message": f"worker {row[0]} 租约过期，任务中断",
+                    "trace_id": task_id
+                }, ensure_ascii=False),
+            })
+        return True
+
+    def cancel(self, task_id: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'failed', updated_at = ? WHERE task_id = ? AND status = 'queued'",
+                (time.time(), task_id),
+            )
+            if cursor.rowcount:
+                conn.execute("DELETE FROM task_files WHERE task_id = ?", (task_id,))
+            return cursor.rowcount > 0
+
+
+def create_broker() -> TaskBroker:
+    """按配置创建任务队列：BROKER 为空时使用本地 SQLite，或指定 "模块路径:类名" 的自定义实现"""
+    if Config.BROKER:
+        module_name, _, class_name = Config.BROKER.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)()
+    return SQLiteBroker(Config.BROKER_SQLITE_PATH, Config.BROKER_RETENTION_SECONDS)
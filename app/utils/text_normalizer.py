@@ -0,0 +1,214 @@
+"""版面噪声清理 - 压缩前去掉解析出的 PDF 文本中与内容无关的部分
+
+MarkItDown（pdfminer）从 PDF 提取的文本带有大量版面噪声，每个分块都会原样
+送给 LLM：
+
+- 页眉页脚：在多页的页首页尾重复出现的短行（含页码的行把数字归一化后比较，
+  "某某报告 第 3 页" 与 "某某报告 第 4 页" 视为同一行）。需要页边界：整篇文本按换页符 \\f 分页，
+  流式解析时逐页调用 normalize_page
+- 页码："第 N 页"、"- N -"、"N/M"、"Page N"，以及页首页尾单独的数字或罗马数字
+- 目录：带引导点的目录行（"第一章 概述 ........ 3"）及其 "目录" 标题
+- 声明：版权、免责、保密等声明行，只在首页、页首页尾或在多页重复出现时清理
+  （正文中的"未经……同意不得……"等句子保留）
+- 只有符号的行（项目符号、装饰线）
+- 硬换行：中文句子被按版面宽度折成多行时，合并为一行
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+
+_PAGE_NUMBER = re.compile(
+    r"^(?:第\s*\d+\s*页(?:\s*[,，/／]?\s*共\s*\d+\s*页)?|共\s*\d+\s*页\s*第\s*\d+\s*页"
+    r"|[-—–]\s*\d{1,4}\s*[-—–]|\d{1,3}\s*[/／]\s*\d{1,3}|page\s*\d+(?:\s*of\s*\d+)?)$",
+    re.IGNORECASE,
+)
+_PAGE_NUMBER_FRAGMENT = re.compile(r"第\s*\d+\s*页|\d+\s*[/／]\s*\d+|page\s*\d+|[-—–]\s*\d+\s*[-—–]", re.IGNORECASE)
+_BARE_NUMBER = re.compile(r"^(?:\d{1,4}|[ivxlc]{1,6})$", re.IGNORECASE)
+_TOC_LINE = re.compile(r"^.{1,80}?(?:\s*[.．·…。•_-]){4,}\s*\d{1,4}$")
+_TOC_TITLE = re.compile(r"^(?:目\s*录|contents|table of contents)$", re.IGNORECASE)
+_DISCLAIMER = re.compile(
+    r"免责声明|版权所有|版权归|仅供内部|内部资料|注意保密|不得外传|未经.{0,20}(?:许可|同意|授权)"
+    r"|copyright|all rights reserved",
+    re.IGNORECASE,
+)
+_CONTENT = re.compile(r"[0-9A-Za-z\u4e00-\u9fff]")
+_MARKDOWN_RULE = re.compile(r"^(?:[-*_]\s*){3,}$")
+# 标题、表格、引用、列表与编号行不参与换行合并
+_STRUCTURAL = re.compile(
+    r"^(?:#|\||>|[-*+]\s|\d+[.、．)]|[（(][一二三四五六七八九十\d]+[）)]|[一二三四五六七八九十]+、|\[表\]|```)"
+)
+_CJK = re.compile(r"[\u4e00-\u9fff]")
+_SENTENCE_END = set("。！？!?；;：:…")
+_LEADING_PUNCTUATION = set("，。、；：！？）”》")
+
+_MAX_REPEATED_LINE_CHARS = 60  # 只有短行会被视为页眉页脚
+_MIN_WRAPPED_LINE_CHARS = 15  # 被折行的行应接近整行宽度
+_EDGE_LINES = 3  # 页首页尾各检查几行（页眉页脚与单独的页码）
+_REPEATED_PAGE_RATIO = 0.3  # 整篇文本中出现在该比例以上页面的短行视为页眉页脚
+_MAX_DISCLAIMER_CHARS = 200
+
+
+def _line_key(line: str) -> str:
+    """页眉页脚比较用的键：去空白，含页码的行数字归一化；非数字字符过少的行不参与比较"""
+    key = re.sub(r"\s+", "", line)
+    if _PAGE_NUMBER_FRAGMENT.search(line):
+        key = re.sub(r"\d+", "#", key)
+    return key if len(re.sub(r"[\d#]", "", key)) >= 4 else ""
+
+
+def _edge_lines(lines: List[str]) -> Set[int]:
+    """页首页尾的非空行下标"""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    return set(content[:_EDGE_LINES] + content[-_EDGE_LINES:])
+
+
+def _page_keys(page: str) -> Set[str]:
+    """页首页尾短行的键"""
+    lines = page.split("\n")
+    keys = set()
+    for i in _edge_lines(lines):
+        line = lines[i].strip()
+        if len(line) <= _MAX_REPEATED_LINE_CHARS and not _STRUCTURAL.match(line):
+            key = _line_key(line)
+            if key:
+                keys.add(key)
+    return keys
+
+
+def _disclaimer_keys(page: str) -> Set[str]:
+    """声明行的键（用于识别在多页重复出现的声明）"""
+    keys = set()
+    for line in page.split("\n"):
+        line = line.strip()
+        if len(line) <= _MAX_DISCLAIMER_CHARS and _DISCLAIMER.search(line):
+            key = _line_key(line)
+            if key:
+                keys.add(key)
+    return keys
+
+
+def _continues(prev: str, line: str) -> bool:
+    """line 是否为 prev 被硬换行折断的后半句"""
+    if not prev or not line or _STRUCTURAL.match(prev) or _STRUCTURAL.match(line):
+        return False
+    if line[0] in _LEADING_PUNCTUATION:
+        return True
+    return (
+        len(prev) >= _MIN_WRAPPED_LINE_CHARS
+        and prev[-1] not in _SENTENCE_END
+        and (_CJK.match(prev[-1]) is not None or prev[-1] in "，、（“《）”")
+        and (_CJK.match(line[0]) is not None or line[0] in "（“《")
+    )
+
+
+class TextNormalizer:
+    """单份文档的版面噪声清理，stats 累计各类清理的行数"""
+
+    def __init__(self, min_repeats: int = 3):
+        """
+        Args:
+            min_repeats: 同一短行至少在多少页中出现才视为页眉页脚
+        """
+        self.min_repeats = min_repeats
+        self.stats: Counter = Counter()
+        self._seen: Counter = Counter()  # 逐页调用时各短行出现过的页数
+        self._seen_disclaimers: Set[str] = set()  # 逐页调用时此前各页出现过的声明行
+        self._pages = 0  # 逐页调用时已处理的页数
+
+    def normalize(self, text: str) -> str:
+        """整篇文本：按换页符分页，统计跨页重复的短行后逐页清理"""
+        pages = text.split("\f")
+        repeated: Set[str] = set()
+        if len(pages) >= self.min_repeats:
+            counts = Counter(key for page in pages for key in _page_keys(page))
+            threshold = max(self.min_repeats, len(pages) * _REPEATED_PAGE_RATIO)
+            repeated = {key for key, count in counts.items() if count >= threshold}
+        disclaimer_counts = Counter(key for page in pages for key in _disclaimer_keys(page))
+        disclaimers = {key for key, count in disclaimer_counts.items() if count >= 2}
+        paged = len(pages) > 1
+        return self._join(
+            self._clean(page, repeated, paged, first_page=paged and i == 0, disclaimers=disclaimers)
+            for i, page in enumerate(pages)
+        )
+
+    def normalize_page(self, page: str) -> str:
+        """流式解析逐页（或逐个含换页符的片段）调用：此前已在 min_repeats - 1 页中出现过的短行视为页眉页脚"""
+        cleaned = []
+        for piece in page.split("\f"):
+            keys = _page_keys(piece)
+            repeated = {key for key in keys if self._seen[key] >= self.min_repeats - 1}
+            self._seen.update(keys)
+            disclaimer_keys = _disclaimer_keys(piece)
+            disclaimers = disclaimer_keys & self._seen_disclaimers
+            self._seen_disclaimers |= disclaimer_keys
+            cleaned.append(self._clean(
+                piece, repeated, paged=True, first_page=self._pages == 0, disclaimers=disclaimers
+            ))
+            self._pages += 1
+        return self._join(cleaned)
+
+    @staticmethod
+    def _join(pages: Iterable[str]) -> str:
+        return "\n\n".join(page for page in pages if page)
+
+    def _drop(self, line: str, repeated: Set[str], at_edge: bool, disclaimer_allowed: bool,
+              disclaimers: Set[str]) -> str:
+        """判断一行是否为噪声，返回统计项名称（保留时返回空串）
+
+        声明行只在 disclaimer_allowed（首页或页首页尾）或在多页重复出现（键在 disclaimers 中）时清理。
+        """
+        if at_edge and repeated and len(line) <= _MAX_REPEATED_LINE_CHARS and _line_key(line) in repeated:
+            return "repeated_lines"
+        if _PAGE_NUMBER.match(line) or (at_edge and _BARE_NUMBER.match(line)):
+            return "page_numbers"
+        if _TOC_LINE.match(line):
+            return "toc_lines"
+        if (
+            len(line) <= _MAX_DISCLAIMER_CHARS
+            and _DISCLAIMER.search(line)
+            and (disclaimer_allowed or _line_key(line) in disclaimers)
+        ):
+            return "disclaimers"
+        if not _CONTENT.search(line) and "|" not in line and not _MARKDOWN_RULE.match(line):
+            return "symbol_lines"
+        return ""
+
+    def _clean(self, page: str, repeated: Set[str], paged: bool, first_page: bool = False,
+               disclaimers: Set[str] = frozenset()) -> str:
+        lines = page.split("\n")
+        # 未分页的文本没有页码与页眉页脚，但文首文末的声明行仍清理
+        text_edges = _edge_lines(lines)
+        edges = text_edges if paged else set()
+
+        kept: List[str] = []
+        toc_found = False
+        for i, raw in enumerate(lines):
+            line = raw.strip()
+            if not line:
+                kept.append("")
+                continue
+            reason = self._drop(line, repeated, i in edges, first_page or i in text_edges, disclaimers)
+            if reason:
+                self.stats[reason] += 1
+                toc_found = toc_found or reason == "toc_lines"
+                continue
+            kept.append(raw.rstrip())
+
+        if toc_found:
+            titles = [line for line in kept if _TOC_TITLE.match(line.strip())]
+            self.stats["toc_lines"] += len(titles)
+            kept = [line for line in kept if not _TOC_TITLE.match(line.strip())]
+
+        # 合并硬换行，连续空行压缩为一个
+        merged: List[str] = []
+        for line in kept:
+            if merged and merged[-1] and _continues(merged[-1].strip(), line.strip()):
+                merged[-1] = merged[-1].rstrip() + line.strip()
+                self.stats["reflowed_lines"] += 1
+            elif line or (merged and merged[-1]):
+                merged.append(line)
+        return "\n".join(merged).strip()
+
+    def report(self) -> Dict[str, int]:
+        return dict(self.stats)
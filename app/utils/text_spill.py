@@ -0,0 +1,104 @@
+"""内存受限处理 - 解析文本落盘与请求级内存预算
+
+SpilledText 把文档解析出的片段依次写入临时文件，只在内存中保留各片段的
+偏移量；读取时通过内存映射按片段解码，任一时刻只有正在处理的片段驻留内存。
+
+MemoryBudget 统计一次请求中驻留内存的文本（待压缩分块及其 prompt、已完成的
+摘要），新分块在预算不足时等待已有分块完成后再提交。
+"""
+import asyncio
+import mmap
+import os
+import sys
+import tempfile
+from typing import Iterator, List, Optional, Tuple
+
+
+class SpilledText:
+    """落盘的文档文本（按片段追加，按片段读取）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix=".md", dir=directory or None)
+        self._file = os.fdopen(fd, "wb")
+        self._offsets: List[Tuple[int, int]] = []
+        self.nbytes = 0
+        self.chars = 0
+
+    def append(self, text: str) -> None:
+        """追加一个片段"""
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._offsets.append((self.nbytes, len(data)))
+        self.nbytes += len(data)
+        self.chars += len(text)
+
+    def sections(self) -> Iterator[str]:
+        """按写入顺序逐个读取片段"""
+        if not self._file.closed:
+            self._file.close()
+        if not self.nbytes:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, length in self._offsets:
+                yield mm[start:start + length].decode("utf-8")
+
+    def close(self) -> None:
+        """删除临时文件"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class MemoryBudget:
+    """请求级文本内存预算"""
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self.peak_bytes = 0
+        self.exceeded = False
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        """估算处理一个分块的驻留内存（分块文本 + 由其生成的 prompt）"""
+        return sys.getsizeof(text) * 2
+
+    def _take(self, n: int) -> None:
+        self.used_bytes += n
+        self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+        if self.used_bytes > self.limit_bytes:
+            self.exceeded = True
+
+    async def acquire(self, n: int) -> None:
+        """为一个待处理分块申请内存，预算不足时等待其他分块完成
+
+        没有其他分块在处理时直接放行（单个分块超出预算也要处理），并记为超出预算。
+        """
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight == 0 or self.used_bytes + n <= self.limit_bytes)
+            self._in_flight += 1
+            self._take(n)
+
+    async def release(self, n: int) -> None:
+        """分块处理完成，归还内存"""
+        async with self._cond:
+            self._in_flight -= 1
+            self.used_bytes -= n
+            self._cond.notify_all()
+
+    def hold(self, n: int) -> None:
+        """记入常驻内存（如已完成的摘要），不等待"""
+        self._take(n)
+
+    def report(self, spilled_bytes: int) -> dict:
+        return {
+            "budget_bytes": self.limit_bytes,
+            "peak_bytes": self.peak_bytes,
+            "spilled_bytes": spilled_bytes,
+            "exceeded": self.exceeded,
+        }
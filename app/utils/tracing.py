@@ -0,0 +1,283 @@
+"""请求级链路追踪
+
+以 trace_id 为根记录一次请求内各环节的 span（上传、逐文件解析、拆分、每次
+LLM 调用的排队/首字/生成、SSE 发送等），请求结束后交给导出器；默认导出器
+把每个 trace 写为本地 JSON 文件（TRACE_DIR/<trace_id>.json），根 span 结束后
+补记的 span（如 SSE 发送）追加到 TRACE_DIR/<trace_id>.late.jsonl。导出在后台
+线程中按提交顺序执行，序列化与写盘不占用事件循环。
+
+用法：
+    with tracer.span("request", trace_id=trace_id):        # 没有父 span 时创建根 span
+        with tracer.span("parse_file", filename=name) as span:
+            ...
+            if span:
+                span.set(chars=len(text))
+
+    # 已知起止时间的 span（如在线程中或根 span 结束后补记）
+    tracer.add_span("sse_send", start, end, trace_id=trace_id, events=n)
+
+当前 span 保存在 contextvar 中，asyncio 任务自动继承；未启用追踪或没有
+所属 trace 时 span() 不做任何记录并返回 None。
+"""
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """一个计时环节"""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        """补充属性"""
+        self.attributes.update(attributes)
+
+
+class SpanExporter:
+    """导出器接口：trace 结束时收到该 trace 的全部 span，之后补记的 span 逐个追加
+
+    导出在 Tracer 的后台线程中调用，可以执行阻塞 I/O。
+    """
+
+    def export(self, trace_id: str, spans: List[dict]) -> None:
+        raise NotImplementedError
+
+    def append(self, trace_id: str, spans: List[dict]) -> None:
+        """追加 trace 导出之后补记的 span（默认读取已导出的 span 合并后重新导出）"""
+        self.export(trace_id, (self.load(trace_id) or []) + spans)
+
+    def load(self, trace_id: str) -> Optional[List[dict]]:
+        """读取已导出的 trace（不支持时返回 None）"""
+        return None
+
+
+class LocalFileExporter(SpanExporter):
+    """每个 trace 写一个 JSON 文件"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+
+    def _path(self, trace_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.base_dir, f"{os.path.basename(trace_id)}{suffix}")
+
+    def export(self, trace_id: str, spans: List[dict]) -> None:
+        tmp_path = self._path(trace_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"trace_id": trace_id, "spans": spans}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(trace_id))
+
+    def append(self, trace_id: str, spans: List[dict]) -> None:
+        with open(self._path(trace_id, ".late.jsonl"), "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+    def load(self, trace_id: str) -> Optional[List[dict]]:
+        path = self._path(trace_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            spans = json.load(f)["spans"]
+        late_path = self._path(trace_id, ".late.jsonl")
+        if os.path.exists(late_path):
+            with open(late_path, encoding="utf-8") as f:
+                spans.extend(json.loads(line) for line in f if line.strip())
+        return spans
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """收集 span，根 span 结束时导出整个 trace"""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, retain: int = 100):
+        """
+        Args:
+            exporter: 导出器，为 None 时不记录任何 span
+            retain: 内存中保留的已完成 trace 数量（供查询接口直接返回）
+        """
+        self.exporter = exporter
+        self.retain = retain
+        self._active: Dict[str, List[Span]] = {}
+        self._finished: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._roots: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # 单线程导出：同一 trace 的导出与追加保持提交顺序
+        self._export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            if span.trace_id in self._active:
+                self._active[span.trace_id].append(span)
+                return
+            if span.trace_id not in self._finished:
+                return
+            # trace 已导出（如 SSE 发送在摘要完成之后结束）：只追加补记的 span
+            self._finished[span.trace_id].append(span)
+        self._submit(self.exporter.append, span.trace_id, [span])
+
+    def _finish_trace(self, trace_id: str) -> None:
+        with self._lock:
+            spans = self._active.pop(trace_id, [])
+            self._finished[trace_id] = spans
+            while len(self._finished) > self.retain:
+                old_id, _ = self._finished.popitem(last=False)
+                self._roots.pop(old_id, None)
+            spans = list(spans)
+        self._submit(self.exporter.export, trace_id, spans)
+
+    def _submit(self, method, trace_id: str, spans: List[Span]) -> None:
+        """在后台线程中序列化并导出（已结束的 span 不再修改）"""
+        def run():
+            try:
+                method(trace_id, [asdict(s) for s in spans])
+            except Exception as e:
+                logger.warning(f"trace 导出失败: {trace_id} ({e})")
+        self._export_pool.submit(run)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的导出完成"""
+        self._export_pool.submit(lambda: None).result(timeout)
+
+    @contextmanager
+    def span(self, name: str, trace_id: str = "", start: Optional[float] = None, **attributes) -> Iterator[Optional[Span]]:
+        """记录一个 span；当前没有父 span 且给出 trace_id 时作为该 trace 的根 span
+
+        Args:
+            name: 名称
+            trace_id: 追踪ID（仅创建根 span 时需要）
+            start: 起始时间（默认为当前时间，可用于把之前发生的环节计入根 span）
+            **attributes: 属性
+        """
+        parent = _current_span.get()
+        if parent is not None and trace_id and parent.trace_id != trace_id:
+            parent = None  # 属于另一个 trace：作为新的根 span
+        if not self.enabled or (parent is None and not trace_id):
+            yield None
+            return
+        is_root = parent is None
+        span = Span(
+            name=name,
+            trace_id=trace_id if is_root else parent.trace_id,
+            parent_id=None if is_root else parent.span_id,
+            attributes=dict(attributes),
+        )
+        if start is not None:
+            span.start = start
+        if is_root:
+            with self._lock:
+                self._active[span.trace_id] = []
+                self._roots[span.trace_id] = span.span_id
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.time()
+            self._record(span)
+            if is_root:
+                self._finish_trace(span.trace_id)
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        trace_id: str = "",
+        parent: Optional[Span] = None,
+        **attributes,
+    ) -> Optional[Span]:
+        """补记已知起止时间的 span
+
+        父 span 依次取 parent、当前 span；都没有时挂到 trace_id 的根 span 下。
+
+        Returns:
+            Optional[Span]: 记录的 span（未启用或找不到所属 trace 时为 None），可作为子 span 的 parent
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            with self._lock:
+                parent_id = self._roots.get(trace_id)
+            if parent_id is None:
+                return None
+        span = Span(name=name, trace_id=trace_id, parent_id=parent_id, start=start, end=end, attributes=dict(attributes))
+        self._record(span)
+        return span
+
+    def get_tree(self, trace_id: str) -> Optional[dict]:
+        """返回 trace 的 span 树（start_ms 为相对根 span 起点的毫秒数）"""
+        with self._lock:
+            spans = self._active.get(trace_id) or self._finished.get(trace_id)
+            spans = [asdict(s) for s in spans] if spans else None
+        if spans is None and self.exporter is not None:
+            spans = self.exporter.load(trace_id)
+        if not spans:
+            return None
+
+        origin = min(s["start"] for s in spans)
+        nodes = {}
+        for s in sorted(spans, key=lambda s: s["start"]):
+            nodes[s["span_id"]] = {
+                "name": s["name"],
+                "span_id": s["span_id"],
+                "start_ms": round((s["start"] - origin) * 1000, 2),
+                "duration_ms": round((s["end"] - s["start"]) * 1000, 2) if s["end"] else None,
+                "attributes": s["attributes"],
+                "children": [],
+                "_parent": s["parent_id"],
+            }
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node.pop("_parent"))
+            (parent["children"] if parent else roots).append(node)
+        return {"trace_id": trace_id, "spans": roots}
+
+
+def create_exporter() -> Optional[SpanExporter]:
+    """按配置创建导出器：TRACE_EXPORTER 为空时写本地文件，或指定 "模块路径:类名" 的自定义导出器"""
+    if not Config.TRACING:
+        return None
+    if Config.TRACE_EXPORTER:
+        module_name, _, class_name = Config.TRACE_EXPORTER.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)()
+    return LocalFileExporter(Config.TRACE_DIR)
+
+
+tracer = Tracer(create_exporter())
@@ -0,0 +1,149 @@
+"""worker 进程 - 分布式执行时从任务队列领取并运行摘要流程
+
+API 节点（DISTRIBUTED=true）只负责接收请求与转发事件，摘要流程由任意节点上的
+worker 进程执行。worker 无状态：上传文件内容随任务传递；引用文档库文档、从检查点
+继续时，DOCUMENT_STORE_DIR 与 CHECKPOINT_DIR 需与 API 节点共享。
+
+用法：
+    python -m app.worker --concurrency 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+
+from app.config import Config
+from app.api.pipeline import run_pipeline
+from app.utils.background_writer import background_writer
+from app.utils.logging_setup import setup_logging, shutdown_logging
+from app.utils.task_broker import LeaseLostError, TaskBroker, create_broker
+from app.utils.tracing import tracer
+from app.workflow.summarizer import ReportSummarizer, init_agentscope
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """领取任务并执行，执行期间定期续约"""
+
+    def __init__(self, broker: TaskBroker, summarizer: ReportSummarizer, concurrency: int):
+        self.broker = broker
+        self.summarizer = summarizer
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    async def run(self) -> None:
+        """运行 concurrency 个领取循环，直到被取消"""
+        logger.info(f"worker {self.worker_id} 启动，并发数: {self.concurrency}")
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                task = await asyncio.to_thread(self.broker.claim, self.worker_id, Config.BROKER_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"领取任务失败: {str(e)}")
+                task = None
+            if task is None:
+                await asyncio.sleep(Config.BROKER_POLL_MS / 1000)
+                continue
+            await self._execute(task)
+
+    async def _keep_lease(self, task_id: str, pipeline: asyncio.Task, lost: asyncio.Event) -> None:
+        """每隔租约的三分之一续约一次；续约失败时停止执行（任务可能已由其他 worker 领取）"""
+        while True:
+            await asyncio.sleep(Config.BROKER_LEASE_SECONDS / 3)
+            if not await asyncio.to_thread(self.broker.renew, task_id, self.worker_id, Config.BROKER_LEASE_SECONDS):
+                logger.warning(f"任务 {task_id} 续约失败（租约已过期），停止执行")
+                lost.set()
+                pipeline.cancel()
+                return
+
+    async def _run(self, task: dict, publish) -> None:
+        payload = task["payload"]
+        documents = []
+        for doc_id in payload["documents"]:
+            document = self.summarizer.documents.get(doc_id)
+            if document is None:
+                raise FileNotFoundError(f"文档库中没有该文档: {doc_id}（DOCUMENT_STORE_DIR 需与 API 节点共享）")
+            documents.append(document)
+        with tracer.span("worker", trace_id=payload["trace_id"], worker_id=self.worker_id):
+            await run_pipeline(
+                self.summarizer, publish, task["uploads"], documents, payload["request"],
+                payload["trace_id"], resume=payload["resume"],
+            )
+
+    async def _execute(self, task: dict) -> None:
+        task_id = task["task_id"]
+        payload = task["payload"]
+        logger.info(f"worker {self.worker_id} 开始执行任务: {task_id}")
+
+        failed = []
+        lost = asyncio.Event()
+
+        async def publish(event: dict):
+            if event["event"] == "error":
+                failed.append(event)
+            await asyncio.to_thread(self.broker.publish, task_id, self.worker_id, event)
+
+        pipeline = asyncio.create_task(self._run(task, publish))
+        lease = asyncio.create_task(self._keep_lease(task_id, pipeline, lost))
+        status = "failed"
+        try:
+            await pipeline
+            status = "done"
+        except asyncio.CancelledError:
+            if not lost.is_set():
+                raise
+        except LeaseLostError:
+            lost.set()
+        except Exception as e:
+            # run_pipeline 中的失败已记录并发布错误事件，其余失败在此补发
+            if not failed:
+                logger.error(f"任务 {task_id} 失败: {str(e)}")
+                try:
+                    await publish({
+                        "event": "error",
+                        "data": json.dumps({"message": str(e), "trace_id": payload["trace_id"]}, ensure_ascii=False)
+                    })
+                except LeaseLostError:
+                    lost.set()
+        finally:
+            lease.cancel()
+            if not await asyncio.to_thread(self.broker.finish, task_id, self.worker_id, status):
+                lost.set()
+        if lost.is_set():
+            logger.warning(f"任务 {task_id} 已失去租约，结果未写入队列")
+        else:
+            logger.info(f"任务 {task_id} 结束: {status}")
+
+
+async def _main(concurrency: int) -> None:
+    await asyncio.to_thread(init_agentscope)
+    summarizer = ReportSummarizer()
+    await asyncio.to_thread(summarizer.preload)
+    os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
+    await Worker(create_broker(), summarizer, concurrency).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从任务队列领取并运行摘要流程")
+    parser.add_argument("--concurrency", type=int, default=Config.WORKER_CONCURRENCY, help="同时执行的任务数")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(_main(args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("worker 已停止")
+    finally:
+        tracer.flush(timeout=5)
+        background_writer.flush(timeout=5)
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""按信息量分配逐文档摘要长度
+
+逐文档压缩的 prompt 没有长度要求时，长篇附录和两页纸的简报会得到长度相近的
+摘要，合并后常常超出总体压缩的分块上限，只能分多次压缩。这里在逐文档压缩前
+为每份文档估计信息量并分配目标摘要字数，使全部摘要合并后尽量能一次完成总体压缩：
+
+    权重 = sqrt(字数) × (1 + 信息密度)
+
+字数取平方根，避免超长文档占满预算；信息密度由数字密度与报告类型关注点的
+出现频率估计。目标字数按权重分配，并限制在 [min_chars, 字数 × max_ratio]
+之间，受上限约束的文档多出的预算按权重分给其余文档。
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, List
+
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?%?")
+
+
+@dataclass
+class DocumentBudget:
+    """单份文档的分配结果"""
+    chars: int
+    density: float
+    target_chars: int = 0
+
+
+def information_density(text: str, focus_terms: Iterable[str]) -> float:
+    """信息密度：每千字中的数字个数与关注点出现次数，归一化到约 0~2"""
+    if not text:
+        return 0.0
+    per_k = 1000 / len(text)
+    numbers = len(_NUMBER_PATTERN.findall(text)) * per_k
+    keywords = sum(text.count(term) for term in focus_terms) * per_k
+    # 数据密集的报告每千字约 30 个数字、10 次关注点
+    return min(numbers / 30, 1.0) + min(keywords / 10, 1.0)
+
+
+def allocate(budgets: List[DocumentBudget], total_chars: int, min_chars: int, max_ratio: float) -> List[DocumentBudget]:
+    """在 total_chars 内为各文档分配目标摘要字数（原地写入 target_chars）"""
+    caps = [max(min(int(b.chars * max_ratio), b.chars), 1) for b in budgets]
+    floors = [min(min_chars, cap) for cap in caps]
+    weights = [math.sqrt(b.chars) * (1 + b.density) for b in budgets]
+    targets = [0.0] * len(budgets)
+    active = [i for i, b in enumerate(budgets) if b.chars > 0]
+    remaining = float(total_chars)
+
+    # 按权重分配，超过上限的文档取上限并退出，剩余预算在其余文档间重新分配
+    while active and remaining > 0:
+        weight_sum = sum(weights[i] for i in active) or 1.0
+        capped = [i for i in active if remaining * weights[i] / weight_sum >= caps[i]]
+        if not capped:
+            for i in active:
+                targets[i] = remaining * weights[i] / weight_sum
+            break
+        for i in capped:
+            targets[i] = caps[i]
+            remaining -= caps[i]
+            active.remove(i)
+
+    for b, target, floor in zip(budgets, targets, floors):
+        b.target_chars = max(int(target), floor)
+    return budgets
@@ -0,0 +1,175 @@
+"""自适应分块规划 - 根据实测 LLM 延迟与吞吐选择分块大小与并行度"""
+import json
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+from app.utils.background_writer import background_writer
+
+
+@dataclass
+class CallSample:
+    """单次 LLM 调用的实测数据"""
+    prompt_chars: int
+    output_chars: int
+    ttft_ms: float        # 首个增量到达耗时（含 prefill）
+    generation_ms: float  # 首个增量之后的生成耗时
+
+
+@dataclass
+class LatencyModel:
+    """单次调用耗时模型：ttft = base + prefill * 输入字数，生成 = 输出字数 / 速率"""
+    base_ms: float = 500.0
+    prefill_ms_per_char: float = 0.05
+    gen_chars_per_s: float = 30.0
+    output_ratio: float = 0.3   # 输出字数 / 输入字数
+    samples: int = 0
+
+    def predict_call_ms(self, chars: int) -> float:
+        """预测处理 chars 字输入的单次调用耗时"""
+        output_chars = chars * self.output_ratio
+        return self.base_ms + self.prefill_ms_per_char * chars + output_chars / self.gen_chars_per_s * 1000
+
+
+@dataclass
+class ChunkPlan:
+    """分块规划结果"""
+    stage: str
+    total_chars: int
+    max_chars: int
+    chunks: int
+    parallelism: int
+    predicted_ms: float
+    model: dict = field(default_factory=dict)
+    candidates: List[dict] = field(default_factory=list)
+    trace_id: str = ""
+    created_at: float = 0.0
+
+
+class LatencyStats:
+    """按阶段统计最近的 LLM 调用数据（滑动窗口）"""
+
+    def __init__(self, window: int = 50, min_samples: int = 3):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[CallSample]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, sample: CallSample) -> None:
+        """记录一次调用"""
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(sample)
+
+    def model(self, stage: str) -> LatencyModel:
+        """由最近样本拟合耗时模型，样本不足时使用默认值"""
+        with self._lock:
+            samples = list(self._samples.get(stage, ()))
+        model = LatencyModel(samples=len(samples))
+        if len(samples) < self.min_samples:
+            return model
+
+        # ttft 对输入字数做最小二乘线性拟合；输入长度无差异时只估计常数项
+        xs = [s.prompt_chars for s in samples]
+        ys = [s.ttft_ms for s in samples]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x > 0:
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+            model.prefill_ms_per_char = max(slope, 0.0)
+            model.base_ms = max(mean_y - model.prefill_ms_per_char * mean_x, 0.0)
+        else:
+            model.base_ms = mean_y
+            model.prefill_ms_per_char = 0.0
+
+        generated = sum(s.output_chars for s in samples)
+        gen_seconds = sum(s.generation_ms for s in samples) / 1000
+        if generated and gen_seconds > 0:
+            model.gen_chars_per_s = generated / gen_seconds
+        model.output_ratio = generated / max(sum(xs), 1)
+        return model
+
+    def snapshot(self) -> dict:
+        """各阶段当前模型参数"""
+        with self._lock:
+            stages = list(self._samples)
+        return {stage: asdict(self.model(stage)) for stage in stages}
+
+
+class ChunkPlanner:
+    """选择使预测墙钟耗时最小的分块大小与并行度
+
+    n 个分块以并行度 p 执行时，耗时约为 ceil(n / p) 轮 × 单次调用耗时。
+    分块越大调用越少但单次越慢，分块越小并行越充分但固定开销越多。
+    """
+
+    def __init__(
+        self,
+        stats: LatencyStats,
+        concurrency: int,
+        min_chars: int,
+        max_chars: int,
+        step_chars: int = 500,
+        history: int = 200,
+        export_path: str = "",
+    ):
+        self.stats = stats
+        self.concurrency = max(concurrency, 1)
+        self.min_chars = min_chars
+        self.max_chars = max(max_chars, min_chars)
+        self.step_chars = step_chars
+        self.export_path = export_path
+        self.history = history
+        self._decisions: Deque[ChunkPlan] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def plan(self, stage: str, total_chars: int, trace_id: str = "") -> ChunkPlan:
+        """为一次请求的某阶段规划分块
+
+        Args:
+            stage: 阶段名称（如 doc_compress）
+            total_chars: 该阶段待处理的总字数
+            trace_id: 追踪ID
+
+        Returns:
+            ChunkPlan: 规划结果
+        """
+        model = self.stats.model(stage)
+        candidates = []
+        best = None
+        for size in range(self.min_chars, self.max_chars + 1, self.step_chars):
+            chunks = max(math.ceil(total_chars / size), 1)
+            parallelism = min(chunks, self.concurrency)
+            waves = math.ceil(chunks / parallelism)
+            predicted = waves * model.predict_call_ms(math.ceil(max(total_chars, 1) / chunks))
+            candidate = {"max_chars": size, "chunks": chunks, "parallelism": parallelism, "predicted_ms": predicted}
+            candidates.append(candidate)
+            # 预测耗时相同时取更大的分块（调用次数更少）
+            if best is None or predicted <= best["predicted_ms"]:
+                best = candidate
+
+        plan = ChunkPlan(
+            stage=stage,
+            total_chars=total_chars,
+            model=asdict(model),
+            candidates=candidates,
+            trace_id=trace_id,
+            created_at=time.time(),
+            **best,
+        )
+        with self._lock:
+            self._decisions.append(plan)
+        if self.export_path:
+            # 写盘交给后台线程，不阻塞请求
+            background_writer.append(self.export_path, json.dumps(asdict(plan), ensure_ascii=False) + "\n")
+        return plan
+
+    def export(self, limit: Optional[int] = None) -> dict:
+        """导出当前模型参数与最近的 limit 条规划决策（limit 为空时导出全部保留的决策）"""
+        with self._lock:
+            recent = list(self._decisions)
+        if limit is not None:
+            recent = recent[-limit:] if limit > 0 else []
+        decisions = [asdict(d) for d in recent]
+        return {"stats": self.stats.snapshot(), "decisions": decisions}
@@ -0,0 +1,49 @@
+"""单次 summarize 运行的上下文"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from app.config import ReportType
+from app.utils.text_normalizer import TextNormalizer
+
+
+@dataclass
+class RunContext:
+    """在各阶段之间传递的请求参数与运行状态"""
+    trace_id: str
+    report_type: ReportType
+    max_words: int
+    max_paragraphs: int
+    requirements: str
+    progress_callback: Optional[Callable] = None
+    stream_callback: Optional[Callable] = None
+    stage_durations: Dict[str, float] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+    document_stats: Dict[str, dict] = field(default_factory=dict)  # 按文件名记录的预处理统计
+    normalizers: Dict[str, TextNormalizer] = field(default_factory=dict)  # 按文件名的版面噪声清理状态（逐页调用时跨页统计）
+    stage_models: Dict[str, str] = field(default_factory=dict)  # 各阶段类别实际调用的模型（由 _call_llm 记录）
+    
+    # 周期性报告章节复用
+    series_id: str = ""
+    section_reuse: bool = False
+    sections_total: int = 0
+    sections_reused: int = 0
+    
+    # 内存受限模式的预算统计（见 MemoryBudget.report）
+    memory_stats: Optional[dict] = None
+    
+    # 事实抽取模式的统计（记录数、去重后条数、总体压缩输入字数）
+    fact_stats: Optional[dict] = None
+    
+    # 编辑指令模式的验证统计（采用方式、各类指令数、模型输出字数）
+    validate_stats: Optional[dict] = None
+    
+    # 阶段检查点：已完成阶段的中间结果（None 表示未启用），restored 为恢复运行时已有的阶段
+    checkpoint: Optional[Dict[str, object]] = None
+    restored: Dict[str, object] = field(default_factory=dict)
+    
+    # 过载降级：跳过验证修订、分块放大倍数、抽取式预压缩保留比例（0 表示不抽取）
+    skip_validate: bool = False
+    chunk_scale: float = 1.0
+    extractive_ratio: float = 0.0
+    
+    # 文档库：本次请求中来自文档库的文件路径 → 文档库 ID
+    library: Dict[str, str] = field(default_factory=dict)
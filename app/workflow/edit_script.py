@@ -0,0 +1,114 @@
+"""验证修订的编辑指令 - 只输出需要修改的段落，不重新生成整篇报告
+
+报告按空行切分为段落并编号，模型每行输出一条 JSON 指令：
+
+    {"op": "delete", "index": 3}
+    {"op": "replace", "index": 5, "text": "改写后的段落"}
+    {"op": "shorten", "index": 7, "text": "精简后的段落"}
+
+无需修改时输出 []。指令在本地校验并应用；格式错误、序号越界、同一段落多条指令、
+精简后反而更长或删除全部段落时抛出 EditScriptError，由调用方改为整篇重写。
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import List
+
+
+_OPS = ("delete", "replace", "shorten")
+_JSON_OBJECT = re.compile(r"\{.*\}")
+
+
+class EditScriptError(ValueError):
+    """编辑指令无法解析或应用"""
+
+
+@dataclass
+class Edit:
+    """一条段落编辑指令"""
+    op: str
+    index: int
+    text: str = ""
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按空行切分段落（标题也作为一个段落）"""
+    return [p.strip() for p in re.split(r"\n\s*\n", text.strip()) if p.strip()]
+
+
+def number_paragraphs(paragraphs: List[str]) -> str:
+    """带序号的报告正文，供模型按序号引用段落"""
+    return "\n\n".join(f"[{i}] {paragraph}" for i, paragraph in enumerate(paragraphs))
+
+
+def _items(output: str) -> list:
+    stripped = output.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    if not stripped:
+        raise EditScriptError("输出为空")
+    if stripped.startswith("["):
+        try:
+            items = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise EditScriptError(f"JSON 数组无法解析: {e}")
+        if not isinstance(items, list):
+            raise EditScriptError("JSON 数组无法解析")
+        return items
+
+    items = []
+    for line in stripped.splitlines():
+        if not line.strip():
+            continue
+        match = _JSON_OBJECT.search(line)
+        if not match:
+            raise EditScriptError(f"无法解析的行: {line[:50]}")
+        try:
+            items.append(json.loads(match.group()))
+        except json.JSONDecodeError as e:
+            raise EditScriptError(f"无法解析的行: {line[:50]} ({e})")
+    return items
+
+
+def parse_edits(output: str, paragraphs: List[str]) -> List[Edit]:
+    """解析并校验模型输出的编辑指令
+
+    Raises:
+        EditScriptError: 指令不合法
+    """
+    edits = []
+    seen = set()
+    for item in _items(output):
+        if not isinstance(item, dict):
+            raise EditScriptError(f"指令不是 JSON 对象: {item!r}")
+        op = str(item.get("op", "")).lower()
+        index = item.get("index")
+        # 模型可能照抄编号前缀 "[n] "，先去掉再校验（否则精简后的长度多算前缀）
+        text = re.sub(r"^\[\d+\]\s*", "", str(item.get("text") or "").strip())
+        if op not in _OPS:
+            raise EditScriptError(f"未知的操作: {op}")
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(paragraphs):
+            raise EditScriptError(f"段落序号无效: {index}")
+        if index in seen:
+            raise EditScriptError(f"同一段落有多条指令: {index}")
+        if op != "delete" and not text:
+            raise EditScriptError(f"{op} 指令缺少 text: {index}")
+        if op == "shorten" and len(text) >= len(paragraphs[index]):
+            raise EditScriptError(f"精简后的段落没有变短: {index}")
+        seen.add(index)
+        edits.append(Edit(op=op, index=index, text=text))
+
+    if paragraphs and sum(edit.op == "delete" for edit in edits) == len(paragraphs):
+        raise EditScriptError("删除了全部段落")
+    return edits
+
+
+def apply_edits(paragraphs: List[str], edits: List[Edit]) -> str:
+    """应用编辑指令，返回修订后的报告"""
+    by_index = {edit.index: edit for edit in edits}
+    result = []
+    for i, paragraph in enumerate(paragraphs):
+        edit = by_index.get(i)
+        if edit is None:
+            result.append(paragraph)
+        elif edit.op != "delete":
+            result.append(edit.text)
+    return "\n\n".join(result)
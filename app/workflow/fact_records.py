@@ -0,0 +1,135 @@
+"""结构化事实记录 - 逐文档压缩的紧凑中间表示
+
+事实抽取模式下，逐文档压缩输出 JSON 行，每行一条记录：
+
+    {"period": "2024年1-6月", "metric": "全社会用电量", "scope": "江苏/第二产业",
+     "value": "3620亿千瓦时", "yoy": "+6.8%", "statement": ""}
+
+没有具体数值的结论、原因与措施记为 statement。各文档的记录在本地合并去重
+（时间、指标、范围、数值归一化后相同即视为同一事实，来源合并），按指标、范围、
+时间排序后渲染为紧凑的 Markdown 表格，作为总体压缩的输入。
+"""
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+_FIELDS = ("period", "metric", "scope", "value", "yoy", "statement")
+_JSON_OBJECT = re.compile(r"\{.*\}")
+
+
+@dataclass
+class FactRecord:
+    """一条事实记录"""
+    period: str = ""
+    metric: str = ""
+    scope: str = ""
+    value: str = ""
+    yoy: str = ""
+    statement: str = ""
+    sources: List[str] = field(default_factory=list)
+
+    @property
+    def is_statement(self) -> bool:
+        return not self.value and bool(self.statement)
+
+
+def _normalize(text: str) -> str:
+    """归一化：全角转半角、去空白与数字中的千分位逗号、英文小写"""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text)
+    return re.sub(r"\s+", "", text).lower()
+
+
+def parse_facts(text: str, source: str) -> List[FactRecord]:
+    """解析模型输出的 JSON 行（容忍代码块标记、JSON 数组与无法解析的行）"""
+    records = []
+    stripped = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    if stripped.startswith("["):
+        try:
+            items = json.loads(stripped)
+        except json.JSONDecodeError:
+            items = None
+        if isinstance(items, list):
+            lines = [json.dumps(item, ensure_ascii=False) for item in items]
+        else:
+            lines = stripped.splitlines()
+    else:
+        lines = stripped.splitlines()
+
+    for line in lines:
+        match = _JSON_OBJECT.search(line)
+        if not match:
+            continue
+        try:
+            item = json.loads(match.group())
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(item, dict):
+            continue
+        record = FactRecord(**{key: str(item.get(key) or "").strip() for key in _FIELDS}, sources=[source])
+        if record.value or record.statement:
+            records.append(record)
+    return records
+
+
+def _key(record: FactRecord) -> Tuple[str, ...]:
+    if record.is_statement:
+        return ("statement", _normalize(record.statement))
+    return ("fact", _normalize(record.period), _normalize(record.metric), _normalize(record.scope), _normalize(record.value))
+
+
+def merge_facts(records: List[FactRecord]) -> List[FactRecord]:
+    """合并去重：同一事实只保留一条（同比取第一个非空值），来源按首次出现顺序合并
+
+    结果按 (指标, 范围, 时间) 排序，结论类记录排在最后并保持出现顺序，保证相同输入得到相同输出。
+    """
+    merged: Dict[Tuple[str, ...], FactRecord] = {}
+    for record in records:
+        key = _key(record)
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = FactRecord(**{name: getattr(record, name) for name in _FIELDS}, sources=list(record.sources))
+            continue
+        if not existing.yoy:
+            existing.yoy = record.yoy
+        existing.sources.extend(s for s in record.sources if s not in existing.sources)
+
+    facts = [r for r in merged.values() if not r.is_statement]
+    statements = [r for r in merged.values() if r.is_statement]
+    facts.sort(key=lambda r: (_normalize(r.metric), _normalize(r.scope), _normalize(r.period), _normalize(r.value)))
+    return facts + statements
+
+
+def _cell(text: str) -> str:
+    return (text or "-").replace("|", "\\|").replace("\n", " ")
+
+
+def render_facts(records: List[FactRecord]) -> str:
+    """渲染为总体压缩的输入：数据记录为一张表，结论逐条列出（来源以文件序号标注）"""
+    source_ids: Dict[str, int] = {}
+    for record in records:
+        for source in record.sources:
+            source_ids.setdefault(source, len(source_ids) + 1)
+
+    def refs(record: FactRecord) -> str:
+        return ",".join(str(source_ids[s]) for s in record.sources)
+
+    blocks = ["来源：" + "；".join(f"[{i}] {source}" for source, i in source_ids.items())]
+    facts = [r for r in records if not r.is_statement]
+    if facts:
+        lines = ["| 时间 | 指标 | 范围 | 数值 | 同比 | 说明 | 来源 |", "| --- | --- | --- | --- | --- | --- | --- |"]
+        lines += [
+            f"| {_cell(r.period)} | {_cell(r.metric)} | {_cell(r.scope)} | {_cell(r.value)} | {_cell(r.yoy)} | {_cell(r.statement)} | {refs(r)} |"
+            for r in facts
+        ]
+        blocks.append("\n".join(lines))
+    statements = [r for r in records if r.is_statement]
+    if statements:
+        blocks.append("\n".join(
+            f"- {' '.join(filter(None, (r.period, r.scope)))}{'：' if (r.period or r.scope) else ''}{r.statement} [{refs(r)}]"
+            for r in statements
+        ))
+    return "\n\n".join(blocks)
@@ -0,0 +1,130 @@
+"""过载保护 - 按 LLM 调用积压程度对新请求降级或拒绝
+
+OverloadController 统计进行中（排队 + 执行）的 LLM 调用数与排队等待时间，
+以两者相对阈值的比例中较大者作为负载比例，新请求按比例决定处理方式：
+
+    负载比例 < 1      正常：完整的四阶段流程
+    1 <= 比例 < 2     降级：跳过验证修订，放大逐文档压缩与总体压缩的分块
+    2 <= 比例 < 4     抽取式降级：在上一级基础上，压缩前先按关注点抽取关键句
+    比例 >= 4         拒绝：返回 503 与 Retry-After
+
+排队等待时间取当前等待最久的调用已等待的时长，与最近 window 秒内已开始
+调用的平均等待时长中的较大者。
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+
+class OverloadLevel(IntEnum):
+    """负载等级"""
+    NORMAL = 0
+    REDUCED = 1      # 跳过验证修订、放大分块
+    EXTRACTIVE = 2   # 另加抽取式预压缩
+    SHED = 3         # 拒绝新请求
+
+
+# 各等级对应的负载比例下限
+_LEVEL_RATIOS = (
+    (OverloadLevel.SHED, 4.0),
+    (OverloadLevel.EXTRACTIVE, 2.0),
+    (OverloadLevel.REDUCED, 1.0),
+)
+
+
+class _TrackedCall:
+    def __init__(self, controller: "OverloadController", call_id: int):
+        self.controller = controller
+        self.call_id = call_id
+
+    def started(self) -> None:
+        self.controller.started(self.call_id)
+
+
+class OverloadController:
+    """统计 LLM 调用积压并给出负载等级"""
+
+    def __init__(self, max_inflight: int, queue_wait_ms: float, window_s: float = 30.0):
+        """
+        Args:
+            max_inflight: 进行中调用数阈值（达到即开始降级）
+            queue_wait_ms: 排队等待时间阈值（毫秒，达到即开始降级）
+            window_s: 统计最近排队等待时间的窗口（秒）
+        """
+        self.max_inflight = max(max_inflight, 1)
+        self.queue_wait_ms = max(queue_wait_ms, 1.0)
+        self.window_s = window_s
+        self._inflight = 0
+        self._waiting: Dict[int, float] = {}
+        self._waits: Deque[Tuple[float, float]] = deque()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator["_TrackedCall"]:
+        """记录一次 LLM 调用：进入时开始排队，调用 started() 表示开始执行，退出时结束
+
+        用法：
+            async with controller.track() as call, semaphore:
+                call.started()
+                ...
+        """
+        call = _TrackedCall(self, self.enter())
+        try:
+            yield call
+        finally:
+            self.exit(call.call_id)
+
+    def enter(self) -> int:
+        """一次 LLM 调用开始排队，返回调用编号"""
+        with self._lock:
+            self._next_id += 1
+            self._inflight += 1
+            self._waiting[self._next_id] = time.time()
+            return self._next_id
+
+    def started(self, call_id: int) -> None:
+        """调用结束排队、开始执行"""
+        now = time.time()
+        with self._lock:
+            queued_at = self._waiting.pop(call_id, None)
+            if queued_at is not None:
+                self._waits.append((now, (now - queued_at) * 1000))
+
+    def exit(self, call_id: int) -> None:
+        """调用结束（包括失败）"""
+        with self._lock:
+            self._waiting.pop(call_id, None)
+            self._inflight -= 1
+
+    def pressure(self) -> dict:
+        """当前进行中调用数、排队等待时间（毫秒）与负载比例"""
+        now = time.time()
+        with self._lock:
+            while self._waits and self._waits[0][0] < now - self.window_s:
+                self._waits.popleft()
+            recent = sum(wait for _, wait in self._waits) / len(self._waits) if self._waits else 0.0
+            oldest = (now - min(self._waiting.values())) * 1000 if self._waiting else 0.0
+            inflight = self._inflight
+        queue_wait_ms = max(recent, oldest)
+        return {
+            "inflight": inflight,
+            "queue_wait_ms": queue_wait_ms,
+            "ratio": max(inflight / self.max_inflight, queue_wait_ms / self.queue_wait_ms),
+        }
+
+    def level(self) -> OverloadLevel:
+        """当前负载等级"""
+        ratio = self.pressure()["ratio"]
+        for level, threshold in _LEVEL_RATIOS:
+            if ratio >= threshold:
+                return level
+        return OverloadLevel.NORMAL
+
+    def retry_after(self, minimum: int) -> int:
+        """建议客户端重试的等待秒数：不少于 minimum，且不少于当前排队等待时间"""
+        return max(minimum, math.ceil(self.pressure()["queue_wait_ms"] / 1000))
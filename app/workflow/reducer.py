@@ -0,0 +1,118 @@
+"""流式归并 - 文档摘要陆续完成时提前开始总体压缩"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+from app.models.schemas import DocumentSummary
+
+
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+# 压缩函数：(文本, 字数预算, 段落预算, 部分序号或 None) -> 压缩结果
+CompressFn = Callable[[str, int, int, Optional[int]], Awaitable[str]]
+
+
+class StreamingReducer:
+    """流水线式总体压缩
+
+    文档摘要每完成一份就通过 add() 加入缓冲区，缓冲区一旦填满分块预算，
+    立即提交该组的总体压缩，不再等待最慢的文档；全部文档完成后由 finish()
+    处理剩余摘要并按提交顺序合并各部分结果。
+
+    每组的字数/段落预算按其长度占“预计摘要总长度”的比例分配，预计总长度
+    由已完成摘要的平均长度外推尚未完成的文档。
+    """
+
+    def __init__(
+        self,
+        compress_fn: CompressFn,
+        split_fn: Callable[[str, int], List[str]],
+        max_chars: int,
+        expected_docs: int,
+        max_words: int,
+        max_paragraphs: int,
+        on_first_part: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.compress_fn = compress_fn
+        self.split_fn = split_fn
+        self.max_chars = max_chars
+        self.expected_docs = expected_docs
+        self.max_words = max_words
+        self.max_paragraphs = max_paragraphs
+        self.on_first_part = on_first_part
+
+        self._buffer: List[str] = []
+        self._buffer_len = 0
+        self._received = 0
+        self._received_len = 0
+        self._tasks: List[asyncio.Task] = []
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    def _estimated_total(self) -> int:
+        """预计全部文档摘要的总长度"""
+        if not self._received:
+            return self.max_chars
+        avg = self._received_len / self._received
+        pending = max(self.expected_docs - self._received, 0)
+        return int(self._received_len + avg * pending)
+
+    async def _launch(self, text: str, index: int) -> None:
+        ratio = min(len(text) / max(self._estimated_total(), 1), 1.0)
+        words = max(int(self.max_words * ratio), 1)
+        paragraphs = max(int(self.max_paragraphs * ratio), 1)
+        if self.first_start is None:
+            self.first_start = time.time()
+            if self.on_first_part:
+                await self.on_first_part()
+
+        async def run() -> str:
+            result = await self.compress_fn(text, words, paragraphs, index)
+            self.last_end = time.time()
+            return result
+
+        self._tasks.append(asyncio.create_task(run()))
+
+    async def add(self, summary: DocumentSummary) -> None:
+        """加入一份已完成的文档摘要，缓冲区满时提交一组总体压缩"""
+        if not summary.summary_md:
+            return
+        self._received += 1
+        self._received_len += len(summary.summary_md) + len(SUMMARY_SEPARATOR)
+        self._buffer.append(summary.summary_md)
+        self._buffer_len += len(summary.summary_md) + len(SUMMARY_SEPARATOR)
+
+        if self._buffer_len < self.max_chars:
+            return
+        text = SUMMARY_SEPARATOR.join(self._buffer)
+        self._buffer, self._buffer_len = [], 0
+        for part in self.split_fn(text, self.max_chars):
+            await self._launch(part, len(self._tasks))
+
+    async def finish(self) -> str:
+        """处理剩余摘要，等待所有部分完成并合并"""
+        try:
+            text = SUMMARY_SEPARATOR.join(self._buffer)
+            self._buffer, self._buffer_len = [], 0
+            parts = self.split_fn(text, self.max_chars) if text else []
+
+            if not self._tasks and len(parts) <= 1:
+                # 全部摘要可以一次完成：使用完整预算，与非流式路径一致
+                self.first_start = time.time()
+                if self.on_first_part:
+                    await self.on_first_part()
+                result = await self.compress_fn(parts[0] if parts else "", self.max_words, self.max_paragraphs, None)
+                self.last_end = time.time()
+                return result
+
+            for part in parts:
+                await self._launch(part, len(self._tasks))
+            compressed_parts = await asyncio.gather(*self._tasks)
+            return SUMMARY_SEPARATOR.join(compressed_parts)
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """取消尚未完成的总体压缩"""
+        for task in self._tasks:
+            task.cancel()
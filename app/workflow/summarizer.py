@@ -1,14 +1,72 @@
 """核心工作流 - 报告摘要生成"""
+import os
+import math
 import time
+import threading
 import uuid
+import asyncio
 import re
-from typing import List, Optional, AsyncGenerator
-import agentscope
-from agentscope.model import OpenAIChatModel
-from app.config import Config, ReportType
+import logging
+import contextlib
+from contextvars import ContextVar
+from typing import Dict, List, Optional, AsyncGenerator
+from app.config import Config, ReportType, LLM_STAGES, REPORT_TYPE_FOCUS_TERMS
 from app.models.schemas import DocumentInfo, DocumentSummary, MetaInfo
 from app.prompts.templates import PromptTemplates
 from app.utils.document_parser import DocumentParser
+from app.workflow.reducer import StreamingReducer
+from app.workflow.chunk_planner import CallSample, ChunkPlanner, LatencyStats
+from app.workflow.context import RunContext
+from app.workflow.overload import OverloadController, OverloadLevel
+from app.workflow.budget_allocator import DocumentBudget, allocate, information_density
+from app.workflow.fact_records import merge_facts, parse_facts, render_facts
+from app.workflow.edit_script import EditScriptError, apply_edits, number_paragraphs, parse_edits, split_paragraphs
+from app.utils.section_store import SectionChunker, SectionStore
+from app.utils.table_compactor import compact_markdown_tables
+from app.utils.text_normalizer import TextNormalizer
+from app.utils.llm_recorder import LLMRecorder, LLMReplayer
+from app.utils.tracing import tracer
+from app.utils.text_spill import MemoryBudget, SpilledText
+from app.utils.section_retrieval import build_query, extract_sentences, select_sections
+from app.utils.checkpoint_store import CheckpointStore
+from app.utils.document_store import DocumentStore
+from app.utils.logging_setup import SAMPLED, trace_id_var, route_logger_to_queue
+
+logger = logging.getLogger(__name__)
+
+# 逐期结构基本相同的报告类型，启用章节复用
+SECTION_REUSE_REPORT_TYPES = (ReportType.REGULAR, ReportType.ELECTRICITY_DEMAND)
+
+# 输出超出预算后可以结束生成的结构边界：段落结束或句号
+_STRUCTURAL_BOUNDARY = re.compile(r"\n\n|。")
+# 超出字数预算后留给模型写到下一个边界的 token 余量
+_BOUNDARY_SLACK_TOKENS = 256
+
+
+def _boundary_cut(text: str, start: int) -> Optional[int]:
+    """text 中 start 之后第一个结构边界的截断位置（段落边界不含空行，句号保留）"""
+    match = _STRUCTURAL_BOUNDARY.search(text, max(start, 0))
+    if match is None:
+        return None
+    return match.start() if match.group() == "\n\n" else match.end()
+
+
+def _chunk_text(chunk) -> Optional[str]:
+    """流式响应 chunk 中的完整文本（各 text 块拼接）；没有 content 时返回 None"""
+    if not hasattr(chunk, "content"):
+        return None
+    return "".join(item["text"] for item in chunk.content if isinstance(item, dict) and "text" in item)
+
+
+def _stream_delta(prev_text: str, current_text: str) -> Optional[str]:
+    """累计文本相对上一次的增量；当前文本不是上一次的延续时返回 None"""
+    if current_text.startswith(prev_text):
+        return current_text[len(prev_text):]
+    return None
+
+
+# 当前请求记录各阶段实际调用模型的字典（asyncio 任务与 to_thread 会继承，指向同一个 RunContext.stage_models）
+_stage_models_var: ContextVar[Optional[Dict[str, str]]] = ContextVar("stage_models", default=None)
 
 
 class ReportSummarizer:
@@ -16,23 +74,96 @@ class ReportSummarizer:
     
     def __init__(self):
         self.config = Config()
-        self.parser = DocumentParser()
         self.prompts = PromptTemplates()
-        self._init_llm()
+        # 重量级组件（MarkItDown、OpenAI 客户端）延迟到首次使用时创建
+        self._parser: Optional[DocumentParser] = None
+        self._llms: Dict[tuple, object] = {}
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None  # 仅在设置了 LLM_MAX_CONCURRENCY 时使用
+        self.section_store = SectionStore(
+            self.config.SECTION_STORE_DIR, self.config.SECTION_STORE_MAX_ENTRIES, self.config.SECTION_STORE_MAX_SERIES
+        )
+        self.checkpoints = CheckpointStore(self.config.CHECKPOINT_DIR, self.config.CHECKPOINT_MAX_ENTRIES)
+        self._documents: Optional[DocumentStore] = None
+        self.latency_stats = LatencyStats()
+        self.overload = OverloadController(
+            self.config.OVERLOAD_MAX_INFLIGHT or self.config.pipeline_concurrency() * 2,
+            self.config.OVERLOAD_QUEUE_WAIT_MS,
+        )
+        self.planner = ChunkPlanner(
+            self.latency_stats,
+            concurrency=self.config.pipeline_concurrency(),
+            min_chars=self.config.PLANNER_MIN_CHARS,
+            max_chars=self.config.PLANNER_MAX_CHARS,
+            export_path=self.config.PLANNER_EXPORT_PATH,
+        )
+        self.recorder: Optional[LLMRecorder] = None
+        self.replayer: Optional[LLMReplayer] = None
+        if self.config.LLM_MODE == "record":
+            self.recorder = LLMRecorder(self.config.LLM_RECORD_DIR)
+        elif self.config.LLM_MODE == "replay":
+            self.replayer = LLMReplayer(
+                self.config.LLM_RECORD_DIR,
+                time_scale=self.config.LLM_REPLAY_TIME_SCALE,
+                trace_id=self.config.LLM_REPLAY_TRACE_ID,
+            )
+    
+    @property
+    def parser(self) -> DocumentParser:
+        """文档解析器（首次访问时创建）"""
+        if self._parser is None:
+            self._parser = DocumentParser(fast_parsers=self.config.FAST_PARSERS)
+        return self._parser
+    
+    @property
+    def documents(self) -> DocumentStore:
+        """文档库（首次访问时加载索引）"""
+        if self._documents is None:
+            self._documents = DocumentStore(
+                self.config.DOCUMENT_STORE_DIR, self.config.DOCUMENT_STORE_QUOTA_MB * 1024 * 1024
+            )
+        return self._documents
+    
+    def llm_for(self, stage_kind: str):
+        """某阶段使用的 LLM 模型（首次访问时创建，配置相同的阶段共用同一客户端）"""
+        settings = self.config.stage_llm_settings(stage_kind)
+        if self.replayer is not None:
+            settings = {"replay": True}
+        key = tuple(sorted(settings.items()))
+        if key not in self._llms:
+            self._llms[key] = self._init_llm(settings)
+        return self._llms[key]
+    
+    @property
+    def llm_semaphore(self):
+        """限制进程内同时进行的 LLM 调用数量（LLM_MAX_CONCURRENCY 为 0 时不限制）"""
+        if self.config.LLM_MAX_CONCURRENCY <= 0:
+            return contextlib.nullcontext()
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.config.LLM_MAX_CONCURRENCY)
+        return self._llm_semaphore
     
-    def _init_llm(self):
-        """初始化 LLM 模型"""
-        self.llm = OpenAIChatModel(
-            model_name=self.config.LLM_MODEL,
-            api_key=self.config.LLM_API_KEY,
+    def _init_llm(self, settings: dict):
+        """初始化 LLM 模型
+        
+        Args:
+            settings: 阶段 LLM 配置（见 Config.stage_llm_settings）
+        """
+        if self.replayer is not None:
+            return self.replayer.model()
+        
+        from agentscope.model import OpenAIChatModel
+        
+        return OpenAIChatModel(
+            model_name=settings["model"],
+            api_key=settings["api_key"],
             client_kwargs={
-                "base_url": self.config.LLM_BASE_URL,
+                "base_url": settings["base_url"],
                 "max_retries": 0,  # 禁用重试
                 "timeout": 120.0,  # 设置超时时间
             },
             generate_kwargs={
-                "temperature": self.config.LLM_TEMPERATURE,
-                "max_tokens": 8196,  
+                "temperature": settings["temperature"],
+                "max_tokens": settings["max_tokens"],
             },
         )
     
@@ -121,6 +252,14 @@ class ReportSummarizer:
                 non_title_paragraphs.append(p)
         return len(non_title_paragraphs)
     
+    @staticmethod
+    def _stage_kind(stage: str) -> str:
+        """由具体阶段名（如 doc_compress_<doc_id>_part0）得到阶段类别"""
+        for kind in ("doc_compress", "global_compress", "validate"):
+            if stage.startswith(kind):
+                return kind
+        return stage
+    
     def _get_report_type_enum(self, report_type: str) -> ReportType:
         """获取报告类型枚举"""
         for rt in ReportType:
@@ -128,7 +267,24 @@ class ReportSummarizer:
                 return rt
         raise ValueError(f"未知的报告类型: {report_type}")
     
-    async def _call_llm(self, prompt: str, trace_id: str, stage: str, stream_callback: Optional[callable] = None) -> str:
+    def _output_budget(self, stage_kind: str, target_chars: Optional[int]) -> tuple:
+        """由目标字数计算 (字数预算, max_tokens)；未启用或无目标时为 (None, 阶段默认 max_tokens)"""
+        stage_max_tokens = self.config.stage_llm_settings(stage_kind)["max_tokens"]
+        if not self.config.OUTPUT_BUDGET or not target_chars:
+            return None, stage_max_tokens
+        char_budget = max(int(target_chars * self.config.OUTPUT_BUDGET_MARGIN), 1)
+        max_tokens = math.ceil(char_budget * self.config.OUTPUT_TOKENS_PER_CHAR) + _BOUNDARY_SLACK_TOKENS
+        return char_budget, min(max_tokens, stage_max_tokens)
+    
+    async def _call_llm(
+        self,
+        prompt: str,
+        trace_id: str,
+        stage: str,
+        stream_callback: Optional[callable] = None,
+        target_chars: Optional[int] = None,
+        warnings: Optional[List[str]] = None,
+    ) -> str:
         """调用 LLM 并记录日志
         
         Args:
@@ -136,223 +292,1139 @@ class ReportSummarizer:
             trace_id: 追踪ID
             stage: 阶段名称
             stream_callback: 流式回调函数，接收增量内容（只在验证阶段使用）
+            target_chars: 期望输出字数，用于设置 max_tokens 并在超出预算后于结构边界提前结束
+            warnings: 提前结束时追加提示的警告列表
             
         Returns:
             str: 完整响应文本
         """
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        logger.info(f"[{trace_id}] 开始调用 LLM - 阶段: {stage}, prompt 长度: {len(prompt)}")
+        logger.info(f"开始调用 LLM - 阶段: {stage}, prompt 长度: {len(prompt)}", extra=SAMPLED)
+        char_budget, max_tokens = self._output_budget(self._stage_kind(stage), target_chars)
+        truncated = False
+        queued_at = time.time()
         
-        response = await self.llm(
-            messages=[{"role": "user", "content": prompt}],
-            extra_body={
-                "repetition_penalty": 1.05,
-                "chat_template_kwargs": {"enable_thinking": False}
-            },
-            stream=True  # 启用流式输出
-        )
-        
-        # 流式处理：提取增量内容
-        full_text = ""
-        chunk_count = 0
-        prev_text = ""
-        
-        async for chunk in response:
-            chunk_count += 1
-            if hasattr(chunk, 'content'):
-                # 获取当前chunk的完整文本
-                current_text = ""
-                for item in chunk.content:
-                    if isinstance(item, dict) and 'text' in item:
-                        current_text += item['text']
+        async with self.overload.track() as overload_call, self.llm_semaphore:
+            overload_call.started()
+            call_start = time.time()
+            first_delta_at = None
+            response = await self.llm_for(self._stage_kind(stage))(
+                messages=[{"role": "user", "content": prompt}],
+                extra_body={
+                    "repetition_penalty": 1.05,
+                    "chat_template_kwargs": {"enable_thinking": False}
+                },
+                max_tokens=max_tokens,
+                stream=True  # 启用流式输出
+            )
+            if self.recorder is not None:
+                response = self.recorder.wrap(trace_id, stage, prompt, response)
+            
+            # 流式处理：提取增量内容
+            full_text = ""
+            chunk_count = 0
+            prev_text = ""
+            
+            async for chunk in response:
+                chunk_count += 1
+                current_text = _chunk_text(chunk)
+                if current_text is None:
+                    continue
+                
+                # 超出字数预算后，在第一个结构边界处截断并结束生成
+                cut = None
+                if char_budget is not None and len(current_text) > char_budget:
+                    cut = _boundary_cut(current_text, max(char_budget, len(prev_text) - 1))
+                    if cut is not None:
+                        current_text = current_text[:cut]
                 
                 # 提取增量内容
-                if current_text.startswith(prev_text):
-                    delta = current_text[len(prev_text):]
-                    if delta:  # 如果有增量内容
-                        full_text = current_text
-                        # 只在验证阶段调用流式回调
-                        if stream_callback and stage == "validate":
-                            await stream_callback(delta)
-                        prev_text = current_text
-                else:
+                delta = _stream_delta(prev_text, current_text)
+                if delta is None:
                     # 如果不是增量，直接使用当前文本
                     full_text = current_text
                     prev_text = current_text
+                elif delta:  # 如果有增量内容
+                    if first_delta_at is None:
+                        first_delta_at = time.time()
+                    full_text = current_text
+                    # 只在验证阶段调用流式回调
+                    if stream_callback and stage == "validate":
+                        await stream_callback(delta)
+                    prev_text = current_text
+                
+                if cut is not None:
+                    truncated = True
+                    break
+            
+            if truncated and hasattr(response, "aclose"):
+                # 关闭流，服务端随之停止生成
+                await response.aclose()
+        
+        call_end = time.time()
+        stage_models = _stage_models_var.get()
+        if stage_models is not None:
+            kind = self._stage_kind(stage)
+            stage_models[kind] = "replay" if self.replayer is not None else self.config.stage_llm_settings(kind)["model"]
+        if first_delta_at is not None:
+            self.latency_stats.record(self._stage_kind(stage), CallSample(
+                prompt_chars=len(prompt),
+                output_chars=len(full_text),
+                ttft_ms=(first_delta_at - call_start) * 1000,
+                generation_ms=(call_end - first_delta_at) * 1000,
+            ))
         
-        logger.info(f"[{trace_id}] LLM 调用完成 - 阶段: {stage}, chunk 数量: {chunk_count}, 响应长度: {len(full_text)}")
+        llm_span = tracer.add_span(
+            "llm_call", queued_at, call_end,
+            stage=stage,
+            prompt_chars=len(prompt),
+            output_chars=len(full_text),
+            max_tokens=max_tokens,
+            truncated=truncated,
+        )
+        if llm_span is not None:
+            tracer.add_span("queue_wait", queued_at, call_start, parent=llm_span)
+            if first_delta_at is not None:
+                tracer.add_span("ttft", call_start, first_delta_at, parent=llm_span)
+                tracer.add_span("generation", first_delta_at, call_end, parent=llm_span)
+        
+        if truncated and warnings is not None:
+            warnings.append(f"阶段 {stage} 输出超出预算 ({char_budget} 字)，已在段落/句子边界提前结束")
+        
+        logger.info(
+            f"LLM 调用完成 - 阶段: {stage}, chunk 数量: {chunk_count}, 响应长度: {len(full_text)}",
+            extra={"fields": {
+                "stage": stage,
+                "chunks": chunk_count,
+                "response_chars": len(full_text),
+                "max_tokens": max_tokens,
+                "truncated": truncated,
+            }},
+        )
         return full_text
     
-    async def summarize(
+    def preload(self) -> None:
+        """提前创建解析器与 LLM 客户端（供启动阶段在后台线程调用）"""
+        _ = self.parser.markitdown
+        for stage_kind in LLM_STAGES:
+            _ = self.llm_for(stage_kind)
+    
+    async def warm_up(self) -> None:
+        """预热：向各阶段用到的 LLM 服务发送一个极短的 prompt，提前建立连接"""
+        llms = {id(llm): llm for llm in (self.llm_for(kind) for kind in LLM_STAGES)}
+        for llm in llms.values():
+            response = await llm(
+                messages=[{"role": "user", "content": "你好"}],
+                extra_body={"chat_template_kwargs": {"enable_thinking": False}},
+                max_tokens=1,
+                stream=True,
+            )
+            async for _ in response:
+                pass
+    
+    def _build_doc_compress_prompt(self, rt_enum: ReportType, text_md: str, target_chars: Optional[int] = None) -> str:
+        """构建逐文档压缩 prompt（target_chars 为分配的目标摘要字数，为空时不限定长度）"""
+        if self.config.FACT_EXTRACTION:
+            # 事实抽取模式：输出结构化记录，长度由记录条数决定
+            return self.prompts.FACT_EXTRACT_TEMPLATE.format(
+                focus="、".join(REPORT_TYPE_FOCUS_TERMS[rt_enum]), text_md=text_md
+            )
+        target_block = f"\n4. 摘要控制在约 {target_chars} 字以内，次要内容只保留结论" if target_chars else ""
+        return self.prompts.DOC_COMPRESS_TEMPLATES[rt_enum].format(text_md=text_md, target_block=target_block)
+    
+    async def _compress_doc_part(
         self,
-        report_type: str,
-        file_paths: List[tuple],
-        max_words: int,
-        max_paragraphs: int,
-        requirements: str,
-        progress_callback: Optional[callable] = None,
-        stream_callback: Optional[callable] = None,
-    ) -> tuple[str, MetaInfo]:
-        """生成报告摘要
+        ctx: RunContext,
+        text: str,
+        stage: str,
+        limiter: asyncio.Semaphore,
+        series: str = "",
+        target_chars: Optional[int] = None,
+    ) -> str:
+        """压缩文档的一个分块；属于周期性报告系列时，未变化的分块直接复用上一期的摘要
+        
+        target_chars 为该分块分配到的目标摘要字数，未分配时以分块长度作为输出预算。
+        """
+        prompt = self._build_doc_compress_prompt(ctx.report_type, text, target_chars)
+        fingerprint = ""
+        if series:
+            # 目标字数随本次请求的总输入量变化，指纹只取不含目标字数的 prompt，
+            # 否则启用摘要长度分配时同一分块的指纹每期都不同，永远无法复用
+            stable_prompt = self._build_doc_compress_prompt(ctx.report_type, text) if target_chars else prompt
+            fingerprint = SectionStore.fingerprint(self.config.DOC_COMPRESS_LLM_MODEL, stable_prompt)
+            ctx.sections_total += 1
+            await asyncio.to_thread(self.section_store.preload, series)
+            cached = self.section_store.get(series, fingerprint)
+            if cached is not None:
+                ctx.sections_reused += 1
+                tracer.add_span("section_reused", time.time(), time.time(), stage=stage, chars=len(text))
+                return cached
+        
+        wait_start = time.time()
+        async with limiter:
+            tracer.add_span("chunk_limiter_wait", wait_start, time.time(), stage=stage)
+            # 压缩结果不应长于原文，未分配目标字数时以分块长度作为输出预算；
+            # JSON 记录的字段名开销可能使输出长于原文，事实抽取不限输出预算
+            summary = await self._call_llm(
+                prompt, ctx.trace_id, stage, ctx.stream_callback,
+                target_chars=None if self.config.FACT_EXTRACTION else target_chars or len(text),
+                warnings=ctx.warnings,
+            )
+        if fingerprint:
+            self.section_store.put(series, fingerprint, summary)
+        return summary
+    
+    def _preprocess_text(self, ctx: RunContext, filename: str, text: str, whole: bool = True) -> str:
+        """压缩前的本地预处理：版面噪声清理、表格紧凑化（可选按报告关注点筛选行列）、过载时的抽取式预压缩，并累计缩减统计
+        
+        whole 为 False 时 text 是流式解析产出的片段（PDF 为一页，其他格式为一节）。
+        """
+        if not text:
+            return text
+        if self.config.TEXT_NORMALIZE:
+            normalizer = ctx.normalizers.setdefault(filename, TextNormalizer(self.config.NORMALIZE_MIN_REPEATS))
+            if not whole and (filename.lower().endswith(".pdf") or "\f" in text):
+                normalized = normalizer.normalize_page(text)
+            else:
+                normalized = normalizer.normalize(text)
+            self._record_reduction(ctx, filename, "normalization", text, normalized)
+            ctx.document_stats[filename]["normalization"].update(normalizer.report())
+            text = normalized
+        if self.config.TABLE_COMPACT:
+            focus_terms = REPORT_TYPE_FOCUS_TERMS[ctx.report_type] if self.config.TABLE_FOCUS_FILTER else ()
+            compacted = compact_markdown_tables(text, focus_terms)
+            self._record_reduction(ctx, filename, "table_compaction", text, compacted)
+            text = compacted
+        if ctx.extractive_ratio:
+            query = build_query(ctx.requirements, REPORT_TYPE_FOCUS_TERMS[ctx.report_type])
+            extracted = extract_sentences(text, query, ctx.extractive_ratio)
+            self._record_reduction(ctx, filename, "extractive", text, extracted)
+            text = extracted
+        return text
+    
+    @staticmethod
+    def _record_reduction(ctx: RunContext, filename: str, key: str, before: str, after: str) -> None:
+        """累计一项预处理的字数缩减统计"""
+        stats = ctx.document_stats.setdefault(filename, {}).setdefault(key, {"before": 0, "after": 0})
+        stats["before"] += len(before)
+        stats["after"] += len(after)
+        stats["reduction_ratio"] = 1 - stats["after"] / stats["before"] if stats["before"] else 0.0
+    
+    def _retrieve_sections(self, ctx: RunContext, documents: List[DocumentInfo]) -> List[DocumentInfo]:
+        """按特定要求检索章节：对全部文档的章节按相关度排序，在预算内只保留靠前的章节
         
-        Args:
-            report_type: 报告类型
-            file_paths: (file_path, filename) 元组列表
-            max_words: 最大字数
-            max_paragraphs: 最大段落数
-            requirements: 特定要求
-            progress_callback: 进度回调函数
-            
         Returns:
-            tuple: (report_markdown, meta_info)
+            List[DocumentInfo]: 仍有章节入选的文档（text_md 已替换为入选章节）
         """
-        trace_id = str(uuid.uuid4())
-        stage_durations = {}
-        warnings = []
-        start_time = time.time()
+        doc_sections = [DocumentParser.split_sections(doc.text_md or "") for doc in documents]
+        flat = [(d, section) for d, sections in enumerate(doc_sections) for section in sections]
+        if not flat:
+            return documents
         
-        # 获取报告类型枚举
-        rt_enum = self._get_report_type_enum(report_type)
+        query = build_query(ctx.requirements, REPORT_TYPE_FOCUS_TERMS[ctx.report_type])
+        selected = set(select_sections([section for _, section in flat], query, self.config.RETRIEVAL_BUDGET_CHARS))
+        
+        kept_sections: List[List[str]] = [[] for _ in documents]
+        for i, (d, section) in enumerate(flat):
+            if i in selected:
+                kept_sections[d].append(section)
+        
+        kept_documents = []
+        for doc, sections, kept in zip(documents, doc_sections, kept_sections):
+            text_md = "\n\n".join(kept)
+            ctx.document_stats.setdefault(doc.filename, {})["retrieval"] = {
+                "sections_total": len(sections),
+                "sections_selected": len(kept),
+                "chars_before": len(doc.text_md or ""),
+                "chars_after": len(text_md),
+            }
+            if not kept:
+                logger.info(f"文档 {doc.filename} 没有与特定要求相关的章节，跳过压缩")
+                continue
+            doc.text_md = text_md
+            kept_documents.append(doc)
+        
+        logger.info(f"章节检索: 共 {len(flat)} 节, 选中 {len(selected)} 节")
+        return kept_documents
+    
+    def _parse_document(self, ctx: RunContext, file_path: str, filename: str) -> DocumentInfo:
+        """解析文件；来自文档库的文件优先使用已保存的解析结果，首次解析后保存"""
+        library_id = ctx.library.get(file_path)
+        if library_id:
+            text_md = self.documents.get_parsed(library_id)
+            self._library_stats(ctx, filename, library_id)["parsed_cached"] = text_md is not None
+            if text_md is not None:
+                return DocumentInfo(doc_id=str(uuid.uuid4()), filename=filename, text_md=text_md)
+        doc = self.parser.parse_file(file_path, filename)
+        if library_id and doc.text_md and not doc.warnings:
+            self.documents.put_parsed(library_id, doc.text_md)
+        return doc
+    
+    def _iter_sections(self, ctx: RunContext, file_path: str, buffered: bool = True):
+        """流式解析文件；来自文档库且已有解析结果时直接按标题切分
+        
+        buffered 为 False 时快速解析器边解析边产出（内存受限模式），见 DocumentParser._iter_blocks
+        """
+        library_id = ctx.library.get(file_path)
+        text_md = self.documents.get_parsed(library_id) if library_id else None
+        if text_md is not None:
+            return iter(DocumentParser.split_sections(text_md))
+        return self.parser.iter_sections(file_path, buffered=buffered)
+    
+    @staticmethod
+    def _library_stats(ctx: RunContext, filename: str, library_id: str) -> dict:
+        return ctx.document_stats.setdefault(filename, {}).setdefault("library", {"doc_id": library_id})
+    
+    def _library_summary_key(self, ctx: RunContext) -> Optional[str]:
+        """文档库中逐文档摘要的键
+
+        按特定要求检索章节或抽取式降级时文本不完整，过载放大分块时摘要粒度与正常请求不同，
+        这些情况下不读写摘要。
+        """
+        if (self.config.RETRIEVAL and ctx.requirements.strip()) or ctx.extractive_ratio or ctx.chunk_scale != 1:
+            return None
+        return DocumentStore.summary_key(
+            ctx.report_type.name,
+            self.config.DOC_COMPRESS_LLM_MODEL,
+            str(self.config.TEXT_NORMALIZE),
+            str(self.config.TABLE_COMPACT),
+            str(self.config.TABLE_FOCUS_FILTER),
+            str(self.config.FACT_EXTRACTION),
+            str(self.config.DOC_CHUNK_MAX_CHARS),
+            str(self.config.ADAPTIVE_CHUNKING),
+        )
+    
+    def _allocate_doc_budgets(self, ctx: RunContext, documents: List[DocumentInfo]) -> Dict[str, int]:
+        """按文档字数与信息密度分配目标摘要字数，使合并后的摘要尽量一次完成总体压缩
+        
+        Returns:
+            Dict[str, int]: doc_id → 目标摘要字数
+        """
+        documents = [doc for doc in documents if doc.text_md and len(doc.text_md) >= 10]
+        if not documents:
+            return {}
+        focus_terms = REPORT_TYPE_FOCUS_TERMS[ctx.report_type]
+        budgets = [
+            DocumentBudget(chars=len(doc.text_md), density=information_density(doc.text_md, focus_terms))
+            for doc in documents
+        ]
+        # 总体压缩一次能处理的字数，扣除摘要间的分隔符；模型可能超出目标，按输出预算余量预留
+        capacity = int(self.config.GLOBAL_CHUNK_MAX_CHARS * ctx.chunk_scale) - len("\n\n---\n\n") * (len(documents) - 1)
+        total_chars = capacity / max(self.config.OUTPUT_BUDGET_MARGIN, 1.0)
+        allocate(budgets, int(total_chars), self.config.BUDGET_MIN_DOC_CHARS, self.config.BUDGET_MAX_RATIO)
         
+        for doc, budget in zip(documents, budgets):
+            ctx.document_stats.setdefault(doc.filename, {})["budget"] = {
+                "chars": budget.chars,
+                "density": round(budget.density, 3),
+                "target_chars": budget.target_chars,
+            }
+        logger.info(f"摘要长度分配: 共 {int(total_chars)} 字, {[b.target_chars for b in budgets]}")
+        return {doc.doc_id: budget.target_chars for doc, budget in zip(documents, budgets)}
+    
+    def _doc_series(self, ctx: RunContext, filename: str) -> str:
+        """文档所属的报告系列（未启用章节复用时为空）"""
+        if not ctx.section_reuse:
+            return ""
+        return SectionStore.series_key(ctx.report_type.name, ctx.series_id, filename)
+    
+    async def _parse_then_compress(
+        self,
+        ctx: RunContext,
+        file_paths: List[tuple],
+        on_summary: Optional[callable] = None,
+    ) -> List[DocumentSummary]:
+        """先解析全部文件，再逐文档压缩（阶段 1、2 顺序执行）"""
         # 阶段 1: 解析文件
         stage_start = time.time()
-        if progress_callback:
-            await progress_callback("parse", "start", "开始解析文件")
+        if ctx.progress_callback:
+            await ctx.progress_callback("parse", "start", "开始解析文件")
         
-        documents = self.parser.parse_files(file_paths)
-        used_files = [fn for _, fn in file_paths]
+        documents = []
+        library_ids: Dict[str, str] = {}  # doc_id → 文档库 ID
+        for file_path, filename in file_paths:
+            with tracer.span("parse_file", filename=filename) as span:
+                doc = self._parse_document(ctx, file_path, filename)
+                if file_path in ctx.library:
+                    library_ids[doc.doc_id] = ctx.library[file_path]
+                doc.text_md = self._preprocess_text(ctx, doc.filename, doc.text_md)
+                if span:
+                    span.set(chars=len(doc.text_md or ""))
+            documents.append(doc)
+        
+        if ctx.progress_callback:
+            await ctx.progress_callback("parse", "end", f"解析完成，共 {len(documents)} 份文件")
         
-        if progress_callback:
-            await progress_callback("parse", "end", f"解析完成，共 {len(documents)} 份文件")
+        ctx.stage_durations["parse"] = (time.time() - stage_start) * 1000
         
-        stage_durations["parse"] = (time.time() - stage_start) * 1000
+        # 填写了特定要求时，只压缩与之相关的章节
+        if self.config.RETRIEVAL and ctx.requirements.strip():
+            retrieve_start = time.time()
+            with tracer.span("retrieve_sections"):
+                documents = self._retrieve_sections(ctx, documents)
+            ctx.stage_durations["retrieve"] = (time.time() - retrieve_start) * 1000
         
         # 阶段 2: 逐文档压缩
         stage_start = time.time()
-        if progress_callback:
-            await progress_callback("doc_compress", "start", "开始逐文档压缩")
+        if ctx.progress_callback:
+            await ctx.progress_callback("doc_compress", "start", "开始逐文档压缩")
         
-        import logging
-        logger = logging.getLogger(__name__)
-        summaries = []
-        for i, doc in enumerate(documents):
-            if progress_callback:
-                await progress_callback("progress", "", f"处理文档 {i+1}/{len(documents)}: {doc.filename}")
+        # 分块大小与并行度：默认固定分块、逐块顺序压缩；自适应模式由规划器按实测延迟决定
+        max_chars = self.config.DOC_CHUNK_MAX_CHARS
+        parallelism = 1
+        if self.config.ADAPTIVE_CHUNKING:
+            plan = self.planner.plan("doc_compress", sum(len(doc.text_md or "") for doc in documents), ctx.trace_id)
+            max_chars, parallelism = plan.max_chars, plan.parallelism
+            logger.info(f"分块规划: 分块 {plan.max_chars} 字, 共 {plan.chunks} 块, 并行度 {plan.parallelism}, 预计 {plan.predicted_ms:.0f} ms")
+        max_chars = int(max_chars * ctx.chunk_scale)
+        limiter = asyncio.Semaphore(parallelism)
+        summary_key = self._library_summary_key(ctx) if library_ids else None
+        # 事实抽取模式的输出长度由记录条数决定，不分配目标字数
+        allocate_budgets = self.config.BUDGET_ALLOCATION and not self.config.FACT_EXTRACTION
+        targets = self._allocate_doc_budgets(ctx, documents) if allocate_budgets else {}
+        
+        async def compress_doc(i: int, doc: DocumentInfo) -> Optional[DocumentSummary]:
+            if ctx.progress_callback:
+                await ctx.progress_callback("progress", "", f"处理文档 {i+1}/{len(documents)}: {doc.filename}")
             
             logger.info(f"文档 {i+1}/{len(documents)}: {doc.filename}, 原始长度: {len(doc.text_md)}")
             
             # 检查文档是否解析成功
             if not doc.text_md or len(doc.text_md) < 10:
                 logger.warning(f"文档 {doc.filename} 解析失败或内容过短，跳过处理")
-                warnings.append(f"文档 {doc.filename} 解析失败或内容过短")
-                continue
+                ctx.warnings.append(f"文档 {doc.filename} 解析失败或内容过短")
+                return None
+            
+            # 文档库中已有同一报告类型（及同一目标字数）的摘要时直接使用
+            target = targets.get(doc.doc_id)
+            library_id = library_ids.get(doc.doc_id) if summary_key else None
+            doc_summary_key = DocumentStore.summary_key(summary_key, str(target)) if library_id and target else summary_key
+            if library_id:
+                cached = self.documents.get_summary(library_id, doc_summary_key)
+                self._library_stats(ctx, doc.filename, library_id)["summary_cached"] = cached is not None
+                if cached is not None:
+                    summary = DocumentSummary(doc_id=doc.doc_id, summary_md=cached, filename=doc.filename)
+                    if on_summary:
+                        await on_summary(summary)
+                    return summary
             
-            # 根据标题拆分文档内容
-            text_parts = self._split_text_by_headers(doc.text_md)
-            logger.info(f"文档 {i+1} 拆分后部分数量: {len(text_parts)}")
+            series = self._doc_series(ctx, doc.filename)
+            split_start = time.time()
+            if series:
+                # 周期性报告：按内容决定的边界分块，使未变化章节的分块指纹保持稳定
+                chunker = SectionChunker(max_chars, content_defined=True)
+                text_parts = []
+                for section in DocumentParser.split_sections(doc.text_md) + [None]:
+                    chunks = chunker.feed(section) if section is not None else chunker.finish()
+                    for chunk in chunks:
+                        text_parts.extend(self._split_text_by_headers(chunk, max_chars=max_chars))
+            else:
+                # 根据标题拆分文档内容
+                text_parts = self._split_text_by_headers(doc.text_md, max_chars=max_chars)
+            tracer.add_span("split", split_start, time.time(), filename=doc.filename, parts=len(text_parts))
+            logger.info(f"文档 {i+1} 拆分后部分数量: {len(text_parts)}", extra=SAMPLED)
             
-            # 如果文档被拆分成多个部分，分别压缩后再合并
+            # 如果文档被拆分成多个部分，分别压缩后再合并（目标字数按各部分长度分摊）
             if len(text_parts) > 1:
-                part_summaries = []
-                for j, part in enumerate(text_parts):
-                    prompt = self.prompts.DOC_COMPRESS_TEMPLATES[rt_enum].format(
-                        text_md=part
+                parts_chars = sum(len(part) for part in text_parts)
+                part_summaries = await asyncio.gather(*(
+                    self._compress_doc_part(
+                        ctx, part, f"doc_compress_{doc.doc_id}_part{j}", limiter, series,
+                        target_chars=max(target * len(part) // parts_chars, 1) if target else None,
                     )
-                    part_summary = await self._call_llm(prompt, trace_id, f"doc_compress_{doc.doc_id}_part{j}", stream_callback)
-                    part_summaries.append(part_summary)
+                    for j, part in enumerate(text_parts)
+                ))
                 
                 # 合并所有部分的摘要
                 summary_md = "\n\n---\n\n".join(part_summaries)
             else:
-                prompt = self.prompts.DOC_COMPRESS_TEMPLATES[rt_enum].format(
-                    text_md=text_parts[0]
+                summary_md = await self._compress_doc_part(
+                    ctx, text_parts[0], f"doc_compress_{doc.doc_id}", limiter, series, target_chars=target
                 )
-                summary_md = await self._call_llm(prompt, trace_id, f"doc_compress_{doc.doc_id}", stream_callback)
             
-            summaries.append(DocumentSummary(doc_id=doc.doc_id, summary_md=summary_md))
+            summary = DocumentSummary(doc_id=doc.doc_id, summary_md=summary_md, filename=doc.filename)
+            if library_id:
+                await asyncio.to_thread(self.documents.put_summary, library_id, doc_summary_key, summary_md)
+            if on_summary:
+                await on_summary(summary)
+            return summary
         
-        if progress_callback:
-            await progress_callback("doc_compress", "end", "逐文档压缩完成")
+        doc_tasks = [asyncio.create_task(compress_doc(i, doc)) for i, doc in enumerate(documents)]
+        try:
+            results = await asyncio.gather(*doc_tasks)
+        except BaseException:
+            for task in doc_tasks:
+                task.cancel()
+            raise
+        summaries = [summary for summary in results if summary is not None]
         
-        stage_durations["doc_compress"] = (time.time() - stage_start) * 1000
+        if ctx.progress_callback:
+            await ctx.progress_callback("doc_compress", "end", "逐文档压缩完成")
         
-        # 阶段 3: 总体压缩
+        ctx.stage_durations["doc_compress"] = (time.time() - stage_start) * 1000
+        
+        return summaries
+    
+    async def _parse_and_compress_pipelined(
+        self,
+        ctx: RunContext,
+        file_paths: List[tuple],
+        on_summary: Optional[callable] = None,
+    ) -> List[DocumentSummary]:
+        """流式解析与逐文档压缩流水线
+        
+        后台线程逐页/逐节解析文件，片段累积满一个分块预算后立即提交压缩，
+        解析与压缩重叠执行，而不是等全部文件解析完成后才开始压缩。
+        
+        Returns:
+            List[DocumentSummary]: 按文件顺序排列的文档摘要
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        max_chars = self.config.DOC_CHUNK_MAX_CHARS
+        parallelism = self.config.pipeline_concurrency()
+        if self.config.ADAPTIVE_CHUNKING:
+            # 流式模式下总字数未知，以文件字节数作为上界估计
+            total_bytes = sum(os.path.getsize(fp) for fp, _ in file_paths if os.path.exists(fp))
+            plan = self.planner.plan("doc_compress", total_bytes, ctx.trace_id)
+            max_chars, parallelism = plan.max_chars, plan.parallelism
+        max_chars = int(max_chars * ctx.chunk_scale)
+        limiter = asyncio.Semaphore(parallelism)
+        pipeline_start = time.time()
+        
+        if ctx.progress_callback:
+            await ctx.progress_callback("parse", "start", "开始解析文件")
+            await ctx.progress_callback("doc_compress", "start", "开始逐文档压缩（与解析流水线并行）")
+        
+        parent_span = tracer.current()
+        stop = threading.Event()  # 出错或请求取消时通知解析线程停止
+        
+        def produce():
+            """解析线程：按文件顺序产出 (文件序号, 片段)，每个文件结束时产出 (文件序号, None)"""
+            for index, (file_path, filename) in enumerate(file_paths):
+                if stop.is_set():
+                    return
+                parse_start = time.time()
+                chars = 0
+                try:
+                    for section in self._iter_sections(ctx, file_path):
+                        if stop.is_set():
+                            return
+                        chars += len(section)
+                        loop.call_soon_threadsafe(queue.put_nowait, (index, section))
+                except Exception as e:
+                    logger.warning(f"文档 {filename} 流式解析失败: {str(e)}")
+                # 线程中没有 contextvar 上下文，显式指定父 span
+                tracer.add_span("parse_file", parse_start, time.time(), parent=parent_span, filename=filename, chars=chars)
+                loop.call_soon_threadsafe(queue.put_nowait, (index, None))
+        
+        # 已提交的全部压缩任务（创建时即登记，出错时统一取消）；任一任务失败时 failed 立即带上异常，
+        # 不必等全部文件解析完成才发现
+        all_tasks: List[asyncio.Task] = []
+        failed: asyncio.Future = loop.create_future()
+        
+        def on_task_done(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is not None and not failed.done():
+                failed.set_exception(task.exception())
+        
+        async def until_failed(awaitable):
+            """等待 awaitable，期间有压缩任务失败时立即抛出该异常"""
+            waiter = asyncio.ensure_future(awaitable)
+            try:
+                await asyncio.wait({waiter, failed}, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                waiter.cancel()
+                raise
+            if failed.done():
+                waiter.cancel()
+                failed.result()
+            return waiter.result()
+        
+        producer = loop.run_in_executor(None, produce)
+        doc_tasks: List[List[asyncio.Task]] = []
+        doc_ids: List[str] = []
+        
+        async def finish_doc(doc_id: str, filename: str, tasks: List[asyncio.Task]) -> Optional[DocumentSummary]:
+            """等待单个文档的全部分块完成，合并为文档摘要"""
+            if not tasks:
+                return None
+            part_summaries = await asyncio.gather(*tasks)
+            summary = DocumentSummary(doc_id=doc_id, summary_md="\n\n---\n\n".join(part_summaries), filename=filename)
+            if on_summary:
+                await on_summary(summary)
+            return summary
+        
+        try:
+            for index, (_, filename) in enumerate(file_paths):
+                doc_id = str(uuid.uuid4())
+                doc_ids.append(doc_id)
+                tasks: List[asyncio.Task] = []
+                doc_tasks.append(tasks)
+                series = self._doc_series(ctx, filename)
+                chunker = SectionChunker(max_chars, content_defined=bool(series))
+                total_len = 0
+                
+                if ctx.progress_callback:
+                    await ctx.progress_callback("progress", "", f"处理文档 {index+1}/{len(file_paths)}: {filename}")
+                
+                def submit(chunks: List[str]):
+                    for chunk in chunks:
+                        for part in self._split_text_by_headers(chunk, max_chars=max_chars):
+                            stage = f"doc_compress_{doc_id}_part{len(tasks)}"
+                            task = asyncio.create_task(self._compress_doc_part(ctx, part, stage, limiter, series))
+                            task.add_done_callback(on_task_done)
+                            tasks.append(task)
+                            all_tasks.append(task)
+                
+                while True:
+                    _, section = await until_failed(queue.get())
+                    if section is None:
+                        break
+                    total_len += len(section)
+                    submit(chunker.feed(self._preprocess_text(ctx, filename, section, whole=False)))
+                
+                if total_len < 10:
+                    logger.warning(f"文档 {filename} 解析失败或内容过短，跳过处理")
+                    ctx.warnings.append(f"文档 {filename} 解析失败或内容过短")
+                else:
+                    submit(chunker.finish())
+                
+                logger.info(f"文档 {index+1}/{len(file_paths)}: {filename}, 原始长度: {total_len}, 分块数量: {len(tasks)}")
+            
+            await until_failed(producer)
+            ctx.stage_durations["parse"] = (time.time() - pipeline_start) * 1000
+            if ctx.progress_callback:
+                await ctx.progress_callback("parse", "end", f"解析完成，共 {len(file_paths)} 份文件")
+            
+            results = await asyncio.gather(*(
+                finish_doc(d, filename, t) for d, (_, filename), t in zip(doc_ids, file_paths, doc_tasks)
+            ))
+        except BaseException:
+            stop.set()
+            for task in all_tasks:
+                task.cancel()
+            raise
+        finally:
+            if failed.done():
+                failed.exception()  # 异常已由 gather 或 until_failed 抛出，避免"未取回"警告
+            else:
+                failed.cancel()
+        summaries = [summary for summary in results if summary is not None]
+        
+        if ctx.progress_callback:
+            await ctx.progress_callback("doc_compress", "end", "逐文档压缩完成")
+        
+        ctx.stage_durations["doc_compress"] = (time.time() - pipeline_start) * 1000
+        return summaries
+    
+    def _spill_document(self, ctx: RunContext, file_path: str, filename: str) -> SpilledText:
+        """解析文件并把预处理后的片段逐个写入临时文件（在线程中执行）"""
+        spill = SpilledText(self.config.SPILL_DIR)
+        try:
+            for section in self._iter_sections(ctx, file_path, buffered=False):
+                spill.append(self._preprocess_text(ctx, filename, section, whole=False))
+        except Exception as e:
+            logger.warning(f"文档 {filename} 解析失败: {str(e)}")
+        return spill
+    
+    async def _parse_and_compress_bounded(
+        self,
+        ctx: RunContext,
+        file_paths: List[tuple],
+        on_summary: Optional[callable] = None,
+    ) -> List[DocumentSummary]:
+        """内存受限模式：逐文档解析与压缩
+        
+        每个文档解析后落盘，再按分块从内存映射文件读取并压缩；分块提交前向请求的
+        内存预算申请空间，预算不足时等待已提交的分块完成。文档摘要完成后立即删除
+        其落盘文本，任一时刻只有一个文档的少量分块驻留内存。
+        
+        Returns:
+            List[DocumentSummary]: 按文件顺序排列的文档摘要
+        """
+        budget = MemoryBudget(self.config.MEMORY_BUDGET_MB * 1024 * 1024)
+        max_chars = int(self.config.DOC_CHUNK_MAX_CHARS * ctx.chunk_scale)
+        limiter = asyncio.Semaphore(self.config.pipeline_concurrency())
+        summaries: List[DocumentSummary] = []
+        spilled_bytes = 0
+        parse_seconds = 0.0
         stage_start = time.time()
-        if progress_callback:
-            await progress_callback("global_compress", "start", "开始总体压缩")
         
-        # 准备约束条件块
+        if ctx.progress_callback:
+            await ctx.progress_callback("parse", "start", "开始解析文件")
+            await ctx.progress_callback("doc_compress", "start", "开始逐文档压缩（内存受限模式）")
+        
+        async def compress_chunk(part: str, stage: str, size: int, series: str) -> str:
+            try:
+                return await self._compress_doc_part(ctx, part, stage, limiter, series)
+            finally:
+                await budget.release(size)
+        
+        for index, (file_path, filename) in enumerate(file_paths):
+            if ctx.progress_callback:
+                await ctx.progress_callback("progress", "", f"处理文档 {index+1}/{len(file_paths)}: {filename}")
+            
+            parse_start = time.time()
+            with tracer.span("parse_file", filename=filename):
+                spill = await asyncio.to_thread(self._spill_document, ctx, file_path, filename)
+            parse_seconds += time.time() - parse_start
+            spilled_bytes += spill.nbytes
+            
+            try:
+                if spill.chars < 10:
+                    logger.warning(f"文档 {filename} 解析失败或内容过短，跳过处理")
+                    ctx.warnings.append(f"文档 {filename} 解析失败或内容过短")
+                    continue
+                
+                doc_id = str(uuid.uuid4())
+                series = self._doc_series(ctx, filename)
+                chunker = SectionChunker(max_chars, content_defined=bool(series))
+                tasks: List[asyncio.Task] = []
+                
+                async def submit(chunks: List[str]):
+                    for chunk in chunks:
+                        for part in self._split_text_by_headers(chunk, max_chars=max_chars):
+                            size = MemoryBudget.estimate(part)
+                            await budget.acquire(size)
+                            stage = f"doc_compress_{doc_id}_part{len(tasks)}"
+                            tasks.append(asyncio.create_task(compress_chunk(part, stage, size, series)))
+                
+                try:
+                    for section in spill.sections():
+                        await submit(chunker.feed(section))
+                    await submit(chunker.finish())
+                    part_summaries = await asyncio.gather(*tasks)
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    raise
+                
+                summary = DocumentSummary(
+                    doc_id=doc_id, summary_md="\n\n---\n\n".join(part_summaries), filename=filename
+                )
+                budget.hold(MemoryBudget.estimate(summary.summary_md))
+                logger.info(f"文档 {index+1}/{len(file_paths)}: {filename}, 原始长度: {spill.chars}, 分块数量: {len(tasks)}")
+            finally:
+                # 摘要完成（或失败）后立即释放该文档的全文
+                spill.close()
+            
+            summaries.append(summary)
+            if on_summary:
+                await on_summary(summary)
+        
+        ctx.stage_durations["parse"] = parse_seconds * 1000
+        if ctx.progress_callback:
+            await ctx.progress_callback("parse", "end", f"解析完成，共 {len(file_paths)} 份文件")
+            await ctx.progress_callback("doc_compress", "end", "逐文档压缩完成")
+        ctx.stage_durations["doc_compress"] = (time.time() - stage_start) * 1000
+        
+        ctx.memory_stats = budget.report(spilled_bytes)
+        if budget.exceeded:
+            ctx.warnings.append(
+                f"内存预算 ({self.config.MEMORY_BUDGET_MB} MB) 不足，峰值 {budget.peak_bytes / 1024 / 1024:.1f} MB"
+            )
+        return summaries
+    
+    def _build_global_compress_prompt(
+        self, rt_enum: ReportType, summaries: str, max_words: int, max_paragraphs: int, requirements: str
+    ) -> str:
+        """构建总体压缩 prompt"""
         requirements_block = f"- 特定要求：{requirements}" if requirements else ""
+        return self.prompts.GLOBAL_COMPRESS_TEMPLATES[rt_enum].format(
+            max_words=max_words,
+            max_paragraphs=max_paragraphs,
+            requirements_block=requirements_block,
+            summaries=summaries,
+        )
+    
+    def _merge_fact_records(self, ctx: RunContext, summaries: List[DocumentSummary]) -> str:
+        """解析各文档的事实记录，合并去重后渲染为总体压缩的输入
+        
+        没有解析出任何记录的文档（模型未按格式输出）以原文摘要附在后面。
+        """
+        records = []
+        unparsed = []
+        for summary in summaries:
+            doc_records = parse_facts(summary.summary_md, summary.filename or summary.doc_id)
+            if doc_records:
+                records.extend(doc_records)
+            elif summary.summary_md.strip():
+                ctx.warnings.append(f"文档 {summary.filename or summary.doc_id} 未能解析出事实记录，按原文摘要处理")
+                unparsed.append(summary.summary_md)
+        merged = merge_facts(records)
+        text = "\n\n---\n\n".join(([render_facts(merged)] if merged else []) + unparsed)
         
-        # 合并所有摘要
-        summaries_text = "\n\n---\n\n".join([s.summary_md for s in summaries])
+        ctx.fact_stats = {
+            "records": len(records),
+            "merged_records": len(merged),
+            "raw_chars": sum(len(s.summary_md) for s in summaries),
+            "global_input_chars": len(text),
+        }
+        logger.info(f"事实记录: 抽取 {len(records)} 条, 去重后 {len(merged)} 条, 总体压缩输入 {len(text)} 字")
+        return text
+    
+    async def _global_compress(self, ctx: RunContext, summaries: List[DocumentSummary]) -> str:
+        """总体压缩：合并全部文档摘要，超出分块预算时分多次压缩后拼接"""
+        stage_start = time.time()
+        if ctx.progress_callback:
+            await ctx.progress_callback("global_compress", "start", "开始总体压缩")
+        
+        # 合并所有摘要（事实抽取模式下合并去重为事实表）
+        if self.config.FACT_EXTRACTION:
+            summaries_text = self._merge_fact_records(ctx, summaries)
+        else:
+            summaries_text = "\n\n---\n\n".join([s.summary_md for s in summaries])
         
-        import logging
-        logger = logging.getLogger(__name__)
         paragraph_count = len([p for p in summaries_text.split('\n\n') if p.strip()])
         logger.info(f"合并后的摘要文本长度: {len(summaries_text)}, 段落数: {paragraph_count}")
         
         # 如果摘要文本仍然太长，继续拆分处理
-        summary_parts = self._split_text_by_headers(summaries_text, max_chars=5000)
+        summary_parts = self._split_text_by_headers(
+            summaries_text, max_chars=int(self.config.GLOBAL_CHUNK_MAX_CHARS * ctx.chunk_scale)
+        )
         logger.info(f"拆分后的部分数量: {len(summary_parts)}")
         
         # 打印前5个部分的内容（用于调试）
-        for i, part in enumerate(summary_parts[:5]):
-            logger.info(f"部分 {i+1} 长度: {len(part)}, 内容预览: {part[:200]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, part in enumerate(summary_parts[:5]):
+                logger.debug(f"部分 {i+1} 长度: {len(part)}, 内容预览: {part[:200]}", extra=SAMPLED)
         
         if len(summary_parts) > 1:
-            # 分多次压缩
+            # 分多次压缩（恢复运行时跳过检查点中已完成的部分）
+            # 检查点按 prompt 哈希保存各部分：恢复时拆分方式不同（分块大小、过载放大倍数变化）
+            # 的部分不会被错配，只复用输入完全相同的部分
             compressed_parts = []
-            import logging
-            logger = logging.getLogger(__name__)
+            restored_parts = ctx.restored.get("global_compress_parts", {})
+            completed_parts = {}
             
             for j, part in enumerate(summary_parts):
-                logger.info(f"处理第 {j+1}/{len(summary_parts)} 部分, 长度: {len(part)}")
-                prompt = self.prompts.GLOBAL_COMPRESS_TEMPLATES[rt_enum].format(
-                    max_words=max_words // len(summary_parts),
-                    max_paragraphs=max_paragraphs // len(summary_parts),
-                    requirements_block=requirements_block,
-                    summaries=part
+                part_words = ctx.max_words // len(summary_parts)
+                prompt = self._build_global_compress_prompt(
+                    ctx.report_type, part,
+                    part_words, ctx.max_paragraphs // len(summary_parts), ctx.requirements,
+                )
+                part_key = DocumentParser.calculate_hash(prompt)
+                if part_key in restored_parts:
+                    compressed_parts.append(restored_parts[part_key])
+                    completed_parts[part_key] = restored_parts[part_key]
+                    continue
+                logger.info(f"处理第 {j+1}/{len(summary_parts)} 部分, 长度: {len(part)}", extra=SAMPLED)
+                compressed_part = await self._call_llm(
+                    prompt, ctx.trace_id, f"global_compress_part{j}", ctx.stream_callback,
+                    target_chars=part_words, warnings=ctx.warnings,
                 )
-                compressed_part = await self._call_llm(prompt, trace_id, f"global_compress_part{j}", stream_callback)
                 compressed_parts.append(compressed_part)
+                completed_parts[part_key] = compressed_part
+                await self._save_checkpoint(ctx, "global_compress_parts", dict(completed_parts))
             
             # 合并压缩后的部分
             report_markdown_draft = "\n\n---\n\n".join(compressed_parts)
         else:
-            prompt = self.prompts.GLOBAL_COMPRESS_TEMPLATES[rt_enum].format(
-                max_words=max_words,
-                max_paragraphs=max_paragraphs,
-                requirements_block=requirements_block,
-                summaries=summary_parts[0]
+            prompt = self._build_global_compress_prompt(
+                ctx.report_type, summary_parts[0], ctx.max_words, ctx.max_paragraphs, ctx.requirements
+            )
+            report_markdown_draft = await self._call_llm(
+                prompt, ctx.trace_id, "global_compress", ctx.stream_callback,
+                target_chars=ctx.max_words, warnings=ctx.warnings,
             )
-            report_markdown_draft = await self._call_llm(prompt, trace_id, "global_compress", stream_callback)
         
-        if progress_callback:
-            await progress_callback("global_compress", "end", "总体压缩完成")
+        if ctx.progress_callback:
+            await ctx.progress_callback("global_compress", "end", "总体压缩完成")
         
-        stage_durations["global_compress"] = (time.time() - stage_start) * 1000
+        ctx.stage_durations["global_compress"] = (time.time() - stage_start) * 1000
         
-        # 阶段 4: validate_and_refine
-        stage_start = time.time()
-        if progress_callback:
-            await progress_callback("validate", "start", "开始验证和修订")
+        return report_markdown_draft
+    
+    def _apply_overload_level(self, ctx: RunContext) -> None:
+        """按当前负载等级为本次运行选择降级方式，并记入警告"""
+        pressure = self.overload.pressure()
+        # 已被接纳的请求不再拒绝，最多按抽取式降级处理
+        level = min(self.overload.level(), OverloadLevel.EXTRACTIVE)
+        if level == OverloadLevel.NORMAL:
+            return
+        ctx.skip_validate = True
+        ctx.chunk_scale = self.config.OVERLOAD_CHUNK_SCALE
+        mode = f"跳过验证修订、分块放大 {ctx.chunk_scale:g} 倍"
+        if level >= OverloadLevel.EXTRACTIVE:
+            ctx.extractive_ratio = self.config.OVERLOAD_EXTRACTIVE_RATIO
+            mode += f"、抽取式预压缩保留 {ctx.extractive_ratio:.0%}"
+        logger.warning(
+            f"系统负载较高，降级处理: {mode}",
+            extra={"fields": {"overload_level": level.name, **pressure}},
+        )
+        ctx.warnings.append(
+            f"系统负载较高（进行中 LLM 调用 {pressure['inflight']} 个，排队 {pressure['queue_wait_ms']:.0f} ms），已降级处理: {mode}"
+        )
+    
+    async def _validate_with_edits(self, ctx: RunContext, draft: str) -> Optional[str]:
+        """编辑指令模式的验证修订：模型只输出需要修改的段落，在本地应用
+        
+        Returns:
+            Optional[str]: 修订后的报告；指令不合法时为 None（由调用方改为整篇重写）
+        """
+        paragraphs = split_paragraphs(draft)
+        prompt = self.prompts.VALIDATE_EDIT_TEMPLATE.format(
+            max_words=ctx.max_words,
+            max_paragraphs=ctx.max_paragraphs,
+            requirements=ctx.requirements if ctx.requirements else "无",
+            current_words=self._count_words(draft),
+            current_paragraphs=self._count_paragraphs(draft),
+            numbered_report=number_paragraphs(paragraphs),
+        )
+        # 指令不应长于原报告；输出不是报告内容，不经流式回调发送
+        output = await self._call_llm(
+            prompt, ctx.trace_id, "validate_edits", None, target_chars=len(draft), warnings=ctx.warnings
+        )
+        ctx.validate_stats = {"report_chars": len(draft), "edit_output_chars": len(output)}
+        try:
+            edits = parse_edits(output, paragraphs)
+        except EditScriptError as e:
+            logger.warning(f"验证修订的编辑指令不合法，改为整篇重写: {e}")
+            ctx.warnings.append(f"验证修订的编辑指令不合法（{e}），已改为整篇重写")
+            ctx.validate_stats.update(mode="rewrite", error=str(e))
+            return None
+        
+        report = apply_edits(paragraphs, edits) if edits else draft
+        ctx.validate_stats.update(
+            mode="edits",
+            edits={op: sum(edit.op == op for edit in edits) for op in ("delete", "replace", "shorten")},
+            paragraphs_before=len(paragraphs),
+            paragraphs_after=len(paragraphs) - sum(edit.op == "delete" for edit in edits),
+            constraints_met=(
+                self._count_words(report) <= ctx.max_words and self._count_paragraphs(report) <= ctx.max_paragraphs
+            ),
+        )
+        logger.info(f"验证修订: {len(edits)} 条编辑指令, 模型输出 {len(output)} 字 (报告 {len(draft)} 字)")
+        return report
+    
+    async def _save_checkpoint(self, ctx: RunContext, stage: str, data) -> None:
+        """记录一个阶段（或部分）的中间结果"""
+        if ctx.checkpoint is None:
+            return
+        ctx.checkpoint[stage] = data
+        await asyncio.to_thread(self.checkpoints.save, ctx.trace_id, dict(ctx.checkpoint))
+    
+    async def _report_restored(self, ctx: RunContext, stages: tuple) -> None:
+        """通知客户端哪些阶段从检查点恢复而未重新计算"""
+        if ctx.progress_callback:
+            for stage in stages:
+                await ctx.progress_callback(stage, "restored", "已从检查点恢复")
+    
+    async def summarize(
+        self,
+        report_type: str,
+        file_paths: List[tuple],
+        max_words: int,
+        max_paragraphs: int,
+        requirements: str,
+        progress_callback: Optional[callable] = None,
+        stream_callback: Optional[callable] = None,
+        series_id: str = "",
+        trace_id: str = "",
+        resume: bool = False,
+        library: Optional[Dict[str, str]] = None,
+    ) -> tuple[str, MetaInfo]:
+        """生成报告摘要
         
-        current_words = self._count_words(report_markdown_draft)
-        current_paragraphs = self._count_paragraphs(report_markdown_draft)
+        Args:
+            report_type: 报告类型
+            file_paths: (file_path, filename) 元组列表
+            max_words: 最大字数
+            max_paragraphs: 最大段落数
+            requirements: 特定要求
+            progress_callback: 进度回调函数
+            stream_callback: 流式内容回调函数
+            series_id: 周期性报告系列 ID（用于复用上一期未变化章节的压缩结果）
+            trace_id: 追踪ID（为空时自动生成）
+            resume: 从 trace_id 的检查点继续（已完成的阶段不再重新计算）
+            library: file_paths 中来自文档库的文件路径 → 文档库 ID（复用其解析结果与逐文档摘要）
+            
+        Returns:
+            tuple: (report_markdown, meta_info)
+        """
+        trace_id = trace_id or str(uuid.uuid4())
+        with tracer.span("summarize", trace_id=trace_id, report_type=report_type, files=len(file_paths)):
+            return await self._summarize(
+                trace_id, report_type, file_paths, max_words, max_paragraphs, requirements,
+                progress_callback, stream_callback, series_id, resume, library,
+            )
+    
+    async def _summarize(
+        self,
+        trace_id: str,
+        report_type: str,
+        file_paths: List[tuple],
+        max_words: int,
+        max_paragraphs: int,
+        requirements: str,
+        progress_callback: Optional[callable],
+        stream_callback: Optional[callable],
+        series_id: str,
+        resume: bool = False,
+        library: Optional[Dict[str, str]] = None,
+    ) -> tuple[str, MetaInfo]:
+        """生成报告摘要（参数见 summarize）"""
+        trace_id_var.set(trace_id)
+        start_time = time.time()
+        
+        # 获取报告类型枚举
+        rt_enum = self._get_report_type_enum(report_type)
         
-        prompt = self.prompts.VALIDATE_TEMPLATES[rt_enum].format(
+        ctx = RunContext(
+            trace_id=trace_id,
+            report_type=rt_enum,
             max_words=max_words,
             max_paragraphs=max_paragraphs,
-            requirements=requirements if requirements else "无",
-            current_words=current_words,
-            current_paragraphs=current_paragraphs,
-            report_markdown=report_markdown_draft
+            requirements=requirements,
+            progress_callback=progress_callback,
+            stream_callback=stream_callback,
+            series_id=series_id,
+            section_reuse=self.config.SECTION_REUSE and rt_enum in SECTION_REUSE_REPORT_TYPES,
+            library=library or {},
         )
+        _stage_models_var.set(ctx.stage_models)
+        stage_durations = ctx.stage_durations
+        warnings = ctx.warnings
+        if self.config.OVERLOAD_CONTROL:
+            self._apply_overload_level(ctx)
+        
+        if self.recorder is not None:
+            params = {
+                "report_type": report_type,
+                "max_words": max_words,
+                "max_paragraphs": max_paragraphs,
+                "requirements": requirements,
+                "series_id": series_id,
+            }
+            await asyncio.to_thread(self.recorder.start, trace_id, params, file_paths)
+        
+        used_files = [fn for _, fn in file_paths]
+        if self.config.CHECKPOINT:
+            state = await asyncio.to_thread(self.checkpoints.load, trace_id) if resume else None
+            if resume and state is None:
+                raise ValueError(f"未找到检查点: {trace_id}")
+            if state:
+                ctx.restored = state["stages"]
+                used_files = used_files or state["request"].get("filenames", [])
+            else:
+                request = {
+                    "report_type": report_type,
+                    "max_words": max_words,
+                    "max_paragraphs": max_paragraphs,
+                    "requirements": requirements,
+                    "series_id": series_id,
+                    "filenames": used_files,
+                    "documents": list(ctx.library.values()),  # 引用的文档库文档（续跑时重新引用）
+                }
+                await asyncio.to_thread(self.checkpoints.save, trace_id, {}, request)
+            ctx.checkpoint = dict(ctx.restored)
         
-        report_markdown = await self._call_llm(prompt, trace_id, "validate", stream_callback)
+        # 流式归并：文档摘要陆续完成时即开始总体压缩
+        reducer = None
+        # 事实抽取模式需要全部记录到齐后统一去重，不使用流式归并
+        if self.config.STREAMING_REDUCE and not self.config.FACT_EXTRACTION and "doc_compress" not in ctx.restored:
+            async def compress_part(text: str, part_words: int, part_paragraphs: int, index: Optional[int]) -> str:
+                prompt = self._build_global_compress_prompt(rt_enum, text, part_words, part_paragraphs, requirements)
+                stage = "global_compress" if index is None else f"global_compress_part{index}"
+                return await self._call_llm(
+                    prompt, trace_id, stage, stream_callback, target_chars=part_words, warnings=ctx.warnings
+                )
+            
+            async def on_first_part():
+                if progress_callback:
+                    await progress_callback("global_compress", "start", "开始总体压缩（流式归并）")
+            
+            reducer = StreamingReducer(
+                compress_fn=compress_part,
+                split_fn=lambda text, limit: self._split_text_by_headers(text, max_chars=limit),
+                max_chars=int(self.config.GLOBAL_CHUNK_MAX_CHARS * ctx.chunk_scale),
+                expected_docs=len(file_paths),
+                max_words=max_words,
+                max_paragraphs=max_paragraphs,
+                on_first_part=on_first_part,
+            )
+        
+        # 阶段 1 + 2: 解析文件与逐文档压缩
+        if "doc_compress" in ctx.restored:
+            summaries = [DocumentSummary(**summary) for summary in ctx.restored["doc_compress"]]
+            await self._report_restored(ctx, ("parse", "doc_compress"))
+            doc_compress_end = time.time()
+        else:
+            if self.config.BOUNDED_MEMORY:
+                parse_and_compress = self._parse_and_compress_bounded
+            elif self.config.STREAMING_PARSE:
+                parse_and_compress = self._parse_and_compress_pipelined
+            else:
+                parse_and_compress = self._parse_then_compress
+            try:
+                with tracer.span("parse_and_compress", mode=parse_and_compress.__name__):
+                    summaries = await parse_and_compress(ctx, file_paths, on_summary=reducer.add if reducer else None)
+                # 最后一份文档摘要完成的时刻（不含其后的指纹库写回与检查点保存）
+                doc_compress_end = time.time()
+            except BaseException:
+                if reducer:
+                    reducer.cancel()
+                raise
+            finally:
+                if ctx.section_reuse:
+                    await asyncio.to_thread(self.section_store.flush)
+            await self._save_checkpoint(ctx, "doc_compress", [summary.model_dump() for summary in summaries])
+        
+        # 阶段 3: 总体压缩
+        if "global_compress" in ctx.restored:
+            report_markdown_draft = ctx.restored["global_compress"]
+            await self._report_restored(ctx, ("global_compress",))
+        elif reducer:
+            with tracer.span("global_compress_tail"):
+                report_markdown_draft = await reducer.finish()
+            if progress_callback:
+                await progress_callback("global_compress", "end", "总体压缩完成")
+            stage_durations["global_compress"] = (reducer.last_end - reducer.first_start) * 1000
+            # 与逐文档压缩重叠的部分 / 最后一份文档完成后仍需等待的部分
+            stage_durations["global_compress_overlap"] = max(doc_compress_end - reducer.first_start, 0.0) * 1000
+            stage_durations["global_compress_tail"] = (reducer.last_end - max(doc_compress_end, reducer.first_start)) * 1000
+        else:
+            with tracer.span("global_compress"):
+                report_markdown_draft = await self._global_compress(ctx, summaries)
+        global_compress_end = time.time()
+        await self._save_checkpoint(ctx, "global_compress", report_markdown_draft)
+        
+        # 阶段 4: validate_and_refine
+        stage_start = time.time()
+        if ctx.skip_validate:
+            # 过载降级：直接以总体压缩结果作为最终报告，仍通过流式回调发送给客户端
+            if progress_callback:
+                await progress_callback("validate", "skipped", "系统负载较高，跳过验证和修订")
+            report_markdown = report_markdown_draft
+            if stream_callback:
+                await stream_callback(report_markdown)
+        else:
+            if progress_callback:
+                await progress_callback("validate", "start", "开始验证和修订")
+            
+            report_markdown = None
+            if self.config.VALIDATE_EDIT_SCRIPT:
+                with tracer.span("validate_edits"):
+                    report_markdown = await self._validate_with_edits(ctx, report_markdown_draft)
+                if report_markdown is not None and stream_callback:
+                    await stream_callback(report_markdown)
+            
+            if report_markdown is None:
+                current_words = self._count_words(report_markdown_draft)
+                current_paragraphs = self._count_paragraphs(report_markdown_draft)
+                
+                prompt = self.prompts.VALIDATE_TEMPLATES[rt_enum].format(
+                    max_words=max_words,
+                    max_paragraphs=max_paragraphs,
+                    requirements=requirements if requirements else "无",
+                    current_words=current_words,
+                    current_paragraphs=current_paragraphs,
+                    report_markdown=report_markdown_draft
+                )
+                
+                with tracer.span("validate"):
+                    report_markdown = await self._call_llm(
+                        prompt, trace_id, "validate", stream_callback, target_chars=max_words, warnings=warnings
+                    )
         
         # 检查最终结果
         final_words = self._count_words(report_markdown)
@@ -363,38 +1435,67 @@ class ReportSummarizer:
         if final_paragraphs > max_paragraphs:
             warnings.append(f"最终报告段落数 ({final_paragraphs}) 超过约束 ({max_paragraphs})")
         
-        if progress_callback:
+        if progress_callback and not ctx.skip_validate:
             await progress_callback("validate", "end", "验证和修订完成")
         
         stage_durations["validate"] = (time.time() - stage_start) * 1000
         
-        # 计算总耗时
+        # 关键路径：各阶段可能重叠，按实际时刻计算最后一份文档摘要完成所需时间、
+        # 此后仍需等待的总体压缩时间与验证时间（不含检查点保存等簿记开销）
+        stage_durations["critical_path_doc_compress"] = (doc_compress_end - start_time) * 1000
+        stage_durations["critical_path_global_compress"] = (global_compress_end - doc_compress_end) * 1000
+        stage_durations["critical_path"] = (
+            stage_durations["critical_path_doc_compress"]
+            + stage_durations["critical_path_global_compress"]
+            + stage_durations["validate"]
+        )
         total_duration = (time.time() - start_time) * 1000
         
+        if ctx.checkpoint is not None:
+            # 运行成功，不再需要检查点
+            await asyncio.to_thread(self.checkpoints.delete, trace_id)
+        
         # 计算哈希
         hash_value = DocumentParser.calculate_hash(report_markdown)
         
-        # 构建元数据
+        # 构建元数据（model 等字段为产出最终报告的验证阶段配置）
         meta = MetaInfo(
             used_files=used_files,
             hash=hash_value,
-            model=self.config.LLM_MODEL,
-            base_url=self.config.LLM_BASE_URL,
-            temperature=self.config.LLM_TEMPERATURE,
+            model=self.config.VALIDATE_LLM_MODEL,
+            base_url=self.config.VALIDATE_LLM_BASE_URL,
+            temperature=self.config.VALIDATE_LLM_TEMPERATURE,
             total_duration_ms=total_duration,
             stage_durations_ms=stage_durations,
             trace_id=trace_id,
-            warnings=warnings
+            warnings=warnings,
+            section_reuse_ratio=(ctx.sections_reused / ctx.sections_total) if ctx.sections_total else None,
+            document_stats=ctx.document_stats,
+            stage_models=ctx.stage_models,
+            memory=ctx.memory_stats,
+            fact_stats=ctx.fact_stats,
+            validate_stats=ctx.validate_stats,
         )
         
         return report_markdown, meta
 
 
+_agentscope_initialized = False
+
+
 def init_agentscope():
-    """初始化 AgentScope"""
+    """初始化 AgentScope（幂等，重复调用不会重新初始化）"""
+    global _agentscope_initialized
+    if _agentscope_initialized:
+        return
+    
+    import agentscope
+    
     agentscope.init(
         project="compress_report",
         name="report_summarizer",
-        logging_path="./logs/agentscope.log",
-        logging_level="DEBUG",
+        logging_level=Config.AGENTSCOPE_LOGGING_LEVEL,
     )
+    # AgentScope 自带同步处理器，改为经日志队列输出（写入 logs/app.log）
+    route_logger_to_queue("as")
+    _agentscope_initialized = True
@@ -0,0 +1,199 @@
+"""CPU 热点函数微基准与回归检查
+
+对 summarize 中处理大字符串的函数，在生成的中文 Markdown（默认 10KB、1MB、
+10MB、50MB）上测量耗时与峰值内存分配：
+
+- split_text_by_headers: ReportSummarizer._split_text_by_headers（按 DOC_CHUNK_MAX_CHARS 分块）
+- count_paragraphs: ReportSummarizer._count_paragraphs
+- join_summaries: 按分块拆分后以 "\\n\\n---\\n\\n" 重新拼接
+- calculate_hash: DocumentParser.calculate_hash
+- stream_deltas: _call_llm 中的增量提取（_chunk_text + _stream_delta），模拟逐 chunk
+  返回累计文本的流式响应；累计文本每次都要比较前缀，输出长度上限为 --stream-max-chars
+
+耗时取 --rounds 轮的中位数；峰值内存在单独一轮中用 tracemalloc 测量（不计入耗时）。
+
+基线保存在 --baseline 指定的 JSON 文件中（默认 benchmarks/baselines/hotpath.json；
+耗时与机器相关，应在同一环境中生成与比较）。任一函数的耗时超过基线的
+(1 + --time-threshold) 倍，或峰值内存超过基线的 (1 + --memory-threshold) 倍时，
+以退出码 1 结束（基线中缺少某项同样视为回归）；没有基线文件且未指定 --save-baseline 时
+以退出码 2 结束，避免在缺少基线时检查静默通过。
+
+用法：
+    python -m benchmarks.bench_hotpath --save-baseline    # 生成基线
+    python -m benchmarks.bench_hotpath                    # 与基线比较
+    python -m benchmarks.bench_hotpath --sizes 10KB 1MB --rounds 3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+
+from app.config import Config
+from app.utils.document_parser import DocumentParser
+from app.workflow.summarizer import ReportSummarizer, _chunk_text, _stream_delta
+
+
+_DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "hotpath.json")
+_UNITS = {"KB": 1024, "MB": 1024 * 1024}
+
+_SENTENCES = [
+    "2024年全社会用电量同比增长6.8%，增速较上年提高0.1个百分点。",
+    "第二产业用电量占比超过六成，其中高技术及装备制造业用电量增长较快。",
+    "受持续高温影响，7月下旬最大负荷创历史新高，电网供需总体偏紧。",
+    "充换电服务业用电量保持高速增长，同比增长超过五成。",
+    "预计下半年用电需求继续保持平稳增长，需做好迎峰度冬保供准备。",
+]
+
+
+def parse_size(text: str) -> int:
+    """解析 "10KB"、"50MB" 等大小（按 UTF-8 字节数计）"""
+    text = text.strip().upper()
+    for unit, factor in _UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def make_markdown(size_bytes: int, seed: int = 0) -> str:
+    """生成约 size_bytes 字节的中文 Markdown（多级标题、段落与表格）"""
+    rng = random.Random(seed)
+    blocks: List[str] = []
+    total = 0
+    section = 0
+    while total < size_bytes:
+        section += 1
+        block = [f"## 第{section}节 用电情况分析"]
+        for sub in range(rng.randint(1, 3)):
+            block.append(f"### {section}.{sub + 1} 分项情况")
+            block.append("".join(rng.choice(_SENTENCES) for _ in range(rng.randint(3, 8))))
+        if section % 4 == 0:
+            rows = ["| 地区 | 用电量 | 同比 |", "| --- | --- | --- |"]
+            rows += [f"| 地区{j} | {rng.randint(100, 999)}.{j} | {rng.randint(0, 9)}.{j}% |" for j in range(6)]
+            block.append("\n".join(rows))
+        text = "\n\n".join(block)
+        blocks.append(text)
+        total += len(text.encode("utf-8")) + 2
+    return "\n\n".join(blocks)
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.content = [{"type": "text", "text": text}]
+
+
+def _stream_chunks(text: str, step: int = 8) -> List[_Chunk]:
+    """模拟流式响应：每个 chunk 携带截至当前的累计文本"""
+    return [_Chunk(text[:end]) for end in range(step, len(text) + step, step)]
+
+
+def _consume_stream(chunks: List[_Chunk]) -> str:
+    prev_text = ""
+    for chunk in chunks:
+        current_text = _chunk_text(chunk)
+        delta = _stream_delta(prev_text, current_text)
+        if delta is None or delta:
+            prev_text = current_text
+    return prev_text
+
+
+def build_cases(summarizer: ReportSummarizer, text: str, stream_max_chars: int) -> Dict[str, Callable[[], object]]:
+    """一种输入大小下的全部测量项（输入在此预先生成，不计入测量）"""
+    max_chars = Config.DOC_CHUNK_MAX_CHARS
+    parts = summarizer._split_text_by_headers(text, max_chars=max_chars)
+    chunks = _stream_chunks(text[:stream_max_chars])
+    return {
+        "split_text_by_headers": lambda: summarizer._split_text_by_headers(text, max_chars=max_chars),
+        "count_paragraphs": lambda: summarizer._count_paragraphs(text),
+        "join_summaries": lambda: "\n\n---\n\n".join(parts),
+        "calculate_hash": lambda: DocumentParser.calculate_hash(text),
+        "stream_deltas": lambda: _consume_stream(chunks),
+    }
+
+
+def measure(fn: Callable[[], object], rounds: int) -> dict:
+    """耗时（中位数、最小值，毫秒）与峰值内存分配（字节）"""
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_ms": statistics.median(durations), "min_ms": min(durations), "peak_bytes": peak}
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> List[str]:
+    """与基线比较，返回超出阈值的项"""
+    regressions = []
+    for size, functions in results.items():
+        for name, result in functions.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                regressions.append(f"{size} {name}: 基线中没有该项，使用 --save-baseline 重新生成")
+                continue
+            if result["median_ms"] > base["median_ms"] * (1 + time_threshold):
+                regressions.append(
+                    f"{size} {name}: 耗时 {result['median_ms']:.2f} ms > 基线 {base['median_ms']:.2f} ms × {1 + time_threshold:g}"
+                )
+            if result["peak_bytes"] > base["peak_bytes"] * (1 + memory_threshold):
+                regressions.append(
+                    f"{size} {name}: 峰值内存 {result['peak_bytes']} B > 基线 {base['peak_bytes']} B × {1 + memory_threshold:g}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 热点函数微基准与回归检查")
+    parser.add_argument("--sizes", nargs="+", default=["10KB", "1MB", "10MB", "50MB"])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--stream-max-chars", type=int, default=20000, help="流式增量提取模拟的输出字数上限")
+    parser.add_argument("--baseline", default=_DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="允许的耗时增幅（0.25 即 25%%）")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="允许的峰值内存增幅")
+    args = parser.parse_args()
+
+    summarizer = ReportSummarizer()
+    results = {}
+    for size in args.sizes:
+        text = make_markdown(parse_size(size))
+        cases = build_cases(summarizer, text, args.stream_max_chars)
+        results[size] = {name: measure(fn, args.rounds) for name, fn in cases.items()}
+        for name, result in results[size].items():
+            print(f"{size:>6} {name:<22} {result['median_ms']:>10.2f} ms {result['peak_bytes'] / 1024:>12.1f} KB", file=sys.stderr)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.baseline}", file=sys.stderr)
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if not os.path.exists(args.baseline):
+        print(f"没有基线文件 {args.baseline}，使用 --save-baseline 生成", file=sys.stderr)
+        sys.exit(2)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    for line in regressions:
+        print(f"回归: {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
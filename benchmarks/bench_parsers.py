@@ -0,0 +1,140 @@
+"""文档解析基准测试
+
+按格式生成有代表性的测试文件（多级标题、正文段落、列表与数据表格），分别用
+快速解析器与 MarkItDown 解析，比较耗时与输出字数：
+- md: UTF-8 Markdown
+- txt: GBK 编码的纯文本（需要编码检测）
+- docx: 需要 python-docx 生成测试文件，未安装时跳过
+
+也可以用 --files 指定已有文件（按扩展名归类）。
+
+用法：
+    python -m benchmarks.bench_parsers --sections 200 --rounds 5
+    python -m benchmarks.bench_parsers --files report.docx notes.md
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from app.utils.document_parser import DocumentParser
+
+
+_PARAGRAPH = "2024 年全社会用电量同比增长 6.8%，其中第二产业用电量增长 5.1%，第三产业用电量增长 9.9%，城乡居民生活用电量增长 6.7%。"
+
+
+def _sections(count: int) -> List[dict]:
+    return [
+        {
+            "title": f"第 {i + 1} 节 区域用电情况",
+            "paragraphs": [_PARAGRAPH * 3, "主要影响因素包括气温、产业结构调整与新能源装机增长。"],
+            "bullets": ["工业用电稳步回升", "服务业用电快速增长"],
+            "table": [["地区", "用电量（亿千瓦时）", "同比"]] + [[f"地区{j}", f"{1000 + j * 37}", f"{j % 9}.{j % 7}%"] for j in range(8)],
+        }
+        for i in range(count)
+    ]
+
+
+def _markdown(sections: List[dict]) -> str:
+    blocks = ["# 用电需求分析报告"]
+    for section in sections:
+        blocks.append(f"## {section['title']}")
+        blocks.extend(section["paragraphs"])
+        blocks.append("\n".join(f"- {b}" for b in section["bullets"]))
+        rows = section["table"]
+        table = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * len(rows[0])]
+        table += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+        blocks.append("\n".join(table))
+    return "\n\n".join(blocks)
+
+
+def make_files(directory: str, sections: int) -> Dict[str, str]:
+    """生成各格式的测试文件，返回 {格式: 路径}"""
+    data = _sections(sections)
+    files = {}
+
+    files["md"] = os.path.join(directory, "report.md")
+    with open(files["md"], "w", encoding="utf-8") as f:
+        f.write(_markdown(data))
+
+    files["txt"] = os.path.join(directory, "report.txt")
+    with open(files["txt"], "w", encoding="gbk") as f:
+        f.write(_markdown(data))
+
+    try:
+        import docx
+    except ImportError:
+        print("未安装 python-docx，跳过 docx")
+        return files
+    document = docx.Document()
+    document.add_heading("用电需求分析报告", level=1)
+    for section in data:
+        document.add_heading(section["title"], level=2)
+        for paragraph in section["paragraphs"]:
+            document.add_paragraph(paragraph)
+        for bullet in section["bullets"]:
+            document.add_paragraph(bullet, style="List Bullet")
+        rows = section["table"]
+        table = document.add_table(rows=len(rows), cols=len(rows[0]))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                table.cell(r, c).text = value
+    files["docx"] = os.path.join(directory, "report.docx")
+    document.save(files["docx"])
+    return files
+
+
+def measure(parser: DocumentParser, path: str, rounds: int) -> dict:
+    """多轮解析同一文件，返回耗时统计（毫秒）与输出字数"""
+    durations = []
+    chars = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        doc = parser.parse_file(path, os.path.basename(path))
+        durations.append((time.perf_counter() - start) * 1000)
+        chars = len(doc.text_md)
+    return {
+        "median_ms": statistics.median(durations),
+        "min_ms": min(durations),
+        "chars": chars,
+        # 解析失败（如缺少 MarkItDown 的可选依赖）时 chars 为 0，耗时没有可比性
+        "warnings": doc.warnings,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="按格式比较快速解析器与 MarkItDown 的解析耗时")
+    arg_parser.add_argument("--sections", type=int, default=200, help="生成文件的小节数")
+    arg_parser.add_argument("--rounds", type=int, default=5)
+    arg_parser.add_argument("--files", nargs="*", help="使用已有文件代替生成的文件")
+    args = arg_parser.parse_args()
+
+    fast = DocumentParser(fast_parsers=True)
+    baseline = DocumentParser(fast_parsers=False)
+    # 转换器初始化不计入解析耗时
+    _ = baseline.markitdown
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.files:
+            files = {os.path.splitext(path)[1].lstrip(".").lower() or path: path for path in args.files}
+        else:
+            files = make_files(directory, args.sections)
+        results = {}
+        for fmt, path in files.items():
+            fast_result = measure(fast, path, args.rounds)
+            baseline_result = measure(baseline, path, args.rounds)
+            results[fmt] = {
+                "bytes": os.path.getsize(path),
+                "fast": fast_result,
+                "markitdown": baseline_result,
+                "speedup": baseline_result["median_ms"] / max(fast_result["median_ms"], 1e-6),
+            }
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""回放基准测试 - 用录制的 LLM 调用离线复现一次请求
+
+先以 LLM_MODE=record 运行服务录制请求（见 README），再按 trace_id 回放：
+- --time-scale 1：按原始时间间隔回放，复现线上端到端耗时
+- --time-scale 0：LLM 即时返回，测得的耗时即流水线自身开销（解析、分块、调度等）
+
+用法：
+    python -m benchmarks.bench_replay <trace_id> --time-scale 0 --rounds 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 录制回放基准测试")
+    parser.add_argument("trace_id", help="录制的请求 trace_id")
+    parser.add_argument("--record-dir", default=os.getenv("LLM_RECORD_DIR", "recordings"), help="录制目录")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="时间缩放（0 为不等待）")
+    parser.add_argument("--rounds", type=int, default=3, help="测量轮数")
+    args = parser.parse_args()
+
+    trace_dir = os.path.join(args.record_dir, args.trace_id)
+    with open(os.path.join(trace_dir, "request.json"), encoding="utf-8") as f:
+        request = json.load(f)
+
+    # Config 在导入时读取环境变量，须先设置回放模式
+    os.environ.update(
+        LLM_MODE="replay",
+        LLM_RECORD_DIR=args.record_dir,
+        LLM_REPLAY_TRACE_ID=args.trace_id,
+        LLM_REPLAY_TIME_SCALE=str(args.time_scale),
+        LLM_WARMUP="false",
+        SECTION_REUSE="false",
+    )
+    from app.workflow.summarizer import ReportSummarizer
+
+    file_paths = [(os.path.join(trace_dir, "files", f["stored"]), f["filename"]) for f in request["files"]]
+    samples = []
+    for _ in range(args.rounds):
+        # 每轮新建实例，回放队列从头开始
+        summarizer = ReportSummarizer()
+        _, meta = asyncio.run(summarizer.summarize(file_paths=file_paths, **request["params"]))
+        samples.append({"total_ms": meta.total_duration_ms, **meta.stage_durations_ms})
+
+    report = {
+        key: {
+            "median": statistics.median(s[key] for s in samples if key in s),
+            "min": min(s[key] for s in samples if key in s),
+            "max": max(s[key] for s in samples if key in s),
+        }
+        for key in samples[0]
+    }
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""启动耗时基准测试
+
+每轮在全新的解释器进程中测量（避免模块缓存影响）：
+- import_ms: 导入 app.main 的耗时
+- health_ms: 导入完成后到 /health 可响应的耗时
+- ready_ms: 导入完成后到 /ready 返回就绪的耗时
+- first_use_ms: 就绪后首次访问 MarkItDown 与 LLM 客户端的耗时（应已在启动阶段预加载）
+
+用法：
+    python -m benchmarks.bench_startup --rounds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+_PROBE = r"""
+import json
+import time
+
+t0 = time.perf_counter()
+import app.main
+from fastapi.testclient import TestClient
+t1 = time.perf_counter()
+
+result = {"import_ms": (t1 - t0) * 1000}
+with TestClient(app.main.app) as client:
+    client.get("/health").raise_for_status()
+    result["health_ms"] = (time.perf_counter() - t1) * 1000
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    result["ready_ms"] = (time.perf_counter() - t1) * 1000
+
+summarizer = app.main.get_summarizer()
+t2 = time.perf_counter()
+_ = summarizer.parser.markitdown
+_ = summarizer.llm_for("validate")
+result["first_use_ms"] = (time.perf_counter() - t2) * 1000
+print(json.dumps(result))
+"""
+
+
+def run_probe() -> dict:
+    """在子进程中执行一次启动测量"""
+    env = dict(os.environ)
+    env.setdefault("LLM_API_KEY", "benchmark")
+    env.setdefault("LLM_WARMUP", "false")
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--rounds", type=int, default=5, help="测量轮数")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.rounds)]
+    report = {
+        key: {
+            "median": statistics.median(s[key] for s in samples),
+            "min": min(s[key] for s in samples),
+            "max": max(s[key] for s in samples),
+        }
+        for key in samples[0]
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
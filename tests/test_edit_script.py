@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app.workflow.edit_script import Edit, EditScriptError, apply_edits, parse_edits, split_paragraphs
+
+
+REPORT = "# 月度报告\n\n本月全社会用电量同比增长。\n\n华东负荷创新高，华北平稳。"
+PARAGRAPHS = split_paragraphs(REPORT)
+
+
+def test_empty_list_means_no_edits():
+    assert parse_edits("[]", PARAGRAPHS) == []
+    assert apply_edits(PARAGRAPHS, []) == REPORT
+
+
+def test_line_and_array_formats_are_parsed_and_applied():
+    output = '{"op": "delete", "index": 1}\n{"op": "replace", "index": 2, "text": "华东负荷创新高。"}'
+    edits = parse_edits(output, PARAGRAPHS)
+    assert edits == [Edit("delete", 1), Edit("replace", 2, "华东负荷创新高。")]
+    assert parse_edits("```json\n[" + output.replace("\n", ",") + "]\n```", PARAGRAPHS) == edits
+    assert apply_edits(PARAGRAPHS, edits) == "# 月度报告\n\n华东负荷创新高。"
+
+
+def test_numbered_prefix_is_stripped_before_shorten_check():
+    # 带前缀时比原段落长，去掉前缀后变短
+    shortened = "[2] 华东负荷创新高，华北稳。"
+    assert len(shortened) > len(PARAGRAPHS[2])
+    edits = parse_edits(json.dumps({"op": "shorten", "index": 2, "text": shortened}), PARAGRAPHS)
+    assert edits == [Edit("shorten", 2, "华东负荷创新高，华北稳。")]
+
+    # 去掉前缀后没有变短
+    with pytest.raises(EditScriptError):
+        parse_edits('{"op": "shorten", "index": 1, "text": "[1] 本月全社会用电量同比增长。"}', PARAGRAPHS)
+    # 只有前缀视为缺少 text
+    with pytest.raises(EditScriptError):
+        parse_edits('{"op": "replace", "index": 1, "text": "[1] "}', PARAGRAPHS)
+
+
+@pytest.mark.parametrize("output", [
+    "",
+    "好的，修改如下",
+    '[{"op": "delete", "index": 1}',
+    '["delete"]',
+    '{"op": "merge", "index": 1}',
+    '{"op": "replace", "index": 1}',
+])
+def test_malformed_output_is_rejected(output):
+    with pytest.raises(EditScriptError):
+        parse_edits(output, PARAGRAPHS)
+
+
+@pytest.mark.parametrize("index", [-1, 3, "1", True, None])
+def test_out_of_range_or_invalid_index_is_rejected(index):
+    with pytest.raises(EditScriptError):
+        parse_edits(json.dumps([{"op": "delete", "index": index}]), PARAGRAPHS)
+
+
+def test_duplicate_index_is_rejected():
+    with pytest.raises(EditScriptError):
+        parse_edits('{"op": "delete", "index": 1}\n{"op": "replace", "index": 1, "text": "新内容"}', PARAGRAPHS)
+
+
+def test_deleting_every_paragraph_is_rejected():
+    output = "\n".join(f'{{"op": "delete", "index": {i}}}' for i in range(len(PARAGRAPHS)))
+    with pytest.raises(EditScriptError):
+        parse_edits(output, PARAGRAPHS)
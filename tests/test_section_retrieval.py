@@ -0,0 +1,28 @@
+from app.config import REPORT_TYPE_FOCUS_TERMS, ReportType
+from app.utils.section_retrieval import BM25Index, build_query, select_sections, tokenize
+
+
+def test_tokenize_indexes_unigrams_only_when_asked():
+    assert tokenize("本周用电") == ["本周", "周用", "用电"]
+    assert tokenize("本周用电", unigrams=True) == ["本周", "周用", "用电", "本", "周", "用", "电"]
+    assert tokenize("月") == ["月"]
+
+
+def test_single_character_regular_terms_match_sections():
+    sections = ["本周气温偏低，空调负载下降。", "会议纪要如下，请各单位知悉。", "一至十月份累计情况说明。"]
+    query = build_query("", REPORT_TYPE_FOCUS_TERMS[ReportType.REGULAR])
+    scores = BM25Index(sections).scores(query)
+    assert scores[0] > 0
+    assert scores[2] > 0
+    assert scores[1] == 0
+
+
+def test_select_sections_prefers_matching_sections_within_budget():
+    sections = ["会议纪要如下。", "本月全社会用电量同比增长。", "本周华东负荷创新高。"]
+    query = build_query("华东负荷", REPORT_TYPE_FOCUS_TERMS[ReportType.REGULAR])
+    assert select_sections(sections, query, budget_chars=12) == [2]
+    assert select_sections(sections, query, budget_chars=100) == [1, 2]
+
+
+def test_select_sections_keeps_everything_without_hits():
+    assert select_sections(["甲乙丙", "丁戊己"], {"华东": 1.0}, budget_chars=1) == [0, 1]
@@ -0,0 +1,55 @@
+import os
+import threading
+
+from app.utils.section_store import SectionStore
+
+
+def test_entries_survive_flush_and_reload(tmp_path):
+    store = SectionStore(str(tmp_path))
+    store.put("月报", "fp1", "摘要一")
+    store.flush()
+    reloaded = SectionStore(str(tmp_path))
+    reloaded.preload("月报")
+    assert reloaded.get("月报", "fp1") == "摘要一"
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    store = SectionStore(str(tmp_path), max_series=2)
+    for i in range(5):
+        store.put(f"系列{i}", "fp", f"摘要{i}")
+        store.flush()
+    assert len(store._series) == 2
+    # 被淘汰的系列从磁盘重新读取
+    assert store.get("系列0", "fp") == "摘要0"
+
+
+def test_concurrent_flushes_of_same_series(tmp_path):
+    store = SectionStore(str(tmp_path))
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(20):
+                store.put("月报", f"fp{n}-{i}", "摘要")
+                store.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    reloaded = SectionStore(str(tmp_path))
+    assert all(reloaded.get("月报", f"fp{n}-19") == "摘要" for n in range(4))
+
+
+def test_flush_errors_are_logged_and_retried(tmp_path):
+    blocked = tmp_path / "not-a-dir"
+    blocked.write_text("")
+    store = SectionStore(str(blocked))
+    store.put("月报", "fp", "摘要")
+    store.flush()
+    assert store._dirty == {"月报"}
@@ -0,0 +1,45 @@
+import asyncio
+import random
+
+from app.api.sse_frames import ContentCoalescer
+
+
+def test_frames_keep_delta_order_when_emit_yields():
+    rng = random.Random(0)
+    frames = []
+
+    async def emit(text):
+        # 模拟经线程写入任务队列：发送期间让出事件循环，耗时不定
+        await asyncio.sleep(rng.random() * 0.003)
+        frames.append(text)
+
+    async def run():
+        coalescer = ContentCoalescer(emit, max_chars=5, interval_ms=1)
+        deltas = [f"{i}," for i in range(300)]
+        for delta in deltas:
+            await coalescer.add(delta)
+            if rng.random() < 0.3:
+                await asyncio.sleep(rng.random() * 0.002)
+        await coalescer.drain()
+        return deltas
+
+    deltas = asyncio.run(run())
+    assert "".join(frames) == "".join(deltas)
+    assert len(frames) > 1
+
+
+def test_drain_sends_remaining_deltas():
+    frames = []
+
+    async def emit(text):
+        frames.append(text)
+
+    async def run():
+        coalescer = ContentCoalescer(emit, max_chars=100, interval_ms=1000)
+        await coalescer.add("甲")
+        await coalescer.add("乙")
+        assert frames == []
+        await coalescer.drain()
+
+    asyncio.run(run())
+    assert frames == ["甲乙"]
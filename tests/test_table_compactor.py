@@ -0,0 +1,65 @@
+from app.config import REPORT_TYPE_FOCUS_TERMS, ReportType
+from app.utils.table_compactor import compact_markdown_tables, filter_table, parse_table
+
+
+MONTHLY = [
+    "| 地区 | 1月 | 2月 | 同比 |",
+    "| --- | --- | --- | --- |",
+    "| 江苏 | 120 | 110 | 5% |",
+    "| 华东 | 300 | 280 | 4% |",
+    "| 浙江 | 100 | 95 | 6% |",
+]
+
+
+def test_parse_table_drops_padding_empty_columns_and_duplicate_rows():
+    table = parse_table([
+        "|  地区  | 备注 |  用电量  |",
+        "| :--- | --- | ---: |",
+        "|  华东  |  |  123  |",
+        "|  华东  |  |  123  |",
+        "|  华北  |  |  98  |",
+    ])
+    assert table.serialize() == "[表] 地区|用电量\n华东|123\n华北|98"
+
+
+def test_filter_keeps_whole_table_when_most_rows_would_be_dropped():
+    table = parse_table(MONTHLY)
+    filtered = filter_table(table, REPORT_TYPE_FOCUS_TERMS[ReportType.ELECTRICITY_DEMAND])
+    assert filtered.serialize() == table.serialize()
+
+
+def test_filter_keeps_all_rows_when_no_row_matches():
+    table = parse_table(MONTHLY)
+    assert filter_table(table, ["寒潮"]).serialize() == table.serialize()
+
+
+def test_filter_drops_only_unmatched_rows_and_keeps_every_column():
+    lines = MONTHLY[:2] + [f"| 华东{i} | {i} | {i + 1} | {i}% |" for i in range(8)] + ["| 其他 | 1 | 2 | 3% |"]
+    filtered = filter_table(parse_table(lines), ["华东"])
+    assert filtered.headers == ["地区", "1月", "2月", "同比"]
+    assert filtered.row_count == 8
+    assert all(row[0].startswith("华东") for row in filtered.rows())
+
+
+def test_filter_respects_max_drop_ratio():
+    table = parse_table(MONTHLY)
+    assert filter_table(table, ["华东"], max_drop_ratio=0.7).rows() == [["华东", "300", "280", "4%"]]
+
+
+def test_compact_markdown_tables_keeps_surrounding_text():
+    text = "前文\n\n" + "\n".join(MONTHLY) + "\n\n后文"
+    compacted = compact_markdown_tables(text, ["华东"])
+    assert compacted.startswith("前文\n\n[表] 地区|1月|2月|同比\n江苏|120|110|5%")
+    assert compacted.endswith("浙江|100|95|6%\n\n后文")
+
+
+def test_escaped_pipes_stay_inside_their_cell():
+    table = parse_table([
+        "| 指标 | 来源 | 数值 |",
+        "| --- | --- | --- |",
+        "| 用电量 | 月报\\|快报 | 123 |",
+        "| 负荷 | 调度 | 98 |",
+    ])
+    assert table.headers == ["指标", "来源", "数值"]
+    assert table.rows() == [["用电量", "月报|快报", "123"], ["负荷", "调度", "98"]]
+    assert table.serialize() == "[表] 指标|来源|数值\n用电量|月报\\|快报|123\n负荷|调度|98"
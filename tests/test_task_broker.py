@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from app.utils.task_broker import LeaseLostError, SQLiteBroker, TaskConflictError
+
+
+def _event(name):
+    return {"event": name, "data": "{}"}
+
+
+def test_enqueue_rejects_active_task_and_replaces_finished_one(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "broker.db"))
+    broker.enqueue("t1", {}, [("a.txt", b"a")])
+    with pytest.raises(TaskConflictError):
+        broker.enqueue("t1", {}, [])
+    task = broker.claim("w1", 60)
+    assert task["uploads"] == [("a.txt", b"a")]
+    with pytest.raises(TaskConflictError):
+        broker.enqueue("t1", {}, [])
+    assert broker.finish("t1", "w1", "done")
+    broker.enqueue("t1", {}, [])
+    assert broker.poll("t1", 0) == ([], "queued")
+
+
+def test_only_lease_holder_can_publish_and_finish(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "broker.db"))
+    broker.enqueue("t1", {}, [])
+    broker.claim("w1", 60)
+    broker.publish("t1", "w1", _event("status"))
+    with pytest.raises(LeaseLostError):
+        broker.publish("t1", "w2", _event("content"))
+    assert not broker.finish("t1", "w2", "done")
+    events, status = broker.poll("t1", 0)
+    assert [event["event"] for _, event in events] == ["status"]
+    assert status == "running"
+
+
+def test_expired_lease_fails_task_and_rejects_old_worker(tmp_path):
+    broker = SQLiteBroker(str(tmp_path / "broker.db"))
+    broker.enqueue("t1", {}, [])
+    broker.claim("w1", 0.01)
+    time.sleep(0.02)
+    events, status = broker.poll("t1", 0)
+    assert status == "failed"
+    assert [event["event"] for _, event in events] == ["error"]
+    assert not broker.renew("t1", "w1", 60)
+    with pytest.raises(LeaseLostError):
+        broker.publish("t1", "w1", _event("result"))
+    assert not broker.finish("t1", "w1", "done")
+    assert broker.poll("t1", 1) == ([], "failed")
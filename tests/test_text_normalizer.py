@@ -0,0 +1,69 @@
+from app.utils.text_normalizer import TextNormalizer
+
+
+BODY = "新建煤电项目未经国家能源局核准同意不得开工建设，各地要严格落实。"
+
+
+def _filler(i, start):
+    return "\n".join(f"第{i}节第{n}段正文。" for n in range(start, start + 4))
+
+
+def _pages(count, body=lambda i: f"第{i}节正文内容。"):
+    return "\f".join(
+        f"国网能源研究院月度报告\n{_filler(i, 1)}\n{body(i)}\n{_filler(i, 5)}\n第 {i} 页"
+        for i in range(1, count + 1)
+    )
+
+
+def test_repeated_headers_and_page_numbers_are_removed():
+    normalizer = TextNormalizer(min_repeats=3)
+    text = normalizer.normalize(_pages(4))
+    assert "国网能源研究院月度报告" not in text
+    assert "页" not in text
+    assert "第3节正文内容。" in text
+    assert normalizer.report()["repeated_lines"] == 4
+    assert normalizer.report()["page_numbers"] == 4
+
+
+def test_streaming_pages_keep_headers_until_repeated():
+    normalizer = TextNormalizer(min_repeats=3)
+    pages = [normalizer.normalize_page(page) for page in _pages(4).split("\f")]
+    assert "国网能源研究院月度报告" in pages[0]
+    assert "国网能源研究院月度报告" not in pages[3]
+
+
+def test_toc_lines_and_title_are_removed():
+    normalizer = TextNormalizer()
+    text = normalizer.normalize("目录\n第一章 概述 ........ 3\n第二章 负荷分析 ........ 7\n一、概述\n本月负荷平稳。")
+    assert text == "一、概述\n本月负荷平稳。"
+    assert normalizer.report()["toc_lines"] == 3
+
+
+def test_wrapped_chinese_lines_are_reflowed():
+    normalizer = TextNormalizer()
+    text = normalizer.normalize("本月全社会用电量同比增长百分之五，其中第二\n产业用电量增长较快。\n\n- 列表项")
+    assert text == "本月全社会用电量同比增长百分之五，其中第二产业用电量增长较快。\n\n- 列表项"
+    assert normalizer.report()["reflowed_lines"] == 1
+
+
+def test_disclaimers_on_first_page_are_removed():
+    text = TextNormalizer().normalize("版权所有，未经许可不得转载\n一、概述\n本月负荷平稳。\f二、分析\n负荷上升。")
+    assert "版权所有" not in text
+    assert "本月负荷平稳。" in text
+
+
+def test_disclaimer_like_body_sentence_is_kept():
+    body = lambda i: BODY if i == 2 else f"第{i}节正文内容。"
+    text = TextNormalizer().normalize(_pages(3, body))
+    assert BODY in text
+    streaming = TextNormalizer()
+    assert BODY in "".join(streaming.normalize_page(page) for page in _pages(3, body).split("\f"))
+
+
+def test_disclaimer_repeated_across_pages_is_removed():
+    notice = "本报告仅供内部参考使用，请勿转发至任何外部单位或个人，未经书面许可不得以任何形式复制、摘编或引用，违者追究相关责任。"
+    body = lambda i: notice
+    normalizer = TextNormalizer()
+    text = normalizer.normalize(_pages(3, body))
+    assert notice not in text
+    assert normalizer.report()["disclaimers"] == 3